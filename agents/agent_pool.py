@@ -0,0 +1,177 @@
+import os
+import threading
+from collections import OrderedDict
+
+from agents.vector_store import (
+    get_embedder,
+    load_query_store,
+    lecture_store_path,
+    lecture_store_version,
+    list_lecture_stores,
+    estimate_store_bytes,
+    FAISS_MMAP)
+
+AGENT_POOL_MAX_ENTRIES = int(os.environ.get("AGENT_POOL_MAX_ENTRIES", 16))
+AGENT_POOL_MAX_BYTES = int(os.environ.get("AGENT_POOL_MAX_BYTES", 1024 * 1024 * 1024))
+# Lectures loaded when the server starts: comma separated IDs, "all", or empty for none.
+PRELOAD_LECTURES = os.environ.get("PRELOAD_LECTURES", "")
+
+
+class LRUPool():
+    """
+    A thread-safe LRU cache of expensive per-key objects, bounded by entry count and
+    by an estimated byte size.
+
+    Entries are built on demand by `factory(key)`. When `version(key)` is given, the
+    stamp it returns is stored with each entry and compared on every lookup, so an entry
+    whose backing data changed (even in another process) is rebuilt instead of served.
+    """
+
+    def __init__(self, factory, max_entries=AGENT_POOL_MAX_ENTRIES, max_bytes=AGENT_POOL_MAX_BYTES,
+                 sizeof=None, version=None):
+        """
+        Args:
+            factory (callable): Builds the value for a key.
+            max_entries (int): Maximum number of cached entries.
+            max_bytes (int): Maximum total estimated size of the cached entries.
+            sizeof (callable): Returns the estimated size of a value in bytes.
+            version (callable): Returns a stamp identifying the current backing data of a key.
+        """
+        self.factory = factory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or (lambda value: 0)
+        self.version = version or (lambda key: None)
+        self._entries = OrderedDict()  # key -> (value, size, version)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._build_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """ Returns the cached value for `key`, building it on a miss. """
+        version = self.version(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                self._remove(key)
+                self.invalidations += 1
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+
+        # Build outside the pool lock so other keys stay available; the per-key lock
+        # makes concurrent misses on the same key wait for a single build.
+        with build_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[2] == version:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                self.misses += 1
+            value = self.factory(key)
+            size = self.sizeof(value)
+            with self._lock:
+                if key in self._entries:
+                    self._remove(key)
+                self._entries[key] = (value, size, version)
+                self._bytes += size
+                self._evict(keep=key)
+                self._build_locks.pop(key, None)
+            return value
+
+    def invalidate(self, key=None):
+        """ Drops the entry for `key`, or every entry when no key is given. """
+        with self._lock:
+            keys = list(self._entries) if key is None else [key]
+            for k in keys:
+                if k in self._entries:
+                    self._remove(k)
+                    self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _evict(self, keep):
+        # The entry just inserted is never evicted, even if it alone exceeds max_bytes.
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            oldest = next(iter(self._entries))
+            if oldest == keep:
+                break
+            self._remove(oldest)
+            self.evictions += 1
+
+
+# Process-wide pool of loaded vector stores, keyed by lecture_id (as a string, matching
+# the embeddings folder name).
+lecture_pool = LRUPool(
+    lambda lecture_id: load_query_store(lecture_id, get_embedder()),
+    sizeof=estimate_store_bytes,
+    version=lecture_store_version)
+
+
+def get_lecture_store(lecture_id):
+    """ Returns the pooled vector store of a lecture. """
+    return lecture_pool.get(str(lecture_id))
+
+def invalidate_lecture(lecture_id):
+    """ Drops a lecture from this process' pool after its embeddings were rewritten or deleted. """
+    lecture_pool.invalidate(str(lecture_id))
+
+def preload_lectures(lecture_ids=None):
+    """
+    Loads lectures into the pool ahead of the first request.
+
+    Called before a pre-fork server forks its workers, the loaded stores are inherited by
+    every worker; with FAISS_MMAP the index files are also read ahead into the page cache,
+    which all workers share.
+
+    Args:
+        lecture_ids (list): Lectures to load; defaults to PRELOAD_LECTURES.
+
+    Returns:
+        list of str: The lectures loaded.
+    """
+    if lecture_ids is None:
+        if PRELOAD_LECTURES.strip() == "all":
+            lecture_ids = list_lecture_stores()
+        else:
+            lecture_ids = [lecture_id.strip() for lecture_id in PRELOAD_LECTURES.split(",") if lecture_id.strip()]
+    loaded = []
+    for lecture_id in lecture_ids:
+        try:
+            get_lecture_store(lecture_id)
+        except Exception as e:
+            print(f"Failed to preload lecture {lecture_id}: {e}")
+            continue
+        if FAISS_MMAP and hasattr(os, "posix_fadvise"):
+            with open(os.path.join(lecture_store_path(lecture_id), "index.faiss"), "rb") as file:
+                os.posix_fadvise(file.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+        loaded.append(str(lecture_id))
+    return loaded
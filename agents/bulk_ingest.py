@@ -0,0 +1,128 @@
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from agents.database import get_course_lecture_id, fetch_topics_by_lecture
+from agents.rate_limit import SharedRateLimiter
+
+BULK_INGEST_WORKERS = int(os.environ.get("BULK_INGEST_WORKERS", 4))
+# Topic title LLM calls started per second, summed over all worker processes.
+BULK_INGEST_RATE = float(os.environ.get("BULK_INGEST_RATE", 2.0))
+
+
+def load_manifest(path, lecture_license=""):
+    """
+    Lists the lectures to ingest.
+
+    Args:
+        path (str): A directory of `.txt` transcripts, each one a lecture titled after its
+            file name, or a JSON manifest: a list of objects with 'lecture_name',
+            'lecture_source' and optionally 'lecture_license'. Relative sources are
+            resolved against the manifest's directory.
+        lecture_license (str): License of lectures that do not name one.
+
+    Returns:
+        list of dict: One {'lecture_name', 'lecture_source', 'lecture_license'} per lecture.
+    """
+    if os.path.isdir(path):
+        return [{
+            'lecture_name': os.path.splitext(name)[0],
+            'lecture_source': os.path.join(path, name),
+            'lecture_license': lecture_license,
+        } for name in sorted(os.listdir(path)) if name.endswith(".txt")]
+
+    with open(path) as file:
+        manifest = json.load(file)
+    base = os.path.dirname(os.path.abspath(path))
+    entries = []
+    for item in manifest:
+        entries.append({
+            'lecture_name': item['lecture_name'],
+            'lecture_source': os.path.join(base, item['lecture_source']),
+            'lecture_license': item.get('lecture_license', lecture_license),
+        })
+    return entries
+
+
+# Set in each worker process by _init_worker, shared by all of them.
+_limiter = None
+
+def _init_worker(limiter):
+    global _limiter
+    _limiter = limiter
+
+
+def ingest_lecture(course_id, entry, index_type=None):
+    """
+    Creates one lecture with its embeddings and topic titles.
+
+    A lecture of the course with the same title that already has topics is skipped, and one
+    left without topics by an interrupted run is completed, so a failed bulk ingestion can
+    simply be run again. `index_type` is passed to `create_embedding`.
+
+    Returns:
+        dict: The entry with 'lecture_id', 'status' ('ingested', 'skipped' or 'failed'),
+        'topics', 'error' and 'seconds'.
+    """
+    begin = time.perf_counter()
+    report = dict(entry, lecture_id=None, status="failed", topics=0, error=None)
+    try:
+        lecture_id = get_course_lecture_id(course_id, entry['lecture_name'])
+        topics = fetch_topics_by_lecture(lecture_id) if lecture_id is not None else []
+        if topics:
+            report.update(lecture_id=lecture_id, status="skipped", topics=len(topics))
+        else:
+            # course_agent builds its LLM and embedding clients on import, once per worker.
+            from agents.course_agent import create_lecture, create_embedding, generate_topic_titles
+            if lecture_id is None:
+                lecture_id = create_lecture(course_id, entry['lecture_name'], entry['lecture_license'])
+            report['lecture_id'] = lecture_id
+            create_embedding(entry['lecture_source'], lecture_id, index_type)
+            generate_topic_titles(lecture_id, limiter=_limiter)
+            report.update(status="ingested", topics=len(fetch_topics_by_lecture(lecture_id)))
+    except Exception as e:
+        report['error'] = str(e)
+    report['seconds'] = time.perf_counter() - begin
+    return report
+
+
+def ingest_course(entries, course_id, workers=BULK_INGEST_WORKERS, rate=BULK_INGEST_RATE, on_result=None,
+                  index_type=None):
+    """
+    Ingests lectures in parallel worker processes.
+
+    Embedding and title generation of different lectures overlap, while the title LLM
+    calls of all workers share one rate limit. A failing lecture does not stop the others.
+
+    Args:
+        entries (list of dict): Lectures as returned by `load_manifest`.
+        course_id (int): The course the lectures belong to.
+        workers (int): Number of worker processes.
+        rate (float): Title LLM calls started per second across all workers; 0 for no limit.
+        on_result (callable): Called with each lecture's report as soon as it completes.
+        index_type (str): FAISS index type of the new lectures, see `create_embedding`.
+
+    Returns:
+        list of dict: The reports of `ingest_lecture`, in the order of `entries`.
+    """
+    # Workers are spawned rather than forked: the parent may hold open SQLite connections.
+    context = multiprocessing.get_context("spawn")
+    limiter = SharedRateLimiter(rate, burst=max(1, workers), context=context)
+    reports = [None] * len(entries)
+    with ProcessPoolExecutor(max_workers=max(1, workers), mp_context=context,
+                             initializer=_init_worker, initargs=(limiter,)) as executor:
+        futures = {executor.submit(ingest_lecture, course_id, entry, index_type): index
+                   for index, entry in enumerate(entries)}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                reports[index] = future.result()
+            except Exception as e:
+                # The worker process itself died, e.g. killed for memory.
+                reports[index] = dict(entries[index], lecture_id=None, status="failed", topics=0,
+                                      error=str(e), seconds=0.0)
+            if on_result:
+                on_result(reports[index])
+    return reports
@@ -0,0 +1,113 @@
+import hashlib
+
+from langchain.text_splitter import CharacterTextSplitter
+
+TOPIC_SIZE = 3000
+TOPIC_SEPARATOR = "."
+# Characters read from a transcript at a time when streaming it.
+READ_BLOCK_SIZE = 1024 * 1024
+
+
+def get_text_splitter():
+    """ The splitter turning a transcript into topic-sized chunks, cut after a sentence. """
+    return CharacterTextSplitter(chunk_size=TOPIC_SIZE, separator=TOPIC_SEPARATOR, keep_separator=True, chunk_overlap=0)
+
+
+def _iter_sentences(file, separator, block_size):
+    # The pieces CharacterTextSplitter cuts the text into with keep_separator=True: the text
+    # before the first separator, then each separator with the text up to the next one.
+    pending, has_separator = "", False
+    while True:
+        block = file.read(block_size)
+        if not block:
+            break
+        parts = block.split(separator)
+        pending += parts[0]
+        for part in parts[1:]:
+            piece = separator + pending if has_separator else pending
+            if piece:
+                yield piece
+            pending, has_separator = part, True
+    piece = separator + pending if has_separator else pending
+    if piece:
+        yield piece
+
+
+def iter_transcript_chunks(path, chunk_size=TOPIC_SIZE, separator=TOPIC_SEPARATOR, encoding=None,
+                           block_size=READ_BLOCK_SIZE):
+    """
+    Yields the chunks of a transcript file while reading it block by block.
+
+    The chunks are exactly those of `get_text_splitter().split_documents(TextLoader(path).load())`,
+    but only one block of the file and the chunk being assembled are held in memory.
+
+    Args:
+        path (str): The transcript file.
+        chunk_size (int): Maximum chunk length in characters, unless a single sentence is longer.
+        separator (str): The single-character sentence separator, kept at the start of the
+            following piece.
+        encoding (str): File encoding; the platform default, like TextLoader, if None.
+        block_size (int): Characters read at a time.
+
+    Yields:
+        str: The chunks, stripped of surrounding whitespace, in file order.
+    """
+    current = []
+    total = 0
+    with open(path, encoding=encoding) as file:
+        for piece in _iter_sentences(file, separator, block_size):
+            if total + len(piece) > chunk_size and current:
+                chunk = "".join(current).strip()
+                if chunk:
+                    yield chunk
+                current, total = [], 0
+            current.append(piece)
+            total += len(piece)
+    chunk = "".join(current).strip()
+    if chunk:
+        yield chunk
+
+
+def chunk_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def split_around_chunks(text, chunks):
+    """
+    Splits an edited transcript so that chunks of its previous version found verbatim in it
+    stay chunks of their own; only the text between them is split again.
+
+    Splitting the edited text from scratch would move every chunk boundary after an edit
+    that changes the text length, turning a one-sentence fix into a re-ingest of the rest
+    of the lecture.
+
+    Parameters:
+    - text (str): The edited transcript.
+    - chunks (list of str): Chunk texts of the previous version, in any order.
+
+    Returns:
+    - list of str: The chunks of the edited transcript, in transcript order.
+    """
+    found = []
+    search_from = {}
+    for chunk in chunks:
+        position = text.find(chunk, search_from.get(chunk, 0))
+        if position != -1:
+            found.append((position, position + len(chunk)))
+            search_from[chunk] = position + len(chunk)
+    found.sort()
+
+    text_splitter = get_text_splitter()
+    pieces = []
+    cursor = 0
+    for start, end in found:
+        if start < cursor:
+            continue  # overlaps the previous anchor
+        gap = text[cursor:start]
+        if gap.strip(" \n\t."):
+            pieces.extend(text_splitter.split_text(gap))
+        pieces.append(text[start:end])
+        cursor = end
+    if text[cursor:].strip(" \n\t."):
+        pieces.extend(text_splitter.split_text(text[cursor:]))
+    return pieces
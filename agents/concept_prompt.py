@@ -17,19 +17,35 @@ SUFFIX = """Begin! Previous conversation history: {chat_history} New input: {inp
 FORMAT_INSTRUCTIONS = """Prefix your response as follows ```{ai_prefix}: [your response here] ```"""
 
 
-def get_formatted(prompt_template, topic_summary, quiz_dict, answer):
+# Placeholders of PREFIX that are filled per request at run time.
+PROMPT_VARIABLES = ["concept", "question", "option_a", "option_b", "option_c", "option_d", "your_choice"]
+
+# Answers a student can choose, one per option.
+ANSWERS = ("a", "b", "c", "d")
+
+
+def parse_answer(answer):
+    """ The chosen answer as one of ANSWERS, or None if `answer` is not a single letter a to d. """
+    answer = (answer or "").strip().lower()
+    return answer if answer in ANSWERS else None
+
+
+def get_prompt_variables(topic_summary, quiz_dict, answer):
     user_answer = ""
     num_answer = ord(answer.lower()) - ord('a'); 
     if num_answer >= 0 and num_answer < 4:
         user_answer = quiz_dict["choices"][num_answer]
-        
-    concept_prompt = prompt_template.format(
-        concept=topic_summary,
-        question=quiz_dict["question"],
-        option_a=quiz_dict["choices"][0],
-        option_b=quiz_dict["choices"][1],
-        option_c=quiz_dict["choices"][2],
-        option_d=quiz_dict["choices"][3],
-        your_choice=user_answer
-    )
-    return concept_prompt
\ No newline at end of file
+
+    return {
+        "concept": topic_summary,
+        "question": quiz_dict["question"],
+        "option_a": quiz_dict["choices"][0],
+        "option_b": quiz_dict["choices"][1],
+        "option_c": quiz_dict["choices"][2],
+        "option_d": quiz_dict["choices"][3],
+        "your_choice": user_answer
+    }
+
+
+def get_formatted(prompt_template, topic_summary, quiz_dict, answer):
+    return prompt_template.format(**get_prompt_variables(topic_summary, quiz_dict, answer))
\ No newline at end of file
@@ -1,42 +1,83 @@
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
 from langchain_nvidia_ai_endpoints import NVIDIAEmbeddings
 from langchain.text_splitter import CharacterTextSplitter
 from langchain_community.document_loaders import TextLoader
+from langchain_core.documents import Document
 from langchain_nvidia_ai_endpoints import ChatNVIDIA
 from langchain_openai import OpenAI, OpenAIEmbeddings
 from langchain_openai import ChatOpenAI
 import os
+import time
+import uuid
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+import faiss
+import numpy as np
+from agents.rate_limit import RateLimiter, call_with_retry
+from agents.chunking import TOPIC_SIZE, iter_transcript_chunks, split_around_chunks, chunk_hash
+from agents.vector_store import get_embedder, load_lecture_store, save_lecture_store, save_lecture_index, lecture_store_path
+from agents.docstore import DOCSTORE_FILE, DocstoreWriter
+from agents.vector_index import FAISS_INDEX_TYPE, build_index, rebuild_index
+from agents.agent_pool import invalidate_lecture
+from agents.course_index import update_course_index
+from agents.llm_cache import get_llm_cache
 from agents.database import (
     insert_course,
     insert_lecture,
-    insert_topic,
+    insert_topics,
+    fetch_topic_doc_ids,
+    update_lecture_topics,
+    set_lecture_index_type,
     get_course_id,
     get_lecture_id)
 
 TOPIC_TITLE_PROMPT = "Give a shot topic title for the following. It should not exceed 8 words. Only one title in the response:"
-TOPIC_SIZE=3000
+
+# Title generation: parallel LLM calls, calls started per second (0 for no limit), and
+# retries of transient errors with exponential backoff starting at TITLE_RETRY_BACKOFF seconds.
+TITLE_CONCURRENCY = int(os.environ.get("TITLE_CONCURRENCY", 4))
+TITLE_RATE = float(os.environ.get("TITLE_RATE", 2.0))
+TITLE_MAX_RETRIES = int(os.environ.get("TITLE_MAX_RETRIES", 3))
+TITLE_RETRY_BACKOFF = float(os.environ.get("TITLE_RETRY_BACKOFF", 1.0))
+# Chunks embedded and added to the index per call while ingesting a transcript.
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", 256))
 
 # embedder = NVIDIAEmbeddings(model="ai-embed-qa-4")
-llm = ChatNVIDIA(model="mistralai/mixtral-8x22b-instruct-v0.1")
+# Titles of unchanged chunks are served from the LLM response cache on re-ingest.
+llm = ChatNVIDIA(model="mistralai/mixtral-8x22b-instruct-v0.1", cache=get_llm_cache())
 
 
-embedder = OpenAIEmbeddings()
+# Shared with the query agents, so both go through the embedding cache.
+embedder = get_embedder()
 # llm = ChatOpenAI(temperature=0, model="gpt-3.5-turbo-0125")
 
-def create_embedding(topic_source_file: str, lecture_id):
+def batched(iterable, size):
+    """ Yields lists of up to `size` consecutive items. """
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def create_embedding(topic_source_file: str, lecture_id, index_type=None):
     """
     Creates a text embedding for a specified topic document and saves the embedding.
 
-    This function processes a topic document by loading it, splitting it into
-    manageable chunks, and embedding these chunks using FAISS. The resulting
-    embeddings are then saved to disk. This process is only needed once unless
-    the document or the embedding process changes.
+    This function processes a topic document by reading it, splitting it into
+    manageable chunks, and embedding these chunks in batches of EMBED_BATCH_SIZE
+    into a FAISS index. Each batch's chunks are written to the lecture's docstore as soon as
+    they are embedded, and the index is then saved next to it. This process is only needed
+    once unless the document or the embedding process changes.
 
     Parameters:
     - topic_source_file (str): The name of the file containing the topic document. This
       file should be located within the './topic_docs/' directory.
     - topic_embedding_name (str): The name for the saved embedding file. This file will
       be stored within the './topic_embeddings/' directory.
+    - index_type (str): FAISS index to build, one of vector_index.INDEX_TYPES; defaults to
+      FAISS_INDEX_TYPE. The type actually built is recorded on the lecture.
 
     Returns:
     - bool: True if the embedding process completes successfully, False otherwise.
@@ -46,61 +87,199 @@ def create_embedding(topic_source_file: str, lecture_id):
       from file handling or data processing errors.
     """    
     try:
-        data = []
-        sources = []
-        path2file = topic_source_file
-        loader = TextLoader(path2file)
-        document = loader.load()
-
-        # create docs and metadatas
-        text_splitter = CharacterTextSplitter(chunk_size=TOPIC_SIZE, separator=".", keep_separator=True, chunk_overlap=0)
-        docs = text_splitter.split_documents(document)
-
-        # you only need to do this once, in the future, when re-run this notebook, skip to below and load the vector store from disk
-        store = FAISS.from_documents(docs, embedder )
-        rag_db_folder = os.environ.get("RAG_DB_FOLDER", "./topic_embeddings/")
-        store.save_local(rag_db_folder + str(lecture_id))
+        # The transcript is streamed and each batch of chunks goes to the docstore file once
+        # embedded: only one batch is in memory besides the index being built, whatever the
+        # size of the file. The index is built as FAISS.from_documents would.
+        path = lecture_store_path(lecture_id)
+        os.makedirs(path, exist_ok=True)
+        writer = DocstoreWriter(os.path.join(path, DOCSTORE_FILE))
+        try:
+            index = None
+            for chunks in batched(iter_transcript_chunks(topic_source_file), EMBED_BATCH_SIZE):
+                vectors = np.array(embedder.embed_documents(chunks), dtype=np.float32)
+                if index is None:
+                    index = faiss.IndexFlatL2(vectors.shape[1])
+                start = index.ntotal
+                index.add(vectors)
+                writer.add((start + i, str(uuid.uuid4()),
+                            Document(page_content=chunk, metadata={"source": topic_source_file}))
+                           for i, chunk in enumerate(chunks))
+            if index is None:
+                raise ValueError(f"No text found in {topic_source_file}")
+            # Quantized indexes are trained on the whole lecture, so they are built from the flat one.
+            index, index_type = rebuild_index(index, index_type or FAISS_INDEX_TYPE)
+        except Exception:
+            writer.abort()
+            raise
+        writer.commit()
+        save_lecture_index(index, lecture_id)
+        set_lecture_index_type(lecture_id, index_type)
+        # Agents pooled in this process must not keep serving the old index; other
+        # processes notice the rewritten files through the pool's version check.
+        invalidate_lecture(lecture_id)
         return True
     except Exception as e:
         raise Exception(e)
         return False
 
-def generate_topic_titles(lecture_id):
+def generate_titles(texts, concurrency=TITLE_CONCURRENCY, rate=TITLE_RATE, limiter=None):
+    """
+    Generates a topic title for each chunk of text, running up to `concurrency` LLM calls
+    at a time and starting at most `rate` per second. Transient errors are retried with
+    backoff.
+
+    Parameters:
+    - texts (list of str): The chunks to title.
+    - concurrency (int): Maximum number of LLM calls in flight.
+    - rate (float): Maximum LLM calls started per second; 0 disables the limit.
+    - limiter (RateLimiter): Limiter to use instead of one built from `rate`, e.g. a
+      SharedRateLimiter spanning several processes.
+
+    Returns:
+    - list of str: The titles, in the order of `texts`.
+    """
+    limiter = limiter or RateLimiter(rate, burst=concurrency)
+
+    def title(text):
+        def invoke():
+            limiter.acquire()
+            return llm.invoke(TOPIC_TITLE_PROMPT + text).content
+        return call_with_retry(invoke, retries=TITLE_MAX_RETRIES, backoff=TITLE_RETRY_BACKOFF)
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="topic-titles") as executor:
+        return list(executor.map(title, texts))
+
+def generate_topic_titles(lecture_id, limiter=None):
     """
     Generates a list of titles for topics based on their embeddings.
 
     This function loads a pre-existing FAISS database of topic embeddings and uses it to
     retrieve documents. For each document, it constructs a title using a language model
-    based on the content of the document.
+    based on the content of the document. Titles are generated concurrently (see
+    `generate_titles`) and all topics are stored in a single transaction.
 
     Parameters:
-    - topic_embedding_name (str): The name of the embedding file to load. This file
-      is expected to be in the './topic_embeddings/' directory.
+    - lecture_id (int): The lecture whose embeddings are loaded from RAG_DB_FOLDER.
+    - limiter (RateLimiter): Rate limiter of the LLM calls, see `generate_titles`.
 
     Returns:
-    - list of str: A list of titles generated for each topic in the embedding database.
+    - bool: True once the topics are stored.
 
     Raises:
     - Exception: Propagates any exceptions that occur, typically related to file access,
       FAISS database operations, or language model invocation errors.
     """    
     try:
-      rag_db_folder = os.environ.get("RAG_DB_FOLDER", "./topic_embeddings/")
-      faissDB = FAISS.load_local(rag_db_folder + str(lecture_id), embedder, allow_dangerous_deserialization=True)
-      retriever = faissDB.as_retriever()
-      titles = []
+      started = time.perf_counter()
+      # Only the chunks are read: the index is mapped, not copied.
+      faissDB = load_lecture_store(lecture_id, embedder, mmap=True)
+      documents = []
       for i, doc_id in  faissDB.index_to_docstore_id.items():
-          document = faissDB.docstore.search(doc_id)
-          response = llm.invoke(TOPIC_TITLE_PROMPT + document.page_content)
-          titles.append(response.content)
-      for title in titles:
-          insert_topic(lecture_id, title)
+          documents.append((doc_id, faissDB.docstore.search(doc_id).page_content))
+      loaded = time.perf_counter()
+
+      titles = generate_titles([text for _, text in documents], limiter=limiter)
+      generated = time.perf_counter()
+
+      # Each topic keeps its source chunk, so the agents never have to search for it again.
+      insert_topics(lecture_id, [(title, doc_id, text) for title, (doc_id, text) in zip(titles, documents)])
+      stored = time.perf_counter()
+      update_course_index(lecture_id)
+
+      print(f"Topic titles for lecture {lecture_id}: {len(documents)} chunks, load {loaded - started:.2f}s, "
+            f"titles {generated - loaded:.2f}s, insert {stored - generated:.2f}s")
       return True
     except Exception as e:
       raise Exception(e)
       return False
 
 
+def reingest_lecture(topic_source_file, lecture_id):
+    """
+    Re-ingests an edited transcript, touching only the chunks that changed.
+
+    The transcript is split around the chunks of the previous version (see
+    `split_around_chunks`) and each chunk is hashed. Chunks whose
+    text is already in the lecture's vector store keep their vector, topic, quiz and
+    explanations. Only new or edited chunks are embedded, added to the FAISS index and given
+    a title; chunks no longer present are removed from the index together with their topics.
+    A lecture without a vector store is ingested from scratch.
+
+    Parameters:
+    - topic_source_file (str): Path of the edited transcript.
+    - lecture_id (int): The lecture to update.
+
+    Returns:
+    - dict: {'kept', 'added', 'removed'} chunk counts and 'topic_ids', the new topics.
+    """
+    if not os.path.exists(os.path.join(lecture_store_path(lecture_id), "index.faiss")):
+        create_embedding(topic_source_file, lecture_id)
+        generate_topic_titles(lecture_id)
+        topic_ids = [topic_id for topic_id, _ in fetch_topic_doc_ids(lecture_id)]
+        return {'kept': 0, 'added': len(topic_ids), 'removed': 0, 'topic_ids': topic_ids}
+
+    store = load_lecture_store(lecture_id, embedder)
+    index_doc_ids = [store.index_to_docstore_id[i] for i in sorted(store.index_to_docstore_id)]
+    old_texts = {doc_id: store.docstore.search(doc_id).page_content for doc_id in index_doc_ids}
+
+    document = TextLoader(topic_source_file).load()[0]
+    chunks = split_around_chunks(document.page_content, list(old_texts.values()))
+
+    # Chunks currently in the index, by content hash; identical chunks are matched one to one.
+    existing = {}
+    for doc_id in index_doc_ids:
+        existing.setdefault(chunk_hash(old_texts[doc_id]), []).append(doc_id)
+
+    # Doc ids of the chunks in transcript order: topics are listed in it.
+    kept, added, new_ids, order = [], [], [], []
+    for chunk in chunks:
+        matches = existing.get(chunk_hash(chunk))
+        if matches:
+            kept.append(matches.pop(0))
+            order.append(kept[-1])
+        else:
+            added.append(Document(page_content=chunk, metadata=dict(document.metadata)))
+            new_ids.append(str(uuid.uuid4()))
+            order.append(new_ids[-1])
+    removed = [doc_id for doc_ids in existing.values() for doc_id in doc_ids]
+
+    # Topics created before doc ids were stored follow the index order, one per chunk.
+    topics = fetch_topic_doc_ids(lecture_id)
+    doc_id_updates = []
+    if topics and all(doc_id is None for _, doc_id in topics):
+        if len(topics) != len(index_doc_ids):
+            raise Exception(f"Lecture {lecture_id} has {len(topics)} topics for {len(index_doc_ids)} chunks; "
+                            "re-create it instead of updating it")
+        doc_id_updates = [(doc_id, topic_id) for (topic_id, _), doc_id in zip(topics, index_doc_ids)]
+
+    titles = generate_titles([doc.page_content for doc in added])
+    if isinstance(store.index, faiss.IndexIVF):
+        # IVF indexes keep the ids of the remaining vectors on removal, while FAISS.delete
+        # expects them renumbered: the index is rebuilt instead. Vectors of kept chunks come
+        # from the embedding cache.
+        doc_ids = kept + new_ids
+        documents = [store.docstore.search(doc_id) for doc_id in kept] + added
+        vectors = np.array(embedder.embed_documents([doc.page_content for doc in documents]), dtype=np.float32)
+        index, index_type = build_index(vectors, "ivfpq")
+        store = FAISS(embedder, index, InMemoryDocstore(dict(zip(doc_ids, documents))), dict(enumerate(doc_ids)))
+        set_lecture_index_type(lecture_id, index_type)
+    else:
+        if removed:
+            store.delete(removed)
+        if added:
+            store.add_documents(added, ids=new_ids)
+    save_lecture_store(store, lecture_id)
+    invalidate_lecture(lecture_id)
+
+    topic_ids = update_lecture_topics(
+        lecture_id, removed,
+        [(title, doc_id, doc.page_content) for title, doc_id, doc in zip(titles, new_ids, added)],
+        doc_id_updates, order)
+    update_course_index(lecture_id)
+    print(f"Lecture {lecture_id} re-ingested: {len(kept)} chunks kept, {len(added)} added, {len(removed)} removed")
+    return {'kept': len(kept), 'added': len(added), 'removed': len(removed), 'topic_ids': topic_ids}
+
+
 def create_lecture(course_id,  lecture_name, lecture_license):     
   lecture_id = insert_lecture(course_id,  lecture_name, lecture_license)
   return lecture_id
@@ -0,0 +1,231 @@
+import fcntl
+import os
+from contextlib import contextmanager
+
+import faiss
+import numpy as np
+
+from agents.agent_pool import LRUPool
+from agents.database import fetch_lectures_by_course, fetch_topic_doc_ids, get_lecture_course_id
+from agents.vector_store import RAG_DB_FOLDER, FAISS_MMAP, get_embedder, load_lecture_store, read_lecture_index
+
+# Keep one index per course holding the vectors of all its lectures, for cross-lecture search.
+COURSE_INDEX_ENABLED = os.environ.get("COURSE_INDEX_ENABLED", "1") == "1"
+COURSE_INDEX_FOLDER = os.environ.get("COURSE_INDEX_FOLDER", os.path.join(RAG_DB_FOLDER, "courses"))
+
+# Each vector's 64-bit ID holds the lecture ID in its high and the topic ID in its low 32 bits,
+# so the vectors of a lecture form one ID range.
+_TOPIC_BITS = 32
+
+
+def vector_id(lecture_id, topic_id):
+    """ ID of a topic's vector in its course index. """
+    return (int(lecture_id) << _TOPIC_BITS) | int(topic_id)
+
+def split_vector_id(vector_id):
+    """ Returns the (lecture_id, topic_id) stored in a course index vector ID. """
+    return int(vector_id) >> _TOPIC_BITS, int(vector_id) & ((1 << _TOPIC_BITS) - 1)
+
+def lecture_selector(lecture_ids):
+    """ FAISS ID selector matching the vectors of the given lectures. """
+    selector = None
+    for lecture_id in lecture_ids:
+        lecture_range = faiss.IDSelectorRange(vector_id(lecture_id, 0), vector_id(int(lecture_id) + 1, 0))
+        if selector is None:
+            selector = lecture_range
+        else:
+            # IDSelectorOr does not own its operands: keep them alive with the selector.
+            combined = faiss.IDSelectorOr(selector, lecture_range)
+            combined.operands = (selector, lecture_range)
+            selector = combined
+    return selector
+
+
+def course_index_path(course_id):
+    """ Directory holding the consolidated index of a course. """
+    return os.path.join(COURSE_INDEX_FOLDER, str(course_id))
+
+@contextmanager
+def _course_lock(course_id):
+    # Lectures of one course may be ingested by several processes at once (course ingest);
+    # each update of the index file is a read-modify-write under this lock.
+    path = course_index_path(course_id)
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, "index.lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+def load_course_index(course_id, mmap=False):
+    """
+    Loads the consolidated index of a course.
+
+    Args:
+        course_id (int | str): The course.
+        mmap (bool): Memory-map the index read-only, see `read_lecture_index`.
+
+    Returns:
+        faiss.IndexIDMap2: The index, or None if the course has none yet.
+    """
+    path = os.path.join(course_index_path(course_id), "index.faiss")
+    if not os.path.exists(path):
+        return None
+    return read_lecture_index(path, mmap)
+
+def _save_course_index(course_id, index):
+    path = course_index_path(course_id)
+    faiss.write_index(index, os.path.join(path, "index.faiss.tmp"))
+    os.replace(os.path.join(path, "index.faiss.tmp"), os.path.join(path, "index.faiss"))
+
+def course_index_version(course_id):
+    """ Stamp of a course index file that changes whenever it is rewritten, see `lecture_store_version`. """
+    try:
+        stat = os.stat(os.path.join(course_index_path(course_id), "index.faiss"))
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def _topic_vectors(lecture_id, topics):
+    """
+    Reads the vectors of a lecture's topics from its vector store.
+
+    Args:
+        lecture_id (int): The lecture.
+        topics (list of tuple): (topic_id, doc_id) pairs, as returned by `fetch_topic_doc_ids`.
+
+    Returns:
+        tuple: (topic_ids, vectors) of the topics found in the store.
+    """
+    store = load_lecture_store(lecture_id, get_embedder())
+    positions = {doc_id: position for position, doc_id in store.index_to_docstore_id.items()}
+    all_topics = fetch_topic_doc_ids(lecture_id)
+    if all(doc_id is None for _, doc_id in all_topics) and len(all_topics) == len(positions):
+        # Topics created before doc ids were stored follow the index order, one per chunk.
+        legacy = {topic_id: position for position, (topic_id, _) in enumerate(all_topics)}
+        found = [(topic_id, legacy[topic_id]) for topic_id, _ in topics]
+    else:
+        found = [(topic_id, positions[doc_id]) for topic_id, doc_id in topics if doc_id in positions]
+    if len(found) < len(topics):
+        print(f"Lecture {lecture_id}: {len(topics) - len(found)} topics have no vector and are not indexed")
+    if not found:
+        return [], None
+    index = store.index
+    if isinstance(index, faiss.IndexIVF):
+        # IVF indexes need a direct map to reconstruct vectors by position.
+        index.make_direct_map()
+    vectors = np.vstack([index.reconstruct(int(position)) for _, position in found]).astype(np.float32)
+    return [topic_id for topic_id, _ in found], vectors
+
+def sync_lecture(lecture_id, course_id=None):
+    """
+    Brings a lecture's vectors in its course index in line with its topics.
+
+    Vectors of new topics are copied from the lecture's vector store and vectors of topics
+    that no longer exist are removed; the rest of the index is left as is. After the topics
+    of a lecture are deleted this removes all of its vectors.
+
+    Args:
+        lecture_id (int): The lecture ingested, re-ingested or deleted.
+        course_id (int): The lecture's course; looked up when not given.
+
+    Returns:
+        dict: {'added', 'removed'} vector counts.
+    """
+    if course_id is None:
+        course_id = get_lecture_course_id(lecture_id)
+        if course_id is None:
+            raise ValueError(f"Lecture {lecture_id} not found")
+    topics = fetch_topic_doc_ids(lecture_id)
+    with _course_lock(course_id):
+        index = load_course_index(course_id)
+        indexed = set()
+        if index is not None:
+            indexed = {split_vector_id(i)[1] for i in faiss.vector_to_array(index.id_map)
+                       if split_vector_id(i)[0] == int(lecture_id)}
+        current = {topic_id for topic_id, _ in topics}
+
+        stale = sorted(indexed - current)
+        new_topics = [(topic_id, doc_id) for topic_id, doc_id in topics if topic_id not in indexed]
+        topic_ids, vectors = _topic_vectors(lecture_id, new_topics) if new_topics else ([], None)
+        if not stale and not topic_ids:
+            return {'added': 0, 'removed': 0}
+
+        if stale:
+            index.remove_ids(np.array([vector_id(lecture_id, topic_id) for topic_id in stale], dtype=np.int64))
+        if topic_ids:
+            if index is None:
+                index = faiss.IndexIDMap2(faiss.IndexFlatL2(vectors.shape[1]))
+            index.add_with_ids(vectors, np.array([vector_id(lecture_id, topic_id) for topic_id in topic_ids],
+                                                 dtype=np.int64))
+        _save_course_index(course_id, index)
+    print(f"Course {course_id} index: lecture {lecture_id} {len(topic_ids)} vectors added, {len(stale)} removed")
+    return {'added': len(topic_ids), 'removed': len(stale)}
+
+def update_course_index(lecture_id):
+    """
+    Updates the course index after a lecture's topics changed, when COURSE_INDEX_ENABLED.
+
+    The course index is derived from the lecture stores, so a failure is reported but does
+    not fail the ingestion; `rebuild_course_index` repairs it.
+    """
+    if not COURSE_INDEX_ENABLED:
+        return None
+    try:
+        return sync_lecture(lecture_id)
+    except Exception as e:
+        print(f"Failed to update the course index for lecture {lecture_id}: {e}")
+        return None
+
+def rebuild_course_index(course_id):
+    """
+    Builds a course's index from scratch out of the vector stores of its lectures.
+
+    Returns:
+        int: Number of vectors in the new index.
+    """
+    with _course_lock(course_id):
+        path = os.path.join(course_index_path(course_id), "index.faiss")
+        if os.path.exists(path):
+            os.remove(path)
+    for row in fetch_lectures_by_course(course_id):
+        try:
+            sync_lecture(row['lecture_id'], course_id)
+        except Exception as e:
+            print(f"Failed to index lecture {row['lecture_id']}: {e}")
+    index = load_course_index(course_id)
+    return index.ntotal if index is not None else 0
+
+
+# Process-wide pool of loaded course indexes, keyed by course_id as a string.
+course_pool = LRUPool(
+    lambda course_id: load_course_index(course_id, mmap=FAISS_MMAP),
+    sizeof=lambda index: 0 if index is None or FAISS_MMAP else index.ntotal * index.d * 4,
+    version=course_index_version)
+
+
+def search_course(course_id, query, k=5, lecture_ids=None):
+    """
+    Searches all lectures of a course with a single index lookup.
+
+    Args:
+        course_id (int): The course to search.
+        query (str): Search text, embedded with the shared embedder.
+        k (int): Number of results.
+        lecture_ids (list of int): Only return topics of these lectures.
+
+    Returns:
+        list of tuple: (lecture_id, topic_id, distance), nearest first, or None if the
+        course has no index.
+    """
+    index = course_pool.get(str(course_id))
+    if index is None:
+        return None
+    if index.ntotal == 0:
+        return []
+    vector = np.array([get_embedder().embed_query(query)], dtype=np.float32)
+    selector = lecture_selector(lecture_ids or [])
+    params = faiss.SearchParameters(sel=selector) if selector is not None else None
+    distances, ids = index.search(vector, min(k, index.ntotal), params=params)
+    return [split_vector_id(i) + (float(d),) for d, i in zip(distances[0], ids[0]) if i >= 0]
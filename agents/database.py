@@ -1,21 +1,145 @@
 # Rest server
 
 from flask import Flask, request, jsonify
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import functools
 import uuid
 import sqlite3
 import json
-import pandas as pd
 import time
+import hashlib
+import os
+import re
+import threading
+import weakref
+
+DB_PATH = os.environ.get("QUIZ_DB_PATH", "quiz.db")
+DB_MMAP_SIZE = int(os.environ.get("QUIZ_DB_MMAP_SIZE", 256 * 1024 * 1024))
+DB_CACHE_SIZE_KB = int(os.environ.get("QUIZ_DB_CACHE_SIZE_KB", 16 * 1024))
+DB_BUSY_TIMEOUT = float(os.environ.get("QUIZ_DB_BUSY_TIMEOUT", 5.0))
+# Threads running database helpers for async servers, see run_db().
+DB_ASYNC_THREADS = int(os.environ.get("QUIZ_DB_ASYNC_THREADS", 8))
+
+
+class ConnectionManager():
+    """
+    Hands out one long-lived SQLite connection per thread and per process.
+
+    Connections are opened lazily on first use, configured once with WAL journaling,
+    synchronous=NORMAL and mmap/cache pragmas, and then reused by every helper running
+    on the same thread. A thread's connection is closed when the thread exits. A connection
+    inherited through fork() is never reused; the child process opens its own.
+    """
+
+    def __init__(self, db_path, mmap_size=DB_MMAP_SIZE, cache_size_kb=DB_CACHE_SIZE_KB, busy_timeout=DB_BUSY_TIMEOUT):
+        """
+        Args:
+            db_path (str): Path of the SQLite database file.
+            mmap_size (int): Bytes of the database file to memory-map (PRAGMA mmap_size).
+            cache_size_kb (int): Page cache size per connection in KiB (PRAGMA cache_size).
+            busy_timeout (float): Seconds to wait on a locked database before failing.
+        """
+        self.db_path = db_path
+        self.mmap_size = mmap_size
+        self.cache_size_kb = cache_size_kb
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = set()
+
+    def _connect(self):
+        # The manager guarantees thread affinity itself; check_same_thread is disabled
+        # only so that close_all() may close connections owned by other threads.
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+        with self._lock:
+            self._connections.add(conn)
+        return conn
+
+    def _release(self, conn):
+        """ Closes a connection whose thread has exited, unless close_all() already did. """
+        with self._lock:
+            if conn not in self._connections:
+                return
+            self._connections.discard(conn)
+        conn.close()
+
+    def connection(self):
+        """ Returns the calling thread's connection, opening it on first use. """
+        pid = os.getpid()
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != pid:
+            if conn is not None:
+                # Inherited from the parent process: drop it without closing, the
+                # parent still owns the underlying file handle.
+                with self._lock:
+                    self._connections = set()
+            conn = self._connect()
+            self._local.conn = conn
+            self._local.pid = pid
+            # Thread-local values are dropped when their thread exits, and with this one the
+            # connection is closed: servers running a thread per request do not leak them.
+            self._local.exit = _ThreadExit()
+            weakref.finalize(self._local.exit, self._release, conn)
+        elif conn.in_transaction:
+            # A previous caller failed between a write and its commit.
+            conn.rollback()
+        return conn
+
+    def close_all(self):
+        """ Closes every connection opened by this process. """
+        with self._lock:
+            connections, self._connections = self._connections, set()
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
+class _ThreadExit():
+    """ Held in a thread's local storage only, so it is freed as the thread exits. """
+
+
+db_manager = ConnectionManager(DB_PATH)
 
 # Initialize and configure the SQLite database
 def get_db_connection():
-    conn = sqlite3.connect("quiz.db")
-    conn.row_factory = sqlite3.Row
-    return conn
+    return db_manager.connection()
 
-def create_tables():
-    conn = get_db_connection()
-    
+_db_executor = None
+
+async def run_db(fn, *args, **kwargs):
+    """
+    Awaits a blocking database helper without blocking the event loop.
+
+    Helpers run on a pool of DB_ASYNC_THREADS threads, each with its own connection, so
+    however many requests an async server holds, SQLite sees a handful of connections.
+    """
+    global _db_executor
+    if _db_executor is None:
+        _db_executor = ThreadPoolExecutor(DB_ASYNC_THREADS, thread_name_prefix="quiz-db")
+    return await asyncio.get_running_loop().run_in_executor(_db_executor, functools.partial(fn, *args, **kwargs))
+
+# Indexes backing the hot lookup paths. Each one covers its query: the selected
+# columns are either part of the index or the rowid, so no table row is read.
+HOT_PATH_INDEXES = [
+    # fetch_lectures_by_course
+    ("idx_lectures_course", "CREATE INDEX IF NOT EXISTS idx_lectures_course ON lectures (course_id, lecture_title, license)"),
+    # fetch_topics_by_lecture; _migration_8 adds the topic position to it
+    ("idx_topics_lecture", "CREATE INDEX IF NOT EXISTS idx_topics_lecture ON topics (lecture_id, topic_title)"),
+    # get_lecture_id
+    ("idx_lectures_title", "CREATE INDEX IF NOT EXISTS idx_lectures_title ON lectures (lecture_title)"),
+    # get_course_id
+    ("idx_courses_name", "CREATE INDEX IF NOT EXISTS idx_courses_name ON courses (course_name)"),
+]
+
+
+def _migration_1(conn):
+    """ Baseline schema, user_stats column fix and covering indexes for the hot lookups. """
     conn.execute('''
     CREATE TABLE IF NOT EXISTS courses (
         course_id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -56,7 +180,7 @@ def create_tables():
         CREATE TABLE IF NOT EXISTS user_stats (
             session  TEXT,
             topic_id INTEGER,
-            level    INTEGER
+            level    INTEGER,
             user_attempt INTEGER DEFAULT 0,
             user_answer TEXT DEFAULT '',
             PRIMARY KEY(session, topic_id, level)
@@ -78,8 +202,196 @@ def create_tables():
         '''
     )
 
-    conn.commit()
-    conn.close()
+    # Databases created before migrations existed have a user_stats table whose
+    # missing comma folded user_attempt into the type of the level column.
+    columns = [row['name'] for row in conn.execute("PRAGMA table_info(user_stats)")]
+    if 'user_attempt' not in columns:
+        conn.execute('''
+            CREATE TABLE user_stats_new (
+                session  TEXT,
+                topic_id INTEGER,
+                level    INTEGER,
+                user_attempt INTEGER DEFAULT 0,
+                user_answer TEXT DEFAULT '',
+                PRIMARY KEY(session, topic_id, level)
+            );
+        ''')
+        conn.execute('''
+            INSERT INTO user_stats_new (session, topic_id, level, user_answer)
+            SELECT session, topic_id, level, user_answer FROM user_stats
+        ''')
+        conn.execute("DROP TABLE user_stats")
+        conn.execute("ALTER TABLE user_stats_new RENAME TO user_stats")
+
+    for _, ddl in HOT_PATH_INDEXES:
+        conn.execute(ddl)
+
+
+def _migration_2(conn):
+    """ Leases that let one worker process generate a topic's quiz while others wait. """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS quiz_leases (
+            topic_id INTEGER PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        );
+    ''')
+
+
+def _migration_3(conn):
+    """ Cache of conceptual-clarity explanations, keyed by topic, level and chosen answer. """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS concept_cache (
+            topic_id INTEGER,
+            level INTEGER,
+            answer TEXT,
+            quiz_hash TEXT NOT NULL,
+            explanation TEXT NOT NULL,
+            created_at INTEGER,
+            PRIMARY KEY(topic_id, level, answer)
+        );
+    ''')
+
+
+def _migration_4(conn):
+    """ Source chunk of each topic, so quiz generation reads its context by key instead of searching. """
+    conn.execute("ALTER TABLE topics ADD COLUMN doc_id TEXT")
+    conn.execute("ALTER TABLE topics ADD COLUMN topic_context TEXT")
+
+
+def _migration_5(conn):
+    """ Background ingestion jobs with their per-stage progress. """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ingest_jobs (
+            job_id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            params TEXT NOT NULL,
+            status TEXT NOT NULL,
+            stage TEXT,
+            stages TEXT NOT NULL,
+            result TEXT,
+            lecture_id INTEGER,
+            error TEXT,
+            cancel_requested INTEGER DEFAULT 0,
+            owner TEXT,
+            heartbeat REAL,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        );
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ingest_jobs_status ON ingest_jobs (status)")
+
+def _migration_6(conn):
+    """ FAISS index type of each lecture's embeddings; NULL for lectures ingested as flat indexes before it was recorded. """
+    conn.execute("ALTER TABLE lectures ADD COLUMN index_type TEXT")
+
+# Questions and choices of every quiz level of a topic, as one text.
+_QUIZ_TEXT_SQL = '''
+    (SELECT group_concat(coalesce(question, '') || ' ' || coalesce(choice_a, '') || ' ' || coalesce(choice_b, '')
+                         || ' ' || coalesce(choice_c, '') || ' ' || coalesce(choice_d, ''), ' ')
+     FROM topic_quiz WHERE topic_id = {topic_id})
+'''
+
+def _migration_7(conn):
+    """ Full-text index of topic titles, summaries and quiz text, kept in sync by triggers. """
+    # The row ID of each entry is the topic ID. Quiz text spans several topic_quiz rows, so
+    # the table keeps its own copy of the text rather than pointing at an external table.
+    conn.execute('''
+        CREATE VIRTUAL TABLE topics_fts USING fts5(
+            topic_title, topic_summary, quiz_text, tokenize = 'porter unicode61'
+        )
+    ''')
+    # Title matches rank above summary matches, which rank above quiz text matches.
+    conn.execute("INSERT INTO topics_fts (topics_fts, rank) VALUES ('rank', 'bm25(10.0, 4.0, 1.0)')")
+    conn.execute(f'''
+        CREATE TRIGGER topics_fts_insert AFTER INSERT ON topics BEGIN
+            INSERT INTO topics_fts (rowid, topic_title, topic_summary, quiz_text)
+            VALUES (new.topic_id, new.topic_title, new.topic_summary, {_QUIZ_TEXT_SQL.format(topic_id='new.topic_id')});
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER topics_fts_update AFTER UPDATE OF topic_title, topic_summary ON topics BEGIN
+            UPDATE topics_fts SET topic_title = new.topic_title, topic_summary = new.topic_summary
+            WHERE rowid = new.topic_id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER topics_fts_delete AFTER DELETE ON topics BEGIN
+            DELETE FROM topics_fts WHERE rowid = old.topic_id;
+        END
+    ''')
+    for event, row in (("INSERT", "new"), ("UPDATE", "new"), ("DELETE", "old")):
+        conn.execute(f'''
+            CREATE TRIGGER topic_quiz_fts_{event.lower()} AFTER {event} ON topic_quiz BEGIN
+                UPDATE topics_fts SET quiz_text = {_QUIZ_TEXT_SQL.format(topic_id=f'{row}.topic_id')}
+                WHERE rowid = {row}.topic_id;
+            END
+        ''')
+    conn.execute(f'''
+        INSERT INTO topics_fts (rowid, topic_title, topic_summary, quiz_text)
+        SELECT topic_id, topic_title, topic_summary, {_QUIZ_TEXT_SQL.format(topic_id='topics.topic_id')} FROM topics
+    ''')
+
+def _migration_8(conn):
+    """ Position of each topic's chunk in the lecture, which topics are listed in. """
+    conn.execute("ALTER TABLE topics ADD COLUMN position INTEGER")
+    # Topics were listed in creation order so far.
+    conn.execute('''
+        UPDATE topics SET position = (
+            SELECT COUNT(*) FROM topics t WHERE t.lecture_id = topics.lecture_id AND t.topic_id < topics.topic_id)
+    ''')
+    conn.execute("DROP INDEX IF EXISTS idx_topics_lecture")
+    conn.execute("CREATE INDEX idx_topics_lecture ON topics (lecture_id, position, topic_title)")
+
+
+# Ordered schema migrations. The database's PRAGMA user_version records how many
+# of them have been applied; append new migrations, never edit applied ones.
+MIGRATIONS = [
+    _migration_1,
+    _migration_2,
+    _migration_3,
+    _migration_4,
+    _migration_5,
+    _migration_6,
+    _migration_7,
+    _migration_8,
+]
+
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn):
+    """
+    Applies pending schema migrations, each in its own transaction.
+
+    The version is re-read after taking the write lock so that concurrently starting
+    processes apply every migration exactly once.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the database to migrate.
+
+    Returns:
+        int: The schema version after migrating.
+    """
+    version = get_schema_version(conn)
+    while version < len(MIGRATIONS):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = get_schema_version(conn)
+            if version < len(MIGRATIONS):
+                MIGRATIONS[version](conn)
+                version += 1
+                conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return version
+
+def create_tables():
+    """ Brings the schema up to date; a no-op apart from one PRAGMA read when it already is. """
+    migrate(get_db_connection())
 
 
 def add_session(session):
@@ -87,7 +399,6 @@ def add_session(session):
     start_time = int(time.time())
     conn.execute("INSERT INTO session (session, start_time) VALUES (?, ?)", (session, start_time))    
     conn.commit()
-    conn.close()
 
 def session_exists(session):
     conn = get_db_connection()
@@ -106,13 +417,11 @@ def session_exists(session):
     finally:
         # Close the cursor
         cur.close()
-        conn.close()
 
 def add_user_stats(session, topic_id, level):
     conn = get_db_connection()
     conn.execute("INSERT INTO user_stats (session, answer) VALUES (?, ?)", (session, answer))
     conn.commit()
-    conn.close()
 
 
 def update_user_user_stats(session, topic_id, level, new_answer):
@@ -141,10 +450,9 @@ def update_user_user_stats(session, topic_id, level, new_answer):
         print(f"No session found with the identifier '{session}'. No update performed.")
     
     cursor.close()
-    conn.close()
 
 def update_topic_summary(topic_id, new_summary):
-    conn = get_db_connection()  # This function needs to be defined to handle your database connection
+    conn = get_db_connection()
     """ Update the summary of a topic in the topics table """
     try:
         cursor = conn.cursor()
@@ -156,46 +464,69 @@ def update_topic_summary(topic_id, new_summary):
         conn.commit()
         cursor.close()
     except Exception as e:
+        conn.rollback()
         print("An error occurred while updating the topic summary:", e)
-    finally:
-        conn.close()
 
 def get_topic_title(topic_id):
     conn = get_db_connection()
-    query = "SELECT topic_title FROM topics WHERE topic_id = ?;"
-    df = pd.read_sql_query(query, conn, params=(topic_id,))
-    conn.close()
-
-    if not df.empty:
-        topic = df.iloc[0]['topic_title']
-        return topic    
-    else:
-        return None
+    row = conn.execute("SELECT topic_title FROM topics WHERE topic_id = ?;", (topic_id,)).fetchone()
+    return row['topic_title'] if row else None
 
 def get_topic_lecture_id(topic_id):
     conn = get_db_connection()
-    query = "SELECT lecture_id FROM topics WHERE topic_id = ?;"
-    df = pd.read_sql_query(query, conn, params=(topic_id,))
-    conn.close()
-
-    if not df.empty:
-        lecture_id = df.iloc[0]['lecture_id']
-        return lecture_id    
-    else:
-        return None
+    row = conn.execute("SELECT lecture_id FROM topics WHERE topic_id = ?;", (topic_id,)).fetchone()
+    return row['lecture_id'] if row else None
 
 def get_topic_summary(topic_id):
     conn = get_db_connection()
-    query = "SELECT topic_summary FROM topics WHERE topic_id = ?;"
-    df = pd.read_sql_query(query, conn, params=(topic_id,))
-    conn.close()
+    row = conn.execute("SELECT topic_summary FROM topics WHERE topic_id = ?;", (topic_id,)).fetchone()
+    return row['topic_summary'] if row else None
 
-    if not df.empty:
-        topic_summary = df.iloc[0]['topic_summary']
-        return topic_summary    
-    else:
+def get_topic_bundle(topic_id):
+    """
+    Reads everything the quiz endpoints need about a topic in a single query.
+
+    Args:
+        topic_id (int): The ID of the topic.
+
+    Returns:
+        dict: {'topic_id', 'title', 'summary', 'lecture_id', 'doc_id', 'context', 'quiz'} where
+        'context' is the source chunk of the topic (None for topics created before it was
+        stored) and 'quiz' maps each cached level to a dict shaped like get_topic_quiz()
+        output, or None if the topic does not exist.
+    """
+    conn = get_db_connection()
+    rows = conn.execute('''
+        SELECT t.topic_title, t.topic_summary, t.lecture_id, t.doc_id, t.topic_context,
+               q.level, q.question, q.choice_a, q.choice_b, q.choice_c, q.choice_d, q.answer
+        FROM topics t
+        LEFT JOIN topic_quiz q ON q.topic_id = t.topic_id
+        WHERE t.topic_id = ?
+        ORDER BY q.level
+    ''', (topic_id,)).fetchall()
+    if not rows:
         return None
 
+    first = rows[0]
+    bundle = {
+        'topic_id': topic_id,
+        'title': first['topic_title'],
+        'summary': first['topic_summary'],
+        'lecture_id': first['lecture_id'],
+        'doc_id': first['doc_id'],
+        'context': first['topic_context'],
+        'quiz': {}
+    }
+    for row in rows:
+        if row['level'] is None:
+            continue
+        bundle['quiz'][row['level']] = {
+            'question': row['question'],
+            'choices': [row['choice_a'], row['choice_b'], row['choice_c'], row['choice_d']],
+            'answer': row['answer']
+        }
+    return bundle
+
 def insert_topic_quiz(topic_id, level,  question, choices, answer):
     conn = get_db_connection()
     """ Insert a new topic quiz into the topic_quiz table or update if it already exists """
@@ -219,8 +550,9 @@ def insert_topic_quiz(topic_id, level,  question, choices, answer):
               choices[3],
               answer))
         conn.commit()
-    finally:
-        conn.close()
+    except Exception:
+        conn.rollback()
+        raise
 
 def get_topic_quiz(topic_id, level):
     conn = get_db_connection()
@@ -252,8 +584,192 @@ def get_topic_quiz(topic_id, level):
     except Exception as e:
         print("An error occurred while retrieving the topic quiz:", e)
         return None
-    finally:
-        conn.close()
+
+def insert_topic_quiz_set(topic_id, summary, quizzes):
+    """
+    Stores all levels of a topic's quiz and its summary in one transaction, so readers
+    never observe a partially written quiz.
+
+    Args:
+        topic_id (int): The ID of the topic.
+        summary (str): The topic summary produced with the quiz.
+        quizzes (list of tuple): (level, question, choices, answer) per level.
+    """
+    conn = get_db_connection()
+    try:
+        conn.executemany('''
+            INSERT INTO topic_quiz (topic_id, level, question, choice_a, choice_b, choice_c, choice_d, answer)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(topic_id, level) DO UPDATE SET
+            question=excluded.question,
+            choice_a=excluded.choice_a,
+            choice_b=excluded.choice_b,
+            choice_c=excluded.choice_c,
+            choice_d=excluded.choice_d,
+            answer=excluded.answer
+        ''', [(topic_id, level, question, choices[0], choices[1], choices[2], choices[3], answer)
+              for level, question, choices, answer in quizzes])
+        conn.execute("UPDATE topics SET topic_summary = ? WHERE topic_id = ?", (summary, topic_id))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+def has_topic_quiz(topic_id):
+    conn = get_db_connection()
+    row = conn.execute("SELECT EXISTS(SELECT 1 FROM topic_quiz WHERE topic_id = ?)", (topic_id,)).fetchone()
+    return bool(row[0])
+
+def acquire_quiz_lease(topic_id, owner, ttl):
+    """
+    Takes the generation lease of a topic for `ttl` seconds.
+
+    The lease is granted when nobody holds it, when the current lease has expired (its
+    holder died or hung), or when `owner` already holds it.
+
+    Returns:
+        bool: True if `owner` now holds the lease.
+    """
+    conn = get_db_connection()
+    now = time.time()
+    try:
+        cursor = conn.execute('''
+            INSERT INTO quiz_leases (topic_id, owner, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT(topic_id) DO UPDATE SET
+                owner=excluded.owner,
+                expires_at=excluded.expires_at
+            WHERE quiz_leases.expires_at < ? OR quiz_leases.owner = excluded.owner
+        ''', (topic_id, owner, now + ttl, now))
+        conn.commit()
+        return cursor.rowcount == 1
+    except Exception:
+        conn.rollback()
+        raise
+
+def release_quiz_lease(topic_id, owner):
+    conn = get_db_connection()
+    conn.execute("DELETE FROM quiz_leases WHERE topic_id = ? AND owner = ?", (topic_id, owner))
+    conn.commit()
+
+def quiz_content_hash(topic_summary, quiz_dict):
+    """ Fingerprint of everything an explanation is generated from; changes when the quiz is regenerated. """
+    content = json.dumps([topic_summary, quiz_dict["question"], quiz_dict["choices"], quiz_dict["answer"]])
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+def get_cached_explanation(topic_id, level, answer, quiz_hash):
+    """ Returns the cached explanation, or None if missing or generated for a different quiz. """
+    conn = get_db_connection()
+    row = conn.execute('''
+        SELECT explanation FROM concept_cache
+        WHERE topic_id = ? AND level = ? AND answer = ? AND quiz_hash = ?
+    ''', (topic_id, level, answer, quiz_hash)).fetchone()
+    return row['explanation'] if row else None
+
+def cache_explanation(topic_id, level, answer, quiz_hash, explanation):
+    conn = get_db_connection()
+    try:
+        conn.execute('''
+            INSERT INTO concept_cache (topic_id, level, answer, quiz_hash, explanation, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(topic_id, level, answer) DO UPDATE SET
+                quiz_hash=excluded.quiz_hash,
+                explanation=excluded.explanation,
+                created_at=excluded.created_at
+        ''', (topic_id, level, answer, quiz_hash, explanation, int(time.time())))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+def _job_from_row(row):
+    job = dict(row)
+    job['params'] = json.loads(job['params'])
+    job['stages'] = json.loads(job['stages'])
+    job['result'] = json.loads(job['result']) if job['result'] else None
+    job['cancel_requested'] = bool(job['cancel_requested'])
+    return job
+
+def create_job(job_id, kind, params, stage_names, owner):
+    """ Records a queued job, leased to `owner`, with every stage pending. """
+    conn = get_db_connection()
+    now = time.time()
+    stages = {name: {'status': 'pending'} for name in stage_names}
+    conn.execute('''
+        INSERT INTO ingest_jobs (job_id, kind, params, status, stages, owner, heartbeat, created_at, updated_at)
+        VALUES (?, ?, ?, 'queued', ?, ?, ?, ?, ?)
+    ''', (job_id, kind, json.dumps(params), json.dumps(stages), owner, now, now, now))
+    conn.commit()
+
+def get_job(job_id):
+    conn = get_db_connection()
+    row = conn.execute("SELECT * FROM ingest_jobs WHERE job_id = ?", (job_id,)).fetchone()
+    return _job_from_row(row) if row else None
+
+def update_job(job_id, **fields):
+    """ Updates columns of a job; 'stages' and 'result' are stored as JSON. """
+    for key in ('stages', 'result'):
+        if key in fields and fields[key] is not None:
+            fields[key] = json.dumps(fields[key])
+    fields['updated_at'] = time.time()
+    assignments = ", ".join(f"{column} = ?" for column in fields)
+    conn = get_db_connection()
+    conn.execute(f"UPDATE ingest_jobs SET {assignments} WHERE job_id = ?", (*fields.values(), job_id))
+    conn.commit()
+
+def request_job_cancel(job_id):
+    """
+    Asks a job to stop. A queued job is cancelled at once; a running one stops before its
+    next stage.
+
+    Returns:
+        dict: The job after the request, or None if it does not exist.
+    """
+    conn = get_db_connection()
+    now = time.time()
+    conn.execute('''
+        UPDATE ingest_jobs
+        SET cancel_requested = 1,
+            status = CASE WHEN status = 'queued' THEN 'cancelled' ELSE status END,
+            updated_at = ?
+        WHERE job_id = ? AND status IN ('queued', 'running')
+    ''', (now, job_id))
+    conn.commit()
+    return get_job(job_id)
+
+def claim_stale_jobs(owner, ttl):
+    """
+    Takes over the unfinished jobs whose owner stopped heartbeating for `ttl` seconds,
+    e.g. because the server restarted in the middle of them.
+
+    Returns:
+        list of str: IDs of the jobs now owned by `owner`.
+    """
+    conn = get_db_connection()
+    now = time.time()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        rows = conn.execute('''
+            SELECT job_id FROM ingest_jobs
+            WHERE status IN ('queued', 'running') AND (heartbeat IS NULL OR heartbeat < ?)
+            ORDER BY created_at
+        ''', (now - ttl,)).fetchall()
+        job_ids = [row['job_id'] for row in rows]
+        conn.executemany("UPDATE ingest_jobs SET owner = ?, heartbeat = ?, updated_at = ? WHERE job_id = ?",
+                         [(owner, now, now, job_id) for job_id in job_ids])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return job_ids
+
+def heartbeat_jobs(owner):
+    """ Renews the lease of every unfinished job of `owner`. """
+    conn = get_db_connection()
+    conn.execute('''
+        UPDATE ingest_jobs SET heartbeat = ?
+        WHERE owner = ? AND status IN ('queued', 'running')
+    ''', (time.time(), owner))
+    conn.commit()
 
 def fetch_lectures_by_course(course_id):
     conn = get_db_connection()
@@ -261,21 +777,33 @@ def fetch_lectures_by_course(course_id):
     cursor = conn.cursor()
     cursor.execute(query, (course_id,))
     rows = cursor.fetchall()  # Fetch all rows as a list of tuples
-    conn.close()
     return rows
 
 
 def fetch_topics_by_lecture(lecture_id):
     conn = get_db_connection()
     query = """
-        SELECT topic_id, topic_title FROM topics WHERE lecture_id = ?;
+        SELECT topic_id, topic_title FROM topics WHERE lecture_id = ? ORDER BY position;
     """
     cursor = conn.cursor()
     cursor.execute(query, (lecture_id,))
     rows = cursor.fetchall()  # Fetch all rows as a list of tuples
-    conn.close()
     return rows
 
+def fetch_topics_without_quiz(lecture_id=None):
+    """ Returns the IDs of topics that have no cached quiz yet, optionally for one lecture only. """
+    conn = get_db_connection()
+    query = """
+        SELECT topic_id FROM topics t
+        WHERE NOT EXISTS (SELECT 1 FROM topic_quiz q WHERE q.topic_id = t.topic_id)
+    """
+    params = ()
+    if lecture_id is not None:
+        query += " AND lecture_id = ?"
+        params = (lecture_id,)
+    rows = conn.execute(query + " ORDER BY topic_id;", params).fetchall()
+    return [row['topic_id'] for row in rows]
+
 # Functions used by course_agent
 #
 def insert_course(course_name, description, author):
@@ -289,7 +817,6 @@ def insert_course(course_name, description, author):
     # Retrieve the ID of the newly inserted course
     course_id = cursor.lastrowid
     cursor.close()
-    conn.close()
     return course_id
 
 def insert_lecture(course_id, lecture_title, license):
@@ -302,29 +829,141 @@ def insert_lecture(course_id, lecture_title, license):
     conn.commit()
     lecture_id = cursor.lastrowid  # Retrieve the ID of the newly inserted lecture
     cursor.close()
-    conn.close()
     return lecture_id
 
-def insert_topic(lecture_id, topic_title):
+def insert_job_lecture(job_id, course_id, lecture_title, license):
+    """
+    Inserts a lecture and records it as the lecture of ingestion job `job_id`, in one transaction.
+
+    Returns:
+        int: The ID of the new lecture.
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute('''
+            INSERT INTO lectures (course_id, lecture_title, license) VALUES (?, ?, ?)
+        ''', (course_id, lecture_title, license))
+        lecture_id = cursor.lastrowid
+        conn.execute("UPDATE ingest_jobs SET lecture_id = ?, updated_at = ? WHERE job_id = ?",
+                     (lecture_id, time.time(), job_id))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return lecture_id
+
+def insert_topic(lecture_id, topic_title, doc_id=None, topic_context=None):
+    """
+    Inserts a topic of a lecture.
+
+    Args:
+        lecture_id (int): The lecture the topic belongs to.
+        topic_title (str): The generated topic title.
+        doc_id (str): Docstore id of the chunk the topic was generated from.
+        topic_context (str): Text of that chunk, given to the agents as the topic context.
+
+    Returns:
+        int: The ID of the new topic.
+    """
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute('''
-    INSERT INTO topics (lecture_id, topic_title) 
-    VALUES (?, ?);
-    ''', (lecture_id, topic_title))
+    INSERT INTO topics (lecture_id, topic_title, doc_id, topic_context, position)
+    VALUES (?, ?, ?, ?, (SELECT coalesce(max(position) + 1, 0) FROM topics WHERE lecture_id = ?));
+    ''', (lecture_id, topic_title, doc_id, topic_context, lecture_id))
     conn.commit()
     topic_id = cursor.lastrowid  # Retrieve the ID of the newly inserted topic
     cursor.close()
-    conn.close()
     return topic_id
 
+def _insert_topics(conn, lecture_id, topics):
+    # Runs inside a BEGIN IMMEDIATE transaction: the write lock is held from its start,
+    # so the AUTOINCREMENT ids of the new rows are consecutive. The topics follow those
+    # already in the lecture.
+    start = conn.execute("SELECT coalesce(max(position) + 1, 0) FROM topics WHERE lecture_id = ?",
+                         (lecture_id,)).fetchone()[0]
+    conn.executemany('''
+    INSERT INTO topics (lecture_id, topic_title, doc_id, topic_context, position)
+    VALUES (?, ?, ?, ?, ?);
+    ''', [(lecture_id, title, doc_id, context, start + i) for i, (title, doc_id, context) in enumerate(topics)])
+    last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+    return list(range(last_id - len(topics) + 1, last_id + 1))
+
+def insert_topics(lecture_id, topics):
+    """
+    Inserts all topics of a lecture in a single transaction.
+
+    Args:
+        lecture_id (int): The lecture the topics belong to.
+        topics (list of tuple): (topic_title, doc_id, topic_context) per topic, in order.
+
+    Returns:
+        list of int: The IDs of the new topics, in the same order.
+    """
+    if not topics:
+        return []
+    conn = get_db_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        topic_ids = _insert_topics(conn, lecture_id, topics)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return topic_ids
+
+def fetch_topic_doc_ids(lecture_id):
+    """ Returns (topic_id, doc_id) for every topic of a lecture, in creation order; doc_id may be None. """
+    conn = get_db_connection()
+    rows = conn.execute("SELECT topic_id, doc_id FROM topics WHERE lecture_id = ? ORDER BY topic_id",
+                        (lecture_id,)).fetchall()
+    return [(row['topic_id'], row['doc_id']) for row in rows]
+
+def update_lecture_topics(lecture_id, removed_doc_ids, new_topics, doc_id_updates=(), doc_order=()):
+    """
+    Applies an incremental re-ingest of a lecture in a single transaction.
+
+    Topics whose chunk disappeared are deleted together with their cached quiz and
+    explanations; topics of unchanged chunks, and everything cached for them, are kept.
+
+    Args:
+        lecture_id (int): The re-ingested lecture.
+        removed_doc_ids (list of str): Docstore ids of chunks no longer in the transcript.
+        new_topics (list of tuple): (topic_title, doc_id, topic_context) of new chunks.
+        doc_id_updates (list of tuple): (doc_id, topic_id) pairs recording the chunk of
+            topics created before doc ids were stored.
+        doc_order (list of str): Docstore ids of the lecture's chunks in transcript order;
+            topics are renumbered to follow it.
+
+    Returns:
+        list of int: The IDs of the new topics.
+    """
+    conn = get_db_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany("UPDATE topics SET doc_id = ? WHERE topic_id = ?", list(doc_id_updates))
+        removed = [(lecture_id, doc_id) for doc_id in removed_doc_ids]
+        for table in ("topic_quiz", "concept_cache", "quiz_leases"):
+            conn.executemany(f'''
+                DELETE FROM {table} WHERE topic_id IN
+                    (SELECT topic_id FROM topics WHERE lecture_id = ? AND doc_id = ?)
+            ''', removed)
+        conn.executemany("DELETE FROM topics WHERE lecture_id = ? AND doc_id = ?", removed)
+        topic_ids = _insert_topics(conn, lecture_id, new_topics) if new_topics else []
+        conn.executemany("UPDATE topics SET position = ? WHERE lecture_id = ? AND doc_id = ?",
+                         [(position, lecture_id, doc_id) for position, doc_id in enumerate(doc_order)])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return topic_ids
+
 def get_course_id(course_name):
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute("SELECT course_id FROM courses WHERE course_name = ?", (course_name,))
     result = cursor.fetchone()
     cursor.close()
-    conn.close()
     return result['course_id'] if result else None
 
 def get_lecture_id(lecture_title):
@@ -333,9 +972,90 @@ def get_lecture_id(lecture_title):
     cursor.execute("SELECT lecture_id FROM lectures WHERE lecture_title = ?", (lecture_title,))
     result = cursor.fetchone()
     cursor.close()
-    conn.close()
     return result['lecture_id'] if result else None
 
+def set_lecture_index_type(lecture_id, index_type):
+    conn = get_db_connection()
+    conn.execute("UPDATE lectures SET index_type = ? WHERE lecture_id = ?", (index_type, lecture_id))
+    conn.commit()
+
+def get_lecture_index_type(lecture_id):
+    """ Returns the FAISS index type of a lecture's embeddings, "flat" if none was recorded. """
+    conn = get_db_connection()
+    row = conn.execute("SELECT index_type FROM lectures WHERE lecture_id = ?", (lecture_id,)).fetchone()
+    return (row['index_type'] if row else None) or "flat"
+
+def get_lecture_course_id(lecture_id):
+    conn = get_db_connection()
+    row = conn.execute("SELECT course_id FROM lectures WHERE lecture_id = ?", (lecture_id,)).fetchone()
+    return row['course_id'] if row else None
+
+def fetch_topics_by_ids(topic_ids):
+    """ Returns {topic_id: row} with the topic_title, lecture_id and lecture_title of each existing topic. """
+    if not topic_ids:
+        return {}
+    conn = get_db_connection()
+    rows = conn.execute(f'''
+        SELECT t.topic_id, t.topic_title, t.lecture_id, l.lecture_title
+        FROM topics t JOIN lectures l ON l.lecture_id = t.lecture_id
+        WHERE t.topic_id IN ({", ".join("?" * len(topic_ids))})
+    ''', list(topic_ids)).fetchall()
+    return {row['topic_id']: row for row in rows}
+
+def fts_query(text):
+    """
+    Turns free text into an FTS5 query matching topics that contain every word, the last one
+    as a prefix so that partially typed words match. FTS5 operators in the text are ignored.
+    """
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        return None
+    return " ".join(f'"{word}"' for word in words) + "*"
+
+def search_topics(query, course_id=None, lecture_ids=None, limit=10):
+    """
+    Keyword search over topic titles, summaries and quiz text, ranked by BM25.
+
+    Args:
+        query (str): Free text, see `fts_query`.
+        course_id (int): Only return topics of this course.
+        lecture_ids (list of int): Only return topics of these lectures.
+        limit (int): Maximum number of results.
+
+    Returns:
+        list of sqlite3.Row: topic_id, topic_title, lecture_id, lecture_title and score
+        (higher is better), best first.
+    """
+    match = fts_query(query)
+    if match is None:
+        return []
+    conditions, params = ["topics_fts MATCH ?"], [match]
+    if course_id is not None:
+        conditions.append("l.course_id = ?")
+        params.append(course_id)
+    if lecture_ids:
+        conditions.append(f"t.lecture_id IN ({', '.join('?' * len(lecture_ids))})")
+        params.extend(lecture_ids)
+    conn = get_db_connection()
+    return conn.execute(f'''
+        SELECT t.topic_id, t.topic_title, t.lecture_id, l.lecture_title, -f.rank AS score
+        FROM topics_fts f
+        JOIN topics t ON t.topic_id = f.rowid
+        JOIN lectures l ON l.lecture_id = t.lecture_id
+        WHERE {" AND ".join(conditions)}
+        ORDER BY f.rank
+        LIMIT ?
+    ''', params + [limit]).fetchall()
+
+def get_course_lecture_id(course_id, lecture_title):
+    """ Returns the ID of the course's lecture with this title, or None. """
+    conn = get_db_connection()
+    row = conn.execute('''
+        SELECT lecture_id FROM lectures WHERE course_id = ? AND lecture_title = ?
+        ORDER BY lecture_id LIMIT 1
+    ''', (course_id, lecture_title)).fetchone()
+    return row['lecture_id'] if row else None
+
 def delete_lecture_by_id(lecture_id):
     conn =  get_db_connection()
     cursor = conn.cursor()
@@ -361,9 +1081,8 @@ def delete_lecture_by_id(lecture_id):
         print(f"An error occurred: {e}")
         return False
     finally:
-        # Close the database connection
+        # Close the cursor
         cursor.close()
-        conn.close()
 
 
 def delete_topics_by_lecture(lecture_id):
@@ -403,8 +1122,7 @@ def delete_topics_by_lecture(lecture_id):
         raise Exception(f"An error occurred: {e}")
 
     finally:
-        # Close the database connection
+        # Close the cursor
         cur.close()
-        conn.close()
 
 create_tables()  # Ensure the table is created
@@ -0,0 +1,155 @@
+import json
+import os
+import sqlite3
+import threading
+
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_core.documents import Document
+
+DOCSTORE_FILE = "docstore.db"
+
+
+class SQLiteDocstore(Docstore, AddableMixin):
+    """
+    Chunks of a lecture's vector store kept in a SQLite file instead of a pickle.
+
+    Opening the store reads nothing; each search() reads one row, so a loaded lecture keeps
+    only its vectors in memory and no pickle is ever deserialized. The file is written once,
+    by a `DocstoreWriter`, and then only read: documents added to or deleted from a loaded
+    store are kept in memory until the store is saved again.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): The SQLite file written by `write_docstore`.
+        """
+        self.path = path
+        self._added = {}
+        self._deleted = set()
+        self._local = threading.local()
+
+    def _connection(self):
+        # One connection per thread and process. The file is replaced, never modified, so
+        # it can be opened immutable: no locking and no journal files.
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro&immutable=1", uri=True, check_same_thread=False)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def search(self, search):
+        if search in self._added:
+            return self._added[search]
+        if search in self._deleted:
+            return f"ID {search} not found."
+        row = self._connection().execute(
+            "SELECT page_content, metadata FROM docs WHERE doc_id = ?", (search,)).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(page_content=row[0], metadata=json.loads(row[1]))
+
+    def add(self, texts):
+        overlapping = [doc_id for doc_id in texts if not isinstance(self.search(doc_id), str)]
+        if overlapping:
+            raise ValueError(f"Tried to add ids that already exist: {overlapping}")
+        self._deleted.difference_update(texts)
+        self._added.update(texts)
+
+    def delete(self, ids):
+        for doc_id in ids:
+            self._added.pop(doc_id, None)
+        self._deleted.update(ids)
+
+    def index_to_docstore_id(self):
+        """ Returns the FAISS position -> document ID mapping stored with the chunks, in position order. """
+        # Without ORDER BY, SQLite scans the doc_id index and returns the rows by doc_id.
+        return dict(self._connection().execute("SELECT position, doc_id FROM docs ORDER BY position"))
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+        self._local.conn = None
+
+
+class DocstoreWriter():
+    """
+    Writes a SQLite docstore file one document at a time, so a store being built never has to
+    hold its chunks in memory.
+
+    Rows go to a file next to `path`, which `commit` moves into place: readers of the previous
+    version are never exposed to a partial file. `abort` discards it.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): Destination file.
+        """
+        self.path = path
+        self.count = 0
+        self._tmp_path = f"{path}.tmp"
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+        self._conn = sqlite3.connect(self._tmp_path)
+        # Chunks are up to TOPIC_SIZE characters: larger pages waste less space per row.
+        self._conn.execute("PRAGMA page_size = 16384")
+        self._conn.execute('''
+            CREATE TABLE docs (
+                position INTEGER PRIMARY KEY,
+                doc_id TEXT NOT NULL UNIQUE,
+                page_content TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            )
+        ''')
+
+    def add(self, documents):
+        """
+        Args:
+            documents (iterable): (position, doc_id, Document) tuples, position being the
+                document's vector in the FAISS index.
+        """
+        rows = ((position, doc_id, document.page_content, json.dumps(document.metadata, default=str))
+                for position, doc_id, document in documents)
+        self.count += self._conn.executemany("INSERT INTO docs VALUES (?, ?, ?, ?)", rows).rowcount
+
+    def commit(self):
+        """ Finishes the file and moves it into place. """
+        try:
+            self._conn.commit()
+        finally:
+            self._conn.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        """ Discards the documents written so far. """
+        self._conn.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+def write_docstore(path, docstore, index_to_docstore_id):
+    """
+    Writes the documents of a vector store to a SQLite docstore file, see `DocstoreWriter`.
+
+    Args:
+        path (str): Destination file.
+        docstore (Docstore): Any docstore holding the documents, e.g. the InMemoryDocstore of
+            a freshly built FAISS store or a SQLiteDocstore.
+        index_to_docstore_id (dict): The store's FAISS position -> document ID mapping.
+    """
+    def documents():
+        for position, doc_id in sorted(index_to_docstore_id.items()):
+            document = docstore.search(doc_id)
+            if isinstance(document, str):
+                raise ValueError(f"Document {doc_id} of position {position} is missing from the docstore")
+            yield position, doc_id, document
+
+    writer = DocstoreWriter(path)
+    try:
+        writer.add(documents())
+    except Exception:
+        writer.abort()
+        raise
+    writer.commit()
@@ -0,0 +1,115 @@
+import hashlib
+import os
+import threading
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from agents.database import ConnectionManager
+
+EMBEDDING_CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH", "embedding_cache.db")
+EMBEDDING_CACHE_ENABLED = os.environ.get("EMBEDDING_CACHE_ENABLED", "1") == "1"
+
+# Keys per SELECT ... IN (...) lookup, below SQLite's bound parameter limit.
+_LOOKUP_BATCH = 500
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embedding model with a persistent cache keyed by a hash of the model and the text.
+
+    Vectors are stored locally as float32 blobs, so repeated queries (topic titles) and
+    unchanged chunks of a re-ingested transcript never reach the embedding API again. Cache
+    misses of a batch are sent to the wrapped model in a single call.
+    """
+
+    def __init__(self, embedder, db_path=EMBEDDING_CACHE_PATH, namespace=None):
+        """
+        Args:
+            embedder (Embeddings): The embedding model to wrap.
+            db_path (str): SQLite file holding the cached vectors.
+            namespace (str): Identifies the model in cache keys; defaults to its model name.
+        """
+        self.embedder = embedder
+        self.namespace = namespace or getattr(embedder, "model", None) or type(embedder).__name__
+        self._db = ConnectionManager(db_path)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        conn = self._db.connection()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL
+            );
+        ''')
+        conn.commit()
+
+    def _key(self, kind, text):
+        # Query and document embeddings differ for some models, so they are keyed apart.
+        return hashlib.sha256(f"{self.namespace}\0{kind}\0{text}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, keys):
+        conn = self._db.connection()
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        for start in range(0, len(unique), _LOOKUP_BATCH):
+            batch = unique[start:start + _LOOKUP_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            for row in conn.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch):
+                found[row['key']] = np.frombuffer(row['vector'], dtype=np.float32).tolist()
+        return found
+
+    def _store(self, items):
+        conn = self._db.connection()
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def _count(self, hits, misses):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def embed_documents(self, texts):
+        keys = [self._key("document", text) for text in texts]
+        found = self._lookup(keys)
+
+        # Embed each distinct missing text once, in a single call to the wrapped model.
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+        if missing:
+            vectors = self.embedder.embed_documents(list(missing.values()))
+            computed = list(zip(missing.keys(), vectors))
+            self._store(computed)
+            found.update(computed)
+
+        self._count(len(texts) - len(missing), len(missing))
+        return [found[key] for key in keys]
+
+    def embed_query(self, text):
+        key = self._key("query", text)
+        found = self._lookup([key])
+        if key in found:
+            self._count(1, 0)
+            return found[key]
+        vector = self.embedder.embed_query(text)
+        self._store([(key, vector)])
+        self._count(0, 1)
+        return vector
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
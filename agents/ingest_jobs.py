@@ -0,0 +1,205 @@
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from agents.database import (
+    insert_job_lecture,
+    create_job,
+    get_job,
+    update_job,
+    request_job_cancel,
+    claim_stale_jobs,
+    heartbeat_jobs,
+    fetch_topics_by_lecture)
+
+INGEST_JOB_CONCURRENCY = int(os.environ.get("INGEST_JOB_CONCURRENCY", 2))
+# Seconds without a heartbeat after which an unfinished job is taken over by another runner.
+INGEST_JOB_LEASE_TTL = float(os.environ.get("INGEST_JOB_LEASE_TTL", 60))
+
+
+# Stages of a lecture creation job. Each one receives the job record and returns the fields
+# to add to the job result; a 'lecture_id' is also stored on the job itself. Stages are
+# skipped once done, so a job resumed after a restart continues where it stopped.
+# course_agent is imported on first use: it builds its LLM and embedding clients on import.
+
+def _stage_lecture(job):
+    if job['lecture_id'] is not None:
+        return {}
+    # The lecture is recorded on the job in the same transaction, so a job interrupted
+    # right after this stage does not create a second lecture when resumed.
+    params = job['params']
+    return {'lecture_id': insert_job_lecture(job['job_id'], params['course_id'], params['lecture_name'],
+                                             params['lecture_license'])}
+
+def _stage_embedding(job):
+    from agents.course_agent import create_embedding
+    params = job['params']
+    create_embedding(params['lecture_source'], job['lecture_id'], params.get('index_type'))
+
+def _stage_titles(job):
+    # Topics are inserted in one transaction, so any topic means the stage completed
+    # before a restart interrupted the job.
+    if fetch_topics_by_lecture(job['lecture_id']):
+        return {}
+    from agents.course_agent import generate_topic_titles
+    generate_topic_titles(job['lecture_id'])
+
+def _stage_quizzes(job):
+    from agents.quiz_pregen import queue_lecture_quizzes
+    return {'quizzes_queued': queue_lecture_quizzes(job['lecture_id'])}
+
+LECTURE_CREATE_STAGES = [
+    ("lecture", _stage_lecture),
+    ("embedding", _stage_embedding),
+    ("titles", _stage_titles),
+    ("quizzes", _stage_quizzes),
+]
+
+
+class JobRunner():
+    """
+    Runs multi-stage ingestion jobs on a background worker pool.
+
+    Job state and per-stage progress live in the ingest_jobs table, so any server process
+    can report on a job. While a runner works on a job it renews the job's lease; jobs
+    whose runner disappeared (a restart, a crash) are picked up again by recover(), which
+    the runner also calls along with every lease renewal, so a job orphaned by a quick
+    restart is taken over once its lease expires.
+    Cancellation is cooperative: a running job stops before its next stage.
+    """
+
+    def __init__(self, stages=LECTURE_CREATE_STAGES, kind="lecture_create",
+                 concurrency=INGEST_JOB_CONCURRENCY, lease_ttl=INGEST_JOB_LEASE_TTL):
+        """
+        Args:
+            stages (list of tuple): (name, fn) pairs run in order, see LECTURE_CREATE_STAGES.
+            kind (str): The kind recorded on submitted jobs.
+            concurrency (int): Maximum number of jobs running at the same time.
+            lease_ttl (float): Seconds without a heartbeat before a job counts as abandoned.
+        """
+        self.stages = stages
+        self.kind = kind
+        self.lease_ttl = lease_ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="ingest-job")
+        # Jobs queued or running on this runner, never resubmitted by recover().
+        self._active = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._heartbeat = threading.Thread(target=self._renew_leases, name="ingest-job-heartbeat", daemon=True)
+        self._heartbeat.start()
+
+    def submit(self, params):
+        """
+        Records a new job and queues it.
+
+        Returns:
+            str: The job ID.
+        """
+        job_id = str(uuid.uuid4())
+        create_job(job_id, self.kind, params, [name for name, _ in self.stages], self.owner)
+        self._start(job_id)
+        return job_id
+
+    def recover(self):
+        """
+        Resumes unfinished jobs whose runner stopped renewing their lease.
+
+        Returns:
+            list of str: IDs of the resumed jobs.
+        """
+        job_ids = claim_stale_jobs(self.owner, self.lease_ttl)
+        resumed = []
+        for job_id in job_ids:
+            # A job of this runner whose lease lapsed, e.g. while the database was locked.
+            if self._start(job_id):
+                print(f"Resuming ingestion job {job_id}")
+                resumed.append(job_id)
+        return resumed
+
+    def cancel(self, job_id):
+        return request_job_cancel(job_id)
+
+    def shutdown(self, wait=True):
+        self._stopped.set()
+        self._executor.shutdown(wait=wait)
+
+    def _renew_leases(self):
+        while not self._stopped.wait(self.lease_ttl / 3):
+            try:
+                heartbeat_jobs(self.owner)
+            except Exception as e:
+                print(f"Failed to renew ingestion job leases: {e}")
+            try:
+                self.recover()
+            except Exception as e:
+                print(f"Failed to recover abandoned ingestion jobs: {e}")
+
+    def _start(self, job_id):
+        with self._lock:
+            if job_id in self._active:
+                return False
+            self._active.add(job_id)
+        self._executor.submit(self._run, job_id)
+        return True
+
+    def _run(self, job_id):
+        try:
+            self._run_stages(job_id)
+        except Exception as e:
+            # E.g. a locked database while updating the job. The job must not stay running:
+            # this runner keeps renewing its lease, so recover() would never take it over.
+            print(f"Ingestion job {job_id} failed: {e}")
+            try:
+                update_job(job_id, status="failed", error=str(e), stage=None)
+            except Exception as e:
+                print(f"Failed to record the failure of ingestion job {job_id}: {e}")
+        finally:
+            with self._lock:
+                self._active.discard(job_id)
+
+    def _run_stages(self, job_id):
+        job = get_job(job_id)
+        if job is None or job['status'] not in ("queued", "running"):
+            return
+        stages = job['stages']
+        result = job['result'] or {}
+        update_job(job_id, status="running")
+        for name, fn in self.stages:
+            if stages[name]['status'] == "done":
+                continue
+            job = get_job(job_id)
+            if job['cancel_requested']:
+                update_job(job_id, status="cancelled", stage=None)
+                return
+            stages[name] = {'status': "running", 'started_at': time.time()}
+            update_job(job_id, stage=name, stages=stages)
+            try:
+                output = dict(fn(job) or {})
+            except Exception as e:
+                print(f"Ingestion job {job_id} failed in stage {name}: {e}")
+                stages[name].update(status="failed", finished_at=time.time())
+                update_job(job_id, status="failed", error=str(e), stages=stages)
+                return
+            fields = {}
+            if 'lecture_id' in output:
+                fields['lecture_id'] = output.pop('lecture_id')
+            result.update(output)
+            stages[name].update(status="done", finished_at=time.time())
+            update_job(job_id, stages=stages, result=result, **fields)
+        update_job(job_id, status="succeeded", stage=None)
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+def get_job_runner():
+    """ The process-wide lecture ingestion job runner, started on first use. """
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner()
+        return _runner
@@ -0,0 +1,164 @@
+import contextlib
+import contextvars
+import hashlib
+import json
+import os
+import threading
+import time
+import warnings
+from functools import lru_cache
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.outputs import Generation
+from langchain_core._api import LangChainBetaWarning
+
+from agents.database import ConnectionManager
+
+LLM_CACHE_PATH = os.environ.get("LLM_CACHE_PATH", "llm_cache.db")
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE_ENABLED", "1") == "1"
+# Seconds a response is served from the cache; 0 keeps responses until evicted for size.
+LLM_CACHE_TTL = float(os.environ.get("LLM_CACHE_TTL", 30 * 24 * 3600))
+LLM_CACHE_MAX_BYTES = int(os.environ.get("LLM_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+# A context variable rather than a thread local: langgraph nodes and async cache lookups run on
+# executor threads, which inherit the caller's context.
+_bypass = contextvars.ContextVar("llm_cache_bypass", default=False)
+
+
+class LLMResponseCache(BaseCache):
+    """
+    Persistent, content-addressed cache of LLM responses.
+
+    Responses are keyed by a hash of the model's identity string (model name and
+    parameters, as built by langchain) and the full prompt, so re-ingesting a lecture or
+    regenerating a quiz from the same context costs no LLM call. Entries expire after `ttl`
+    seconds, and the least recently used ones are evicted once the cache outgrows `max_bytes`.
+    """
+
+    def __init__(self, db_path=LLM_CACHE_PATH, ttl=LLM_CACHE_TTL, max_bytes=LLM_CACHE_MAX_BYTES):
+        """
+        Args:
+            db_path (str): SQLite file holding the cached responses.
+            ttl (float): Seconds a response stays valid; 0 or less disables expiry.
+            max_bytes (int): Maximum total size of the cached responses.
+        """
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._db = ConnectionManager(db_path)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.evictions = 0
+        conn = self._db.connection()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                used_at REAL NOT NULL
+            );
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_used ON llm_cache (used_at)")
+        conn.commit()
+
+    @staticmethod
+    def _key(prompt, llm_string):
+        return hashlib.sha256(f"{llm_string}\0{prompt}".encode("utf-8")).hexdigest()
+
+    @contextlib.contextmanager
+    def bypass(self):
+        """ Within the block, calls made from this context skip cache lookups; fresh responses still replace cached ones. """
+        token = _bypass.set(True)
+        try:
+            yield
+        finally:
+            _bypass.reset(token)
+
+    def lookup(self, prompt, llm_string):
+        if _bypass.get():
+            return None
+        key = self._key(prompt, llm_string)
+        conn = self._db.connection()
+        row = conn.execute("SELECT response, size, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is None or (self.ttl > 0 and row['created_at'] + self.ttl < now):
+            with self._lock:
+                self.misses += 1
+            return None
+        conn.execute("UPDATE llm_cache SET used_at = ? WHERE key = ?", (now, key))
+        conn.commit()
+        with self._lock:
+            self.hits += 1
+            self.bytes_saved += row['size']
+        return [self._load(item) for item in json.loads(row['response'])]
+
+    @staticmethod
+    def _load(item):
+        try:
+            with warnings.catch_warnings():
+                # Cached generations are plain langchain objects written by update().
+                warnings.simplefilter("ignore", LangChainBetaWarning)
+                return loads(item)
+        except Exception:
+            return Generation(text=item)
+
+    def update(self, prompt, llm_string, return_val):
+        response = json.dumps([dumps(generation) for generation in return_val])
+        size = sum(len(generation.text.encode("utf-8")) for generation in return_val)
+        now = time.time()
+        conn = self._db.connection()
+        try:
+            conn.execute('''
+                INSERT OR REPLACE INTO llm_cache (key, response, size, created_at, used_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (self._key(prompt, llm_string), response, size, now, now))
+            self._evict(conn, now)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def _evict(self, conn, now):
+        evicted = 0
+        if self.ttl > 0:
+            evicted += conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl,)).rowcount
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if total > self.max_bytes:
+            # Drop the least recently used entries until the cache fits again.
+            rows = conn.execute("SELECT key, size FROM llm_cache ORDER BY used_at").fetchall()
+            stale = []
+            for row in rows:
+                if total <= self.max_bytes:
+                    break
+                stale.append((row['key'],))
+                total -= row['size']
+            conn.executemany("DELETE FROM llm_cache WHERE key = ?", stale)
+            evicted += len(stale)
+        if evicted:
+            with self._lock:
+                self.evictions += evicted
+
+    def clear(self, **kwargs):
+        conn = self._db.connection()
+        conn.execute("DELETE FROM llm_cache")
+        conn.commit()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "bytes_saved": self.bytes_saved,
+                "evictions": self.evictions,
+            }
+
+
+@lru_cache(maxsize=None)
+def get_llm_cache():
+    """ The process-wide LLM response cache, or None when LLM_CACHE_ENABLED=0. """
+    return LLMResponseCache() if LLM_CACHE_ENABLED else None
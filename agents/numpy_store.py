@@ -0,0 +1,110 @@
+import os
+
+import numpy as np
+from langchain_core.vectorstores import VectorStore
+
+# Lectures with a flat index of at most this many chunks are queried with NumpyVectorStore;
+# 0 disables it. Beyond about a hundred 1536-dim chunks FAISS answers single queries faster.
+NUMPY_STORE_MAX_CHUNKS = int(os.environ.get("NUMPY_STORE_MAX_CHUNKS", 128))
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Read-only, brute-force vector store for small lectures.
+
+    The vectors are one contiguous float32 matrix and the chunks a list, both in index order,
+    so a query is one matrix product plus a partial sort, with no FAISS or docstore lookups.
+    Distances are squared L2, as in the FAISS stores, so scores are comparable between the two.
+    """
+
+    def __init__(self, embedding, vectors, documents, ids=None):
+        """
+        Args:
+            embedding (Embeddings): Embedding model used to embed queries.
+            vectors (numpy.ndarray): (count, dimension) matrix of the chunk embeddings.
+            documents (list of Document): The chunks, in the order of `vectors`.
+            ids (list of str): Document IDs of the chunks, in the same order.
+        """
+        self.embedding = embedding
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.documents = list(documents)
+        self.ids = list(ids) if ids is not None else [str(i) for i in range(len(self.documents))]
+        self._norms = np.einsum("ij,ij->i", self.vectors, self.vectors)
+
+    @classmethod
+    def from_faiss(cls, store):
+        """ Copies a FAISS store with a flat index into a NumpyVectorStore. """
+        positions = sorted(store.index_to_docstore_id)
+        ids = [store.index_to_docstore_id[position] for position in positions]
+        vectors = store.index.reconstruct_n(0, store.index.ntotal)
+        return cls(store.embedding_function, vectors[positions], [store.docstore.search(doc_id) for doc_id in ids], ids)
+
+    @property
+    def embeddings(self):
+        return self.embedding
+
+    def __len__(self):
+        return len(self.documents)
+
+    def search_vectors(self, queries, k=4):
+        """
+        Finds the `k` nearest chunks of each query vector.
+
+        Args:
+            queries (numpy.ndarray): (queries, dimension) matrix of query embeddings.
+            k (int): Number of results per query.
+
+        Returns:
+            tuple: (distances, positions) arrays of shape (queries, k'), k' = min(k, chunks),
+            nearest first.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        k = min(k, len(self.documents))
+        if k == 0:
+            empty = np.empty((len(queries), 0))
+            return empty, empty.astype(np.int64)
+        # |q - x|^2 = |q|^2 - 2 q.x + |x|^2, for every query and chunk in one product.
+        distances = np.einsum("ij,ij->i", queries, queries)[:, None] - 2 * queries @ self.vectors.T + self._norms
+        if k < len(self.documents):
+            positions = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        else:
+            positions = np.broadcast_to(np.arange(k), distances.shape).copy()
+        nearest = np.take_along_axis(distances, positions, axis=1)
+        order = np.argsort(nearest, axis=1, kind="stable")
+        return np.take_along_axis(nearest, order, axis=1), np.take_along_axis(positions, order, axis=1)
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4, **kwargs):
+        distances, positions = self.search_vectors(np.asarray([embedding]), k)
+        return [(self.documents[p], float(d)) for d, p in zip(distances[0], positions[0])]
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        return self.similarity_search_with_score_by_vector(self.embedding.embed_query(query), k)
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k)]
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def batch_similarity_search(self, queries, k=4):
+        """
+        Runs several queries with a single matrix product.
+
+        Returns:
+            list of list of Document: The `k` nearest chunks of each query, nearest first.
+        """
+        if not queries:
+            return []
+        vectors = np.array([self.embedding.embed_query(query) for query in queries], dtype=np.float32)
+        _, positions = self.search_vectors(vectors, k)
+        return [[self.documents[p] for p in row] for row in positions]
+
+    def _select_relevance_score_fn(self):
+        return self._euclidean_relevance_score_fn
+
+    def add_texts(self, texts, metadatas=None, **kwargs):
+        raise NotImplementedError("NumpyVectorStore is read-only; update the lecture's FAISS store instead")
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        raise NotImplementedError("NumpyVectorStore is built from a lecture's FAISS store, see from_faiss")
@@ -3,12 +3,12 @@ from langchain.agents.loading import AGENT_TO_CLASS
 from langchain.agents.agent_types import AgentType
 from langchain.memory import ConversationBufferMemory
 
-from typing import TypedDict, Annotated, List, Union, Dict, Any
+from typing import TypedDict, Annotated, List, Union, Dict, Any, Optional
 from langchain_core.agents import AgentAction, AgentFinish
 from langchain_core.messages import BaseMessage
+from langchain_core.runnables import RunnableLambda
 
 from langgraph.graph import END, StateGraph
-from langgraph.prebuilt.tool_executor import ToolExecutor
 import operator
 
 from langchain.pydantic_v1 import BaseModel, Field
@@ -24,15 +24,48 @@ import re
 from langchain_openai import OpenAI, OpenAIEmbeddings
 from langchain_openai import ChatOpenAI
 from langchain_core.vectorstores import VectorStoreRetriever
-
+from functools import lru_cache
+import asyncio
+import contextlib
+import os
+import socket
+import time
+
+from .vector_store import get_embedder
+from .llm_cache import get_llm_cache
+from .agent_pool import get_lecture_store
 from .database import (
     create_tables, add_session,
     update_user_user_stats, 
     update_topic_summary,
     get_topic_title,
     get_topic_summary,
+    get_topic_bundle,
     insert_topic_quiz,
-    get_topic_quiz)
+    insert_topic_quiz_set,
+    has_topic_quiz,
+    acquire_quiz_lease,
+    release_quiz_lease,
+    get_topic_quiz,
+    quiz_content_hash,
+    get_cached_explanation,
+    cache_explanation,
+    run_db)
+from .single_flight import SingleFlight, AsyncSingleFlight
+from .quiz_parser import parse_quiz
+from . import quiz_prompt, concept_prompt
+
+
+# Quiz generation coordination, see generate_quiz_once().
+QUIZ_LEASE_TTL = float(os.environ.get("QUIZ_LEASE_TTL", 180))
+QUIZ_WAIT_TIMEOUT = float(os.environ.get("QUIZ_WAIT_TIMEOUT", 240))
+QUIZ_POLL_INTERVAL = float(os.environ.get("QUIZ_POLL_INTERVAL", 0.5))
+
+_quiz_flights = SingleFlight()
+_async_quiz_flights = AsyncSingleFlight()
+
+# Stop sequences of the conversational agent: the reply ends before an invented tool observation.
+REPLY_STOP = ["\nObservation:", "\n\tObservation:"]
 
 
 class QueryAgentParser(AgentOutputParser):
@@ -66,6 +99,48 @@ class QueryAgentParser(AgentOutputParser):
         return "conversational"
 
 
+class PrefixStripper():
+    """
+    Removes the `AI:` prefix QueryAgentParser expects from a reply that arrives in chunks.
+
+    Text is held back until the prefix is seen, or until `lookahead` characters have arrived
+    without one; a reply that does not start with the prefix is passed through unchanged.
+    """
+
+    def __init__(self, prefix="AI:", lookahead=16):
+        self.prefix = prefix
+        self.lookahead = lookahead
+        self._held = ""
+        self._decided = False
+        self._started = False
+
+    def feed(self, chunk):
+        """ Returns the part of `chunk` to send on, possibly empty. """
+        if not self._decided:
+            self._held += chunk
+            index = self._held.find(self.prefix, 0, self.lookahead + len(self.prefix))
+            if index >= 0:
+                chunk = self._held[index + len(self.prefix):]
+            elif len(self._held) >= self.lookahead + len(self.prefix):
+                chunk = self._held
+            else:
+                return ""
+            self._decided = True
+            self._held = ""
+        if not self._started:
+            # Whitespace between the prefix and the reply, possibly spread over chunks.
+            chunk = chunk.lstrip()
+            self._started = bool(chunk)
+        return chunk
+
+    def flush(self):
+        """ Returns the text still held back once the reply has ended. """
+        if self._decided:
+            return ""
+        self._decided = True
+        return self._held.split(self.prefix, 1)[-1].strip()
+
+
 class BaseRetrieverTool(BaseModel):
     """Base tool for interacting with a SQL database."""
 
@@ -90,14 +165,28 @@ class TopicRetriever(BaseRetrieverTool, BaseTool):
             print("Failed to retrieve context")
             return None
 
-    def _arun(self, query: str):
-        raise NotImplementedError("This tool does not support async")
+    async def _arun(self, query: str):
+        try:
+            documents = await self.retriever.ainvoke(query)
+            if len(documents) > 0:
+                return documents[0].page_content
+            else:
+                return None
+        except Exception as e:
+            print("Failed to retrieve context")
+            return None
 
 
 
 class AgentState(TypedDict):
     # The input string
     input: str
+    # The lecture whose embeddings provide the retrieval context
+    lecture_id: str
+    # Source chunk of the topic when known; otherwise it is retrieved by similarity search
+    context: Optional[str]
+    # Per-request prompt input variables, e.g. the quiz question and the chosen answer
+    prompt_vars: dict
     # The list of previous messages in the conversation
     chat_history: list[BaseMessage]
     # The outcome of a given call to the agent
@@ -110,55 +199,57 @@ class AgentState(TypedDict):
 
 
 
+@lru_cache(maxsize=None)
+def get_llm():
+    """ Process-wide chat model client shared by every agent, behind the LLM response cache. """
+    return ChatNVIDIA(model="mistralai/mixtral-8x22b-instruct-v0.1", cache=get_llm_cache())
+    # return ChatOpenAI(temperature=0.2, model="gpt-3.5-turbo-0125")
+
+
 class QueryAgent():
     """
     A class that integrates various AI and retrieval tools to perform complex querying and information retrieval tasks.
     It uses embeddings and language models to extract and generate responses based on the input topics.
+
+    An agent is built and compiled once per prompt and then serves every lecture and request:
+    the lecture to retrieve from and the per-request prompt values travel in the workflow input
+    (`lecture_id`, `prompt_vars`), so a request only pays for retrieval and the LLM call.
     """
 
-    def __init__(self, rag_db, prompt_prefix, format_instructions, prompt_suffix):
+    def __init__(self, prompt_prefix, format_instructions, prompt_suffix, prompt_variables=(), llm=None,
+                 get_store=None):
         """
         Initializes the QueryAgent with specific settings for language models, embeddings, and retrieval systems.
         
         Args:
-            rag_db (str): The name of the file containing embeddings for retrieval.
             prompt_prefix (str): Text to prepend to each model prompt.
             format_instructions (str): Instructions for formatting model outputs.
             prompt_suffix (str): Text to append to each model prompt.
+            prompt_variables (list of str): Placeholders in the prompt filled per request from `prompt_vars`.
+            llm (BaseChatModel): Chat model to use instead of the shared default.
+            get_store (callable): Returns the vector store of a lecture; defaults to the lecture pool.
         """
 
-        # Initialize language model and embeddings.        
-        self.llm = ChatNVIDIA(model="mistralai/mixtral-8x22b-instruct-v0.1")
-        #self.embedder = NVIDIAEmbeddings(model="ai-embed-qa-4")
-        # self.llm = ChatOpenAI(temperature=0.2, model="gpt-3.5-turbo-0125")
-        self.embedder = OpenAIEmbeddings()
-
-        # Load and set up the FAISS database for retrieval.
-        self.faissDB = FAISS.load_local("./topic_embeddings/" + rag_db, self.embedder, allow_dangerous_deserialization=True)
-        self.retriever = self.faissDB.as_retriever()
-
-        # Configure retrieval and processing tools.
-        self.topic_retriever = TopicRetriever(retriever=self.retriever)
-        self.topic_tool=Tool.from_function(
-            func = self.topic_retriever.invoke,
-            name = "GetTopic",
-            description="Set focus context for the topic")
-
-        self.tools =[self.topic_tool]
-        self.tool_executor = ToolExecutor(self.tools)
+        # The language model client is shared by all agents in the process.
+        self.llm = llm if llm is not None else get_llm()
+        self.get_store = get_store if get_store is not None else get_lecture_store
 
          # Set up agent execution with parsers and settings.
         agent_cls = AGENT_TO_CLASS[AgentType.CONVERSATIONAL_REACT_DESCRIPTION]
-        agent_kwargs = {}
+        prompt_kwargs = dict(
+            prefix = prompt_prefix,
+            suffix = prompt_suffix,
+            format_instructions = format_instructions,
+            ai_prefix = "AI",
+            input_variables = ["input", "chat_history", "agent_scratchpad", *prompt_variables])
+        # The agent's prompt, built from the same pieces, to stream replies to it; see `stream_reply`.
+        self.prompt = agent_cls.create_prompt([], **prompt_kwargs)
         agent_obj = agent_cls.from_llm_and_tools(
             self.llm, 
             [], #tools, 
             callback_manager=None,
             output_parser = QueryAgentParser(ai_prefix = "AI"),
-            prefix = prompt_prefix,
-            suffix = prompt_suffix,
-            format_instructions = format_instructions, 
-            **agent_kwargs)
+            **prompt_kwargs)
         
         self.agent_execute = AgentExecutor.from_agent_and_tools(
             agent=agent_obj,
@@ -170,7 +261,8 @@ class QueryAgent():
             max_iterations=3,
             return_intermediate_steps=True,
             # early_stopping_method="generate", # or use **force**
-            memory = ConversationBufferMemory(memory_key="chat_history", input_key='input', output_key="output")
+            # No conversation memory: agents are reused across requests and threads, and
+            # each workflow run makes a single agent call, so the history is always empty.
         )            
 
     def run_agent(self, state: AgentState):
@@ -183,6 +275,15 @@ class QueryAgent():
         Returns:
             dict: Outcome of the agent execution.
         """        
+        agent_outcome = self.agent_execute.invoke(self._agent_inputs(state))
+        return {"agent_outcome": agent_outcome}
+
+    async def arun_agent(self, state: AgentState):
+        """ Async `run_agent`, awaiting the LLM call; used when the workflow runs through `ainvoke`. """
+        agent_outcome = await self.agent_execute.ainvoke(self._agent_inputs(state))
+        return {"agent_outcome": agent_outcome}
+
+    def _agent_inputs(self, state):
         inputs = state.copy()
 
         text = inputs['input']
@@ -194,8 +295,9 @@ class QueryAgent():
         
         query = text if not context else text + "\n\n context:" + context
 
-        agent_outcome = self.agent_execute.invoke({"input":query})
-        return {"agent_outcome": agent_outcome}
+        agent_inputs = {"input": query, "chat_history": ""}
+        agent_inputs.update(inputs.get('prompt_vars') or {})
+        return agent_inputs
 
     def first_agent(self, inputs):
         """
@@ -242,6 +344,9 @@ class QueryAgent():
     def execute_tools(self, data):
         """
         Executes tools based on the agent's state and action, compiling results into intermediate steps.
+
+        The topic context is the source chunk stored with the topic, read by key; only topics
+        without one fall back to a similarity search over the lecture's vector store.
         
         Args:
             data (dict): Data containing the latest agent outcome.
@@ -250,19 +355,66 @@ class QueryAgent():
             dict: Updated intermediate steps after tool execution.
         """        
         agent_action = data["agent_outcome"]
-        output = self.tool_executor.invoke(agent_action)
+        output = data.get("context")
+        if not output:
+            # Topics created before their source chunk was stored: find it again by title.
+            retriever = self.get_store(data["lecture_id"]).as_retriever()
+            output = TopicRetriever(retriever=retriever).invoke(agent_action.tool_input)
         return {"intermediate_steps": [(agent_action, str(output))]}
 
+    async def aexecute_tools(self, data):
+        """ Async `execute_tools`: the lecture store is loaded off the event loop and searched with `ainvoke`. """
+        agent_action = data["agent_outcome"]
+        output = data.get("context")
+        if not output:
+            store = await asyncio.to_thread(self.get_store, data["lecture_id"])
+            output = await TopicRetriever(retriever=store.as_retriever()).ainvoke(agent_action.tool_input)
+        return {"intermediate_steps": [(agent_action, str(output))]}
+
+    def _reply_prompt(self, steps, state):
+        """ The prompt and stop words the agent sends the LLM for `state`, with the context found by `steps`. """
+        inputs = self._agent_inputs({**state, "intermediate_steps": steps})
+        # The agent is called without prior steps, so its scratchpad is empty.
+        return self.prompt.format_prompt(agent_scratchpad="", **inputs), REPLY_STOP
+
+    def stream_reply(self, state):
+        """
+        Streams the LLM's reply to a workflow input as it is generated, instead of running the workflow.
+
+        The prompt is the one the workflow's agent call would send, with the same context;
+        the reply is raw, with the prefix QueryAgentParser expects.
+
+        Args:
+            state (dict): Workflow input, as passed to `quizz_app.invoke`.
+
+        Yields:
+            str: Chunks of the reply.
+        """
+        steps = self.execute_tools({**state, **self.first_agent(state)})["intermediate_steps"]
+        prompt, stop = self._reply_prompt(steps, state)
+        for chunk in self.llm.stream(prompt, stop=stop):
+            yield chunk.content
+
+    async def astream_reply(self, state):
+        """ Async `stream_reply`. """
+        steps = (await self.aexecute_tools({**state, **self.first_agent(state)}))["intermediate_steps"]
+        prompt, stop = self._reply_prompt(steps, state)
+        async for chunk in self.llm.astream(prompt, stop=stop):
+            yield chunk.content
+
     def setup_workflow(self):
         """
         Configures the workflow and state transitions for the agent operations, setting up the graph of execution nodes.
+
+        The LLM and retrieval nodes have a sync and an async implementation, so the compiled
+        workflow serves both `invoke` and `ainvoke`.
         """
         workflow = StateGraph(AgentState)
         workflow.add_node("first_agent", self.first_agent)
-        workflow.add_node("agent", self.run_agent)
+        workflow.add_node("agent", RunnableLambda(self.run_agent, afunc=self.arun_agent, name="agent"))
         #workflow.set_entry_point("agent")
         workflow.set_entry_point("first_agent")
-        workflow.add_node("action", self.execute_tools)
+        workflow.add_node("action", RunnableLambda(self.execute_tools, afunc=self.aexecute_tools, name="action"))
 
 
         # We now add a conditional edge
@@ -280,6 +432,22 @@ class QueryAgent():
         self.quizz_app = workflow.compile()
 
 
+@lru_cache(maxsize=None)
+def get_quiz_agent():
+    """ The quiz generation agent, compiled once per process. """
+    agent = QueryAgent(quiz_prompt.PREFIX, quiz_prompt.FORMAT_INSTRUCTIONS, quiz_prompt.SUFFIX)
+    agent.setup_workflow()
+    return agent
+
+@lru_cache(maxsize=None)
+def get_concept_agent():
+    """ The conceptual-clarity agent, compiled once per process. """
+    agent = QueryAgent(concept_prompt.PREFIX, concept_prompt.FORMAT_INSTRUCTIONS, concept_prompt.SUFFIX,
+                       prompt_variables=concept_prompt.PROMPT_VARIABLES)
+    agent.setup_workflow()
+    return agent
+
+
 def parse_return(value: Union[Dict[str, Any], Any]):
     """
     Parses a return value, potentially containing nested data or error information, and extracts relevant content.
@@ -306,58 +474,6 @@ def parse_return(value: Union[Dict[str, Any], Any]):
         # Print an error message if the expected key is not found.
         print("Returned value:", value)
         
-def parse_quiz(llm_response):
-    """
-    Parses the quiz content from a language model's response into structured components.
-
-    Args:
-        llm_response (str): The raw text response from a language model, containing a summary, questions, choices, and answers.
-
-    Returns:
-        dict: A dictionary with keys 'summary', 'questions', 'choices', and 'answers', containing the parsed quiz components.
-    
-    This function processes the response through several steps:
-    1. Extracts the summary.
-    2. Identifies and extracts each quiz question along with its choices.
-    3. Extracts the answer key for the questions.
-    """
-    # Use regex to find the summary section and strip unnecessary whitespace
-    summary_match = re.search(r'Summary: (.*?)\n\nQuiz:', llm_response, re.DOTALL)
-    summary = summary_match.group(1).strip() if summary_match else ""
-
-    # Initialize lists for storing questions and choices, and a dictionary for answers.
-    questions = []
-    choices = []
-    answers = {}
-
-    # Use regex to locate and parse the answers, ensuring proper handling of formatting issues.
-    quiz_pattern = re.compile(r'(\d+\.|-)\s+\[Question\s+\d+\s+-\s+\w+\]\s+(.+?)\n\s*([a-d]\)\s*.+?\n\s*[a-d]\)\s*.+?\n\s*[a-d]\)\s*.+?\n\s*[a-d]\)\s*.+?)(?=\s*(\d+\.|-)\s*|\s*Answers:)', re.DOTALL)
-    quiz_matches = quiz_pattern.findall(llm_response)
-
-    for q in quiz_matches:
-        # Extract question and corresponding choices
-        question_text = q[1].strip()
-        choice_text = q[2].strip().split('\n')
-        
-        # Clean each choice, removing extra spaces before and after the choice identifier
-        cleaned_choices = [choice.strip() for choice in choice_text if choice.strip()]
-        questions.append(question_text)
-        choices.append(cleaned_choices)
-
-    # Updated to handle potential irregular whitespaces and line breaks within the JSON string
-    answers_match = re.search(r'Answers:\s+({\s+"1":\s+"[a-d]",\s+"2":\s+"[a-d]",\s+"3":\s+"[a-d]"\s+})', llm_response, re.DOTALL)
-    if answers_match:
-        answers_dict = eval(answers_match.group(1))
-        for key, value in answers_dict.items():
-            answers[key] = value.strip()
-
-    return {
-        'summary': summary,
-        'questions': questions,
-        'choices': choices,
-        'answers': answers
-    }
-
 def generate_quiz_and_cache(agent, topic_id):
     """
     Generates three quiz questions at basic, intermediate, and advanced levels for the given topic,
@@ -371,36 +487,168 @@ def generate_quiz_and_cache(agent, topic_id):
     - agent (Agent): The agent object capable of invoking the quiz generation application.
     - topic_id (int): The ID of the topic for which the quiz is generated.
 
+    A response rejected as incomplete may have been served by the LLM response cache, where
+    every later attempt would find it again, so it is regenerated once with the cache bypassed;
+    the fresh response replaces the cached one.
+
+    Returns:
+    - bool: True if a complete quiz was stored, False if the response was rejected.
+
     Side Effects:
     - Inserts quiz data into a database using `insert_topic_quiz`.
     - Updates topic summary in the database using `update_topic_summary`.
     """
 
-    # Retrieve the topic title using the topic ID.    
-    topic = get_topic_title(topic_id)
-
-    # Prepare the input data for the agent's quiz application.
-    input_data = {"input": topic}
+    # Retrieve the topic title and its lecture using the topic ID.
+    bundle = get_topic_bundle(topic_id)
 
     # Invoke the quiz application to generate quiz questions.
-    outputs = agent.quizz_app.invoke(input_data)
-
-    # Parse the output from the quiz application to structured data.
-    response = parse_return(outputs)
+    outputs = agent.quizz_app.invoke(_workflow_input(bundle))
+    if _store_quiz(topic_id, parse_return(outputs)):
+        return True
+    with _llm_cache_bypass():
+        outputs = agent.quizz_app.invoke(_workflow_input(bundle))
+    return _store_quiz(topic_id, parse_return(outputs))
+
+
+async def agenerate_quiz_and_cache(agent, topic_id):
+    """ Async `generate_quiz_and_cache`: awaits the agent through `ainvoke`, database access runs on `run_db`. """
+    bundle = await run_db(get_topic_bundle, topic_id)
+    outputs = await agent.quizz_app.ainvoke(_workflow_input(bundle))
+    if await run_db(_store_quiz, topic_id, parse_return(outputs)):
+        return True
+    with _llm_cache_bypass():
+        outputs = await agent.quizz_app.ainvoke(_workflow_input(bundle))
+    return await run_db(_store_quiz, topic_id, parse_return(outputs))
+
+
+def _llm_cache_bypass():
+    """ Context in which LLM calls skip the response cache lookup. """
+    cache = get_llm_cache()
+    return cache.bypass() if cache is not None else contextlib.nullcontext()
+
+
+def _workflow_input(bundle, prompt_vars=None):
+    """ Input of the agent workflow for a topic bundle. """
+    return {"input": bundle['title'], "lecture_id": str(bundle['lecture_id']),
+            "context": bundle['context'], "prompt_vars": prompt_vars or {}}
+
+def _store_quiz(topic_id, response):
+    """ Parses the quiz agent's response and stores the quiz with the topic summary; returns whether it was stored. """
     quiz = parse_quiz(response)
+    for error in quiz["errors"]:
+        print(f"Quiz for topic {topic_id}, line {error['line']}: {error['message']}")
 
-    # Insert each question into the database along with its level, choices, and correct answer.
-    # Also, update the topic summary for the given topic ID.
+    # Insert every question into the database along with its level, choices, and correct answer,
+    # together with the topic summary, in a single transaction.
+    quizzes = []
     for id, question in enumerate(quiz["questions"]):
         level=id
         choices = quiz["choices"][id]
-        answer = quiz["answers"][str(id+1)]
-        summary = quiz["summary"]
-        insert_topic_quiz(topic_id, level, question, choices, answer)
-        update_topic_summary(topic_id, summary)
+        answer = quiz["answers"].get(str(id+1))
+        if answer is None:
+            continue
+        quizzes.append((level, question, choices, answer))
+    # A partial set is not stored: a quiz counts as cached once any level exists, so the
+    # missing levels would never be generated.
+    if len(quizzes) < quiz_prompt.LEVELS:
+        print(f"Quiz for topic {topic_id} has {len(quizzes)} of {quiz_prompt.LEVELS} complete levels, not stored")
+        return False
+    insert_topic_quiz_set(topic_id, quiz["summary"], quizzes)
+    return True
+
+
+def generate_quiz_once(agent, topic_id, timeout=QUIZ_WAIT_TIMEOUT):
+    """
+    Makes sure a topic's quiz is cached, generating it at most once across concurrent requests.
+
+    Threads of this process asking for the same topic share a single call. Across worker
+    processes, a lease row in the database elects one generator; the others poll until the
+    quiz appears. A lease whose holder died expires after QUIZ_LEASE_TTL seconds and is
+    taken over by a waiter.
+
+    Parameters:
+    - agent (Agent): The quiz agent used if this caller ends up generating.
+    - topic_id (int): The ID of the topic.
+    - timeout (float): Seconds to wait for another generator before giving up.
 
+    Returns:
+    - bool: True if this process generated and stored the quiz, False if it was already
+            cached, produced by another worker, or the response was rejected as incomplete.
+
+    Raises:
+    - TimeoutError: If no quiz appeared within `timeout` seconds.
+    """
+    return _quiz_flights.do(topic_id, lambda: _generate_quiz_with_lease(agent, topic_id, timeout), timeout)
+
+
+def _generate_quiz_with_lease(agent, topic_id, timeout):
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    deadline = time.monotonic() + timeout
+    while True:
+        if has_topic_quiz(topic_id):
+            return False
+        if acquire_quiz_lease(topic_id, owner, QUIZ_LEASE_TTL):
+            try:
+                # Re-check under the lease: the previous holder may have just finished.
+                if has_topic_quiz(topic_id):
+                    return False
+                return generate_quiz_and_cache(agent, topic_id)
+            finally:
+                release_quiz_lease(topic_id, owner)
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"Timed out waiting for the quiz of topic {topic_id}")
+        time.sleep(QUIZ_POLL_INTERVAL)
+
+
+async def agenerate_quiz_once(agent, topic_id, timeout=QUIZ_WAIT_TIMEOUT, slots=None):
+    """
+    Async `generate_quiz_once` for servers running on an event loop.
+
+    Coroutines of this process asking for the same topic share a single generation; across
+    processes the same database lease elects one generator, polled with `asyncio.sleep`.
+
+    Parameters:
+    - agent (Agent): The quiz agent used if this caller ends up generating.
+    - topic_id (int): The ID of the topic.
+    - timeout (float): Seconds to wait for another generator before giving up.
+    - slots (asyncio.Semaphore): Held while the LLM generates, bounding concurrent generations.
 
-def generate_conceptual_clarity(agent, topic_id):
+    Returns:
+    - bool: True if this process generated and stored the quiz.
+
+    Raises:
+    - TimeoutError: If no quiz appeared within `timeout` seconds.
+    """
+    return await _async_quiz_flights.do(
+        topic_id, lambda: _agenerate_quiz_with_lease(agent, topic_id, timeout, slots), timeout)
+
+
+async def _agenerate_quiz_with_lease(agent, topic_id, timeout, slots):
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    deadline = time.monotonic() + timeout
+    while True:
+        if await run_db(has_topic_quiz, topic_id):
+            return False
+        if await run_db(acquire_quiz_lease, topic_id, owner, QUIZ_LEASE_TTL):
+            try:
+                if await run_db(has_topic_quiz, topic_id):
+                    return False
+                async with slots or _no_limit():
+                    return await agenerate_quiz_and_cache(agent, topic_id)
+            finally:
+                await run_db(release_quiz_lease, topic_id, owner)
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"Timed out waiting for the quiz of topic {topic_id}")
+        await asyncio.sleep(QUIZ_POLL_INTERVAL)
+
+
+@contextlib.asynccontextmanager
+async def _no_limit():
+    yield
+
+
+def generate_conceptual_clarity(agent, topic_id, prompt_vars=None):
     """
     Generates and retrieves responses for a given topic intended to clarify core concepts,
     using a specialized quiz application through an agent.
@@ -414,6 +662,8 @@ def generate_conceptual_clarity(agent, topic_id):
     - agent (Agent): The agent object capable of invoking the quiz generation application, expected
                      to handle the topic input and provide a relevant output.
     - topic_id (int): The ID of the topic for which the conceptual clarity is being generated.
+    - prompt_vars (dict): Values for the agent's per-request prompt variables, e.g. from
+                          `concept_prompt.get_prompt_variables`.
 
     Returns:
     - dict: A structured dictionary containing the response from the quiz application, which could
@@ -425,16 +675,181 @@ def generate_conceptual_clarity(agent, topic_id):
       students' understanding of a topic before a detailed discussion.
     """
 
-    # Retrieve the topic title using the topic ID.
-    topic = get_topic_title(topic_id)
-
-     # Prepare the input data for the agent's quiz application.
-    input_data = {"input": topic}
+    # Retrieve the topic title and its lecture using the topic ID.
+    bundle = get_topic_bundle(topic_id)
 
     # Invoke the quiz application to process the topic and generate relevant responses.
-    outputs = agent.quizz_app.invoke(input_data)
+    outputs = agent.quizz_app.invoke(_workflow_input(bundle, prompt_vars))
 
     # Parse the output from the quiz application to structured data.
     response = parse_return(outputs)
 
     return response
+
+
+async def agenerate_conceptual_clarity(agent, bundle, prompt_vars=None):
+    """ Async `generate_conceptual_clarity` for a topic bundle, awaiting the agent through `ainvoke`. """
+    outputs = await agent.quizz_app.ainvoke(_workflow_input(bundle, prompt_vars))
+    return parse_return(outputs)
+
+
+def get_cached_conceptual_clarity(agent, bundle, level, answer):
+    """
+    Returns the explanation for choosing `answer` on a quiz level, generating it only on a
+    cache miss.
+
+    Explanations are cached per (topic, level, answer) together with a hash of the summary
+    and quiz they were generated from, so a regenerated quiz never serves stale text.
+
+    Parameters:
+    - agent (Agent): The concept agent, compiled with concept_prompt.PROMPT_VARIABLES.
+    - bundle (dict): The topic bundle from `get_topic_bundle`.
+    - level (int): The quiz level.
+    - answer (str): The chosen answer identifier, 'a' to 'd'.
+
+    Returns:
+    - str: The explanation.
+    """
+    topic_id = bundle['topic_id']
+    quiz_dict = bundle['quiz'][level]
+    answer = answer.lower()
+    quiz_hash = quiz_content_hash(bundle['summary'], quiz_dict)
+    concept = get_cached_explanation(topic_id, level, answer, quiz_hash)
+    if concept is not None:
+        return concept
+
+    prompt_vars = concept_prompt.get_prompt_variables(bundle['summary'], quiz_dict, answer)
+    concept = generate_conceptual_clarity(agent, topic_id, prompt_vars)
+    if concept:
+        cache_explanation(topic_id, level, answer, quiz_hash, concept)
+    return concept
+
+
+async def aget_cached_conceptual_clarity(agent, bundle, level, answer, slots=None):
+    """
+    Async `get_cached_conceptual_clarity`.
+
+    Parameters:
+    - slots (asyncio.Semaphore): Held while the LLM generates, bounding concurrent generations.
+    """
+    topic_id = bundle['topic_id']
+    quiz_dict = bundle['quiz'][level]
+    answer = answer.lower()
+    quiz_hash = quiz_content_hash(bundle['summary'], quiz_dict)
+    concept = await run_db(get_cached_explanation, topic_id, level, answer, quiz_hash)
+    if concept is not None:
+        return concept
+
+    prompt_vars = concept_prompt.get_prompt_variables(bundle['summary'], quiz_dict, answer)
+    async with slots or _no_limit():
+        concept = await agenerate_conceptual_clarity(agent, bundle, prompt_vars)
+    if concept:
+        await run_db(cache_explanation, topic_id, level, answer, quiz_hash, concept)
+    return concept
+
+
+def stream_conceptual_clarity(agent, bundle, level, answer):
+    """
+    Streaming `get_cached_conceptual_clarity`: yields the explanation as the LLM writes it.
+
+    The `AI:` prefix is stripped on the fly, and the complete explanation is cached once the
+    reply has ended; a stream closed early caches nothing. A cached explanation is yielded
+    whole.
+
+    Parameters:
+    - agent (Agent): The concept agent.
+    - bundle (dict): The topic bundle, as returned by `get_topic_bundle`.
+    - level (int): The quiz level.
+    - answer (str): The chosen answer, 'a' to 'd'.
+
+    Yields:
+    - str: Chunks of the explanation.
+    """
+    topic_id = bundle['topic_id']
+    quiz_dict = bundle['quiz'][level]
+    answer = answer.lower()
+    quiz_hash = quiz_content_hash(bundle['summary'], quiz_dict)
+    concept = get_cached_explanation(topic_id, level, answer, quiz_hash)
+    if concept is not None:
+        yield concept
+        return
+
+    prompt_vars = concept_prompt.get_prompt_variables(bundle['summary'], quiz_dict, answer)
+    stripper = PrefixStripper()
+    chunks = []
+    for chunk in agent.stream_reply(_workflow_input(bundle, prompt_vars)):
+        chunk = stripper.feed(chunk)
+        if chunk:
+            chunks.append(chunk)
+            yield chunk
+    chunk = stripper.flush()
+    if chunk:
+        chunks.append(chunk)
+        yield chunk
+    concept = "".join(chunks).strip()
+    if concept:
+        cache_explanation(topic_id, level, answer, quiz_hash, concept)
+
+
+async def astream_conceptual_clarity(agent, bundle, level, answer, slots=None):
+    """
+    Async `stream_conceptual_clarity`.
+
+    Parameters:
+    - slots (asyncio.Semaphore): Held while the LLM generates, bounding concurrent generations.
+    """
+    topic_id = bundle['topic_id']
+    quiz_dict = bundle['quiz'][level]
+    answer = answer.lower()
+    quiz_hash = quiz_content_hash(bundle['summary'], quiz_dict)
+    concept = await run_db(get_cached_explanation, topic_id, level, answer, quiz_hash)
+    if concept is not None:
+        yield concept
+        return
+
+    prompt_vars = concept_prompt.get_prompt_variables(bundle['summary'], quiz_dict, answer)
+    stripper = PrefixStripper()
+    chunks = []
+    async with slots or _no_limit():
+        async for chunk in agent.astream_reply(_workflow_input(bundle, prompt_vars)):
+            chunk = stripper.feed(chunk)
+            if chunk:
+                chunks.append(chunk)
+                yield chunk
+    chunk = stripper.flush()
+    if chunk:
+        chunks.append(chunk)
+        yield chunk
+    concept = "".join(chunks).strip()
+    if concept:
+        await run_db(cache_explanation, topic_id, level, answer, quiz_hash, concept)
+
+
+def prewarm_explanations(agent, topic_id, before_call=None):
+    """
+    Generates and caches the explanation of every wrong answer of a topic's quiz.
+
+    Parameters:
+    - agent (Agent): The concept agent.
+    - topic_id (int): The ID of the topic.
+    - before_call (callable): Invoked before each explanation, e.g. to apply a rate limit.
+
+    Returns:
+    - int: Number of explanations now cached for wrong answers.
+    """
+    bundle = get_topic_bundle(topic_id)
+    if not bundle:
+        return 0
+    count = 0
+    for level, quiz_dict in bundle['quiz'].items():
+        quiz_hash = quiz_content_hash(bundle['summary'], quiz_dict)
+        for answer in concept_prompt.ANSWERS:
+            if answer == (quiz_dict['answer'] or "").strip().lower():
+                continue
+            if get_cached_explanation(topic_id, level, answer, quiz_hash) is None:
+                if before_call:
+                    before_call()
+                if not get_cached_conceptual_clarity(agent, bundle, level, answer):
+                    continue
+            count += 1
+    return count
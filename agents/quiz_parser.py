@@ -0,0 +1,221 @@
+import json
+
+CHOICE_IDS = "abcd"
+QUIZ_SIZE = 3
+
+# Punctuation allowed between a question number and its answer, e.g. `"1": "b"`, `1. b`, `1) B`.
+_ANSWER_SEPARATORS = " \t\"':.)-=>"
+
+
+def _header(line):
+    """ Returns (section, rest) if the line opens a Summary/Quiz/Answers section, else (None, None). """
+    text = line.strip().lstrip("#* ").replace("**", "")
+    lowered = text.lower()
+    for section in ("summary", "quiz", "answers", "answer key"):
+        if lowered.startswith(section) and lowered[len(section):len(section) + 1] in (":", ""):
+            return ("answers" if section == "answer key" else section), text[len(section) + 1:].strip()
+    return None, None
+
+
+def _strip_list_marker(text):
+    """ Removes a leading `1.`, `1)`, `-`, `*` or `•` item marker; returns (marked, rest). """
+    if text[:1] and text[:1] in "-*•":
+        return True, text[1:].lstrip()
+    digits = 0
+    while digits < len(text) and text[digits].isdigit():
+        digits += 1
+    if digits and text[digits:digits + 1] in (".", ")"):
+        return True, text[digits + 1:].lstrip()
+    return False, text
+
+
+def _question_tag(text):
+    """ Strips a `[Question 1 - Basic]` or `Question 1:` tag; returns (tagged, rest). """
+    if text.startswith("[") and text[1:9].lower() == "question":
+        end = text.find("]")
+        if end != -1:
+            return True, text[end + 1:].strip()
+    if text[:8].lower() == "question":
+        colon = text.find(":")
+        if colon != -1 and text[8:colon].strip().replace(" ", "").replace("-", "").isalnum():
+            return True, text[colon + 1:].strip()
+    return False, text
+
+
+def _choice(text):
+    """ Returns (identifier, text) for lines like `a) ...`, `B. ...` or `(c) ...`, else (None, None). """
+    if text[:1] == "(" and text[2:3] == ")":
+        letter, rest = text[1:2], text[3:]
+    elif text[1:2] in (")", "."):
+        letter, rest = text[:1], text[2:]
+    else:
+        return None, None
+    if letter.lower() not in CHOICE_IDS or (rest and not rest[0].isspace()):
+        return None, None
+    return letter.lower(), rest.strip()
+
+
+def _answer_letter(text):
+    """ The first choice identifier in `text` that stands on its own, e.g. `b` in `b) It slows`. """
+    for index, char in enumerate(text):
+        if char.isalnum():
+            following = text[index + 1:index + 2]
+            if char.lower() in CHOICE_IDS and not following.isalnum():
+                return char.lower()
+            return None
+    return None
+
+
+def _scan_answers(text):
+    """ Collects `number -> letter` pairs from free-form text such as `1. b, 2: C, 3) a`. """
+    answers = {}
+    index, length = 0, len(text)
+    while index < length:
+        if not text[index].isdigit() or (index and text[index - 1].isalnum()):
+            index += 1
+            continue
+        start = index
+        while index < length and text[index].isdigit():
+            index += 1
+        number = text[start:index]
+        while index < length and text[index] in _ANSWER_SEPARATORS:
+            index += 1
+        if index < length and text[index].lower() in CHOICE_IDS and \
+                (index + 1 == length or not text[index + 1].isalnum()):
+            answers[number] = text[index].lower()
+            index += 1
+    return answers
+
+
+def _parse_answers(text):
+    """ Parses an Answers section given as a JSON object or as inline `number: letter` pairs. """
+    start, end = text.find("{"), text.rfind("}")
+    if start != -1 and end > start:
+        try:
+            data = json.loads(text[start:end + 1])
+        except ValueError:
+            data = None
+        if isinstance(data, dict):
+            answers = {}
+            for key, value in data.items():
+                letter = _answer_letter(str(value))
+                if letter:
+                    answers[str(key).strip()] = letter
+            return answers
+    return _scan_answers(text)
+
+
+def parse_quiz(llm_response):
+    """
+    Parses the quiz content from a language model's response into structured components.
+
+    The response is read once, line by line, so the running time is linear in its length
+    whatever its shape. Questions may be numbered or bulleted, with or without a
+    `[Question N - Level]` tag; choices may use upper or lower case identifiers; answers may
+    be a JSON object, inline `1: b` pairs or an `Answer: b` line under each question.
+
+    Args:
+        llm_response (str): The raw text response from a language model, containing a summary, questions, choices, and answers.
+
+    Returns:
+        dict: A dictionary with keys 'summary', 'questions', 'choices', 'answers' and 'errors'.
+        Only complete questions (exactly four choices) are returned; 'answers' maps their
+        1-based position to the correct choice identifier, and 'errors' lists problems found
+        in the response as {'line': int or None, 'message': str} dicts.
+    """
+    errors = []
+    summary_lines = []
+    parsed = []  # {'line', 'question', 'choices', 'answer'} in order of appearance
+    answer_lines = []
+    section = None
+
+    def error(line_number, message):
+        errors.append({'line': line_number, 'message': message})
+
+    for line_number, line in enumerate((llm_response or "").splitlines(), 1):
+        stripped = line.strip()
+        if not stripped:
+            continue
+
+        name, rest = _header(stripped)
+        if name:
+            section = name
+            if rest and section == "summary":
+                summary_lines.append(rest)
+            elif rest and section == "answers":
+                answer_lines.append(rest)
+            continue
+
+        if section == "summary":
+            summary_lines.append(stripped)
+            continue
+        if section == "answers":
+            answer_lines.append(stripped)
+            continue
+        if section != "quiz":
+            continue
+
+        marked, text = _strip_list_marker(stripped)
+        letter, choice_text = _choice(stripped)
+        if letter is None and marked and text[:1] != "[":
+            letter, choice_text = _choice(text)
+        if letter is not None and parsed:
+            current = parsed[-1]
+            if letter in current['choices']:
+                error(line_number, f"Duplicate choice '{letter}' in question {len(parsed)}")
+            current['choices'][letter] = choice_text
+            continue
+
+        if stripped.lower().startswith(("answer:", "correct answer:")) and parsed:
+            answer = _answer_letter(stripped.split(":", 1)[1])
+            if answer:
+                parsed[-1]['answer'] = answer
+            else:
+                error(line_number, f"Unreadable answer for question {len(parsed)}")
+            continue
+
+        tagged, text = _question_tag(text)
+        if marked or tagged or not parsed or len(parsed[-1]['choices']) == len(CHOICE_IDS):
+            parsed.append({'line': line_number, 'question': text, 'choices': {}, 'answer': None})
+        elif parsed[-1]['choices']:
+            # A wrapped choice continues on the next line.
+            last = list(parsed[-1]['choices'])[-1]
+            parsed[-1]['choices'][last] += " " + stripped
+        else:
+            parsed[-1]['question'] += " " + stripped
+
+    summary = " ".join(summary_lines).strip()
+    if not summary:
+        error(None, "Missing summary")
+
+    listed_answers = _parse_answers("\n".join(answer_lines)) if answer_lines else {}
+
+    questions, choices, answers = [], [], {}
+    for number, item in enumerate(parsed, 1):
+        missing = [letter for letter in CHOICE_IDS if letter not in item['choices']]
+        if missing or not item['question']:
+            error(item['line'], f"Question {number} is incomplete, missing choices: {', '.join(missing) or 'none'}")
+            continue
+        answer = item['answer'] or listed_answers.get(str(number))
+        if answer is None:
+            error(item['line'], f"No answer for question {number}")
+        questions.append(item['question'])
+        choices.append([f"{letter}) {item['choices'][letter]}" for letter in CHOICE_IDS])
+        if answer is not None:
+            answers[str(len(questions))] = answer
+
+    for number in listed_answers:
+        if not number.isdigit() or not 1 <= int(number) <= len(parsed):
+            error(None, f"Answer given for unknown question {number}")
+    if not parsed:
+        error(None, "No questions found")
+    elif len(questions) != QUIZ_SIZE:
+        error(None, f"Expected {QUIZ_SIZE} complete questions, found {len(questions)}")
+
+    return {
+        'summary': summary,
+        'questions': questions,
+        'choices': choices,
+        'answers': answers,
+        'errors': errors
+    }
@@ -0,0 +1,161 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from agents.query_agent import get_quiz_agent, get_concept_agent, generate_quiz_once, prewarm_explanations
+from agents.rate_limit import RateLimiter
+from agents.database import has_topic_quiz, fetch_topics_without_quiz
+
+QUIZ_PREGEN_ENABLED = os.environ.get("QUIZ_PREGEN_ENABLED", "1") == "1"
+QUIZ_PREGEN_CONCURRENCY = int(os.environ.get("QUIZ_PREGEN_CONCURRENCY", 4))
+# LLM generations started per second, across all workers of a pregenerator.
+QUIZ_PREGEN_RATE = float(os.environ.get("QUIZ_PREGEN_RATE", 1.0))
+# Also generate the explanation of every wrong answer once a quiz is created.
+CONCEPT_PREWARM = os.environ.get("CONCEPT_PREWARM", "0") == "1"
+
+
+class QuizPregenerator():
+    """
+    Generates quizzes for queued topics on a bounded worker pool, ahead of the first /quiz
+    request, so no student waits for a full agent run.
+
+    Topics whose quiz is already cached are skipped, and generation goes through
+    generate_quiz_once(), so a topic requested by a student while it is queued is still
+    generated only once.
+    """
+
+    def __init__(self, concurrency=QUIZ_PREGEN_CONCURRENCY, rate=QUIZ_PREGEN_RATE, agent=None,
+                 prewarm=CONCEPT_PREWARM, concept_agent=None):
+        """
+        Args:
+            concurrency (int): Maximum number of quizzes generated at the same time.
+            rate (float): Maximum LLM generations started per second; 0 disables the limit.
+            agent (QueryAgent): Quiz agent to use instead of the shared one.
+            prewarm (bool): Queue wrong-answer explanations for every generated quiz.
+            concept_agent (QueryAgent): Concept agent to use instead of the shared one.
+        """
+        self.concurrency = concurrency
+        self.prewarm = prewarm
+        self._limiter = RateLimiter(rate, burst=concurrency)
+        self._agent = agent
+        self._concept_agent = concept_agent
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="quiz-pregen")
+        self._lock = threading.Lock()
+        self.counts = {"queued": 0, "generated": 0, "cached": 0, "failed": 0}
+
+    def submit(self, topic_ids, progress=None):
+        """
+        Queues topics for quiz generation.
+
+        Args:
+            topic_ids (list of int): Topics to generate quizzes for.
+            progress (callable): Called as progress(topic_id, status, error) after each topic,
+                where status is 'generated', 'cached' or 'failed'.
+
+        Returns:
+            list of Future: One future per topic, resolving to its status.
+        """
+        with self._lock:
+            self.counts["queued"] += len(topic_ids)
+        return [self._executor.submit(self._generate, topic_id, progress) for topic_id in topic_ids]
+
+    def shutdown(self, wait=True, cancel_pending=False):
+        self._executor.shutdown(wait=wait, cancel_futures=cancel_pending)
+
+    def _generate(self, topic_id, progress):
+        error = None
+        try:
+            if has_topic_quiz(topic_id):
+                status = "cached"
+            else:
+                self._limiter.acquire()
+                if generate_quiz_once(self._agent or get_quiz_agent(), topic_id):
+                    status = "generated"
+                elif has_topic_quiz(topic_id):
+                    # Generated by a concurrent request or another worker.
+                    status = "cached"
+                else:
+                    raise ValueError("the response was not a complete quiz")
+        except Exception as e:
+            status, error = "failed", e
+            print(f"Quiz generation failed for topic {topic_id}: {e}")
+        with self._lock:
+            self.counts["queued"] -= 1
+            self.counts[status] += 1
+        if status == "generated" and self.prewarm:
+            self.submit_prewarm(topic_id)
+        if progress:
+            progress(topic_id, status, error)
+        return status
+
+    def submit_prewarm(self, topic_id):
+        """ Queues generation of the wrong-answer explanations of a topic's quiz. """
+        return self._executor.submit(self._prewarm, topic_id)
+
+    def _prewarm(self, topic_id):
+        try:
+            return prewarm_explanations(self._concept_agent or get_concept_agent(), topic_id,
+                                        before_call=self._limiter.acquire)
+        except Exception as e:
+            print(f"Explanation pre-warming failed for topic {topic_id}: {e}")
+            return 0
+
+
+_pregenerator = None
+_pregenerator_lock = threading.Lock()
+
+def get_pregenerator():
+    """ The process-wide background pregenerator, started on first use. """
+    global _pregenerator
+    with _pregenerator_lock:
+        if _pregenerator is None:
+            _pregenerator = QuizPregenerator()
+        return _pregenerator
+
+def queue_lecture_quizzes(lecture_id):
+    """
+    Pipeline stage run after generate_topic_titles: queues every topic of the lecture that
+    has no quiz yet on the background pregenerator.
+
+    Returns:
+        int: Number of topics queued.
+    """
+    if not QUIZ_PREGEN_ENABLED:
+        return 0
+    topic_ids = fetch_topics_without_quiz(lecture_id)
+    get_pregenerator().submit(topic_ids)
+    return len(topic_ids)
+
+def pregenerate_quizzes(topic_ids, concurrency=QUIZ_PREGEN_CONCURRENCY, rate=QUIZ_PREGEN_RATE):
+    """
+    Generates quizzes for the given topics and blocks until done, printing progress.
+
+    Interrupting it (Ctrl-C) cancels the topics not started yet; since cached topics are
+    skipped, running it again resumes where it stopped.
+
+    Returns:
+        dict: Number of topics per status ('generated', 'cached', 'failed').
+    """
+    total = len(topic_ids)
+    done = [0]
+    started = time.monotonic()
+    lock = threading.Lock()
+
+    def progress(topic_id, status, error):
+        with lock:
+            done[0] += 1
+            elapsed = time.monotonic() - started
+            print(f"[{done[0]}/{total}] topic {topic_id}: {status} ({elapsed:.1f}s elapsed)")
+
+    pregenerator = QuizPregenerator(concurrency=concurrency, rate=rate)
+    futures = pregenerator.submit(topic_ids, progress)
+    try:
+        for future in futures:
+            future.result()
+    except KeyboardInterrupt:
+        print("Interrupted, waiting for running generations to finish...")
+        pregenerator.shutdown(wait=True, cancel_pending=True)
+        raise
+    pregenerator.shutdown()
+    return {status: pregenerator.counts[status] for status in ("generated", "cached", "failed")}
@@ -1,3 +1,6 @@
+# Questions PREFIX asks for, one per level: basic, intermediate and advanced.
+LEVELS = 3
+
 # Prompt
 PREFIX = """
 Assistant is a large language model designed to assist in the comprehension of complex topics by creating educational materials. Using the provided summary and context, generate a quiz that covers basic, intermediate, and advanced understanding of the specified topic. Each question should progressively build on the previous in terms of difficulty.
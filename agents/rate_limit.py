@@ -0,0 +1,127 @@
+import multiprocessing
+import random
+import threading
+import time
+
+
+class RateLimiter():
+    """
+    A thread-safe token bucket: allows `rate` acquisitions per second on average, with
+    bursts of up to `burst`. A rate of 0 or less disables limiting.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """ Blocks until a token is available and takes it. """
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class SharedRateLimiter():
+    """
+    A token bucket shared by several processes, e.g. the workers of a ProcessPoolExecutor.
+
+    Its state lives in shared memory, so it must reach the workers when they are started
+    (as `initargs` of the pool), not through a task argument. A rate of 0 or less disables
+    limiting.
+    """
+
+    def __init__(self, rate, burst=1, context=None):
+        """
+        Args:
+            rate (float): Acquisitions per second on average, across all processes.
+            burst (int): Acquisitions allowed at once after an idle period.
+            context: The multiprocessing context the workers are started with.
+        """
+        context = context or multiprocessing.get_context()
+        self.rate = rate
+        self.burst = max(1, burst)
+        # time.monotonic() is a system-wide clock on the supported platforms.
+        self._tokens = context.RawValue("d", float(self.burst))
+        self._updated = context.RawValue("d", time.monotonic())
+        self._lock = context.Lock()
+
+    def acquire(self):
+        """ Blocks until a token is available and takes it. """
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                tokens = min(self.burst, self._tokens.value + (now - self._updated.value) * self.rate)
+                self._updated.value = now
+                if tokens >= 1:
+                    self._tokens.value = tokens - 1
+                    return
+                self._tokens.value = tokens
+                wait = (1 - tokens) / self.rate
+            time.sleep(wait)
+
+
+# HTTP statuses worth retrying: timeouts, throttling and server-side failures.
+TRANSIENT_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+def is_transient_error(error):
+    """
+    Whether an LLM client error is likely to succeed when retried.
+
+    Covers network errors and timeouts, and HTTP errors with a transient status, read from
+    the exception's `status_code` (OpenAI) or from the `[429] ...` message prefix used by
+    the NVIDIA endpoints client.
+    """
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    if type(error).__name__ in ("Timeout", "ReadTimeout", "ConnectTimeout", "APITimeoutError", "APIConnectionError"):
+        return True
+    status = getattr(error, "status_code", None)
+    if status is None:
+        message = str(error)
+        if message.startswith("[") and message[1:4].isdigit() and message[4:5] == "]":
+            status = int(message[1:4])
+    return status in TRANSIENT_STATUS_CODES
+
+
+def call_with_retry(fn, retries=3, backoff=1.0, is_retryable=is_transient_error):
+    """
+    Calls `fn()`, retrying transient failures with exponential backoff and jitter.
+
+    Args:
+        fn (callable): The call to make.
+        retries (int): Retries after the first attempt.
+        backoff (float): Delay before the first retry in seconds; doubled on every retry.
+        is_retryable (callable): Decides whether an exception is worth retrying.
+
+    Returns:
+        Any: The result of `fn()`.
+
+    Raises:
+        Exception: The last error, or the first one that is not retryable.
+    """
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            if attempt >= retries or not is_retryable(e):
+                raise
+            delay = backoff * (2 ** attempt) * random.uniform(0.5, 1.0)
+            print(f"Transient error ({e}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+            attempt += 1
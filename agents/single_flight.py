@@ -0,0 +1,104 @@
+import asyncio
+import threading
+from concurrent import futures
+from concurrent.futures import Future
+
+
+class SingleFlight():
+    """
+    Coalesces concurrent calls that share a key within one process.
+
+    The first caller for a key runs the function; callers arriving while it is in flight
+    wait for, and receive, the same result or exception instead of repeating the work.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, timeout=None):
+        """
+        Runs `fn()` once for all concurrent callers of `key`.
+
+        Args:
+            key (hashable): Identifies the unit of work.
+            fn (callable): Produces the result; only called by the first caller.
+            timeout (float): Seconds a waiting caller blocks before giving up.
+
+        Returns:
+            Any: The result of `fn()`.
+
+        Raises:
+            TimeoutError: If a waiting caller times out. The call in flight is unaffected.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+
+        if not leader:
+            try:
+                return future.result(timeout)
+            except futures.TimeoutError:
+                # Before Python 3.11 this is not the builtin TimeoutError callers catch.
+                raise TimeoutError(f"Timed out waiting for in-flight call {key!r}")
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def in_flight(self, key):
+        with self._lock:
+            return key in self._calls
+
+
+class AsyncSingleFlight():
+    """
+    SingleFlight for coroutines running on one event loop.
+
+    The first caller's coroutine runs as a task that is shielded from its callers: a
+    caller that is cancelled or times out does not stop the work the others wait for.
+    """
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, fn, timeout=None):
+        """
+        Awaits `fn()` once for all concurrent callers of `key`.
+
+        Args:
+            key (hashable): Identifies the unit of work.
+            fn (callable): Returns the coroutine producing the result; only called by the first caller.
+            timeout (float): Seconds a waiting caller waits before giving up.
+
+        Returns:
+            Any: The result of `fn()`.
+
+        Raises:
+            TimeoutError: If a waiting caller times out. The call in flight is unaffected.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+            return await asyncio.shield(task)
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            # Before Python 3.11 this is not the builtin TimeoutError callers catch.
+            raise TimeoutError(f"Timed out waiting for in-flight call {key!r}")
+
+    def in_flight(self, key):
+        return key in self._calls
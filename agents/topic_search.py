@@ -0,0 +1,49 @@
+import os
+
+from agents.course_index import search_course
+from agents.database import fetch_topics_by_ids, search_topics
+
+# Reciprocal rank fusion constant: larger values flatten the advantage of the top ranks.
+HYBRID_RRF_K = int(os.environ.get("HYBRID_RRF_K", 60))
+# Candidates taken from each ranking per requested result before fusing.
+HYBRID_CANDIDATES = int(os.environ.get("HYBRID_CANDIDATES", 4))
+
+
+def reciprocal_rank_fusion(rankings, k=HYBRID_RRF_K):
+    """
+    Merges rankings of the same items, scoring each item sum(1 / (k + rank)) over the
+    rankings it appears in. Only ranks are used, so BM25 scores and vector distances, which
+    are on unrelated scales, can be fused.
+
+    Args:
+        rankings (list of list): Item IDs, best first.
+        k (int): Fusion constant.
+
+    Returns:
+        list of tuple: (item, score), best first.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda entry: entry[1], reverse=True)
+
+def hybrid_search(course_id, query, k=5, lecture_ids=None):
+    """
+    Ranks a course's topics by keyword (BM25) and vector similarity together.
+
+    A course without a vector index is ranked by keywords alone.
+
+    Returns:
+        list of dict: topic_id, topic_title, lecture_id, lecture_title and the fused score,
+        best first.
+    """
+    candidates = k * HYBRID_CANDIDATES
+    keyword = [row['topic_id'] for row in search_topics(query, course_id, lecture_ids, candidates)]
+    vector = [topic_id for _, topic_id, _ in search_course(course_id, query, candidates, lecture_ids) or []]
+    fused = reciprocal_rank_fusion([keyword, vector])[:k]
+    rows = fetch_topics_by_ids([topic_id for topic_id, _ in fused])
+    return [{'topic_id': topic_id, 'topic_title': rows[topic_id]['topic_title'],
+             'lecture_id': rows[topic_id]['lecture_id'], 'lecture_title': rows[topic_id]['lecture_title'],
+             'score': score}
+            for topic_id, score in fused if topic_id in rows]
@@ -0,0 +1,87 @@
+import os
+
+import faiss
+import numpy as np
+
+# Index built for new lectures: "flat" (exact, float32), "sq8" or "fp16" (scalar quantized,
+# 4x and 2x smaller, exhaustive search) or "ivfpq" (inverted lists of product-quantized codes,
+# much smaller and faster on large lectures, approximate).
+INDEX_TYPES = ["flat", "sq8", "fp16", "ivfpq"]
+FAISS_INDEX_TYPE = os.environ.get("FAISS_INDEX_TYPE", "flat")
+# IVF-PQ parameters. 0 lists picks about 4 * sqrt(chunks), keeping the 39 training vectors per
+# list FAISS recommends; the subquantizer count must divide the embedding dimension (1536 for
+# OpenAI embeddings): 96 gives 96-byte codes.
+FAISS_IVF_NLIST = int(os.environ.get("FAISS_IVF_NLIST", 0))
+FAISS_IVF_NPROBE = int(os.environ.get("FAISS_IVF_NPROBE", 8))
+FAISS_PQ_M = int(os.environ.get("FAISS_PQ_M", 96))
+FAISS_PQ_NBITS = int(os.environ.get("FAISS_PQ_NBITS", 8))
+# Vectors sampled to train quantizers; 0 trains on all of them.
+FAISS_TRAIN_SIZE = int(os.environ.get("FAISS_TRAIN_SIZE", 50000))
+
+
+def ivf_nlist(count, nlist=FAISS_IVF_NLIST):
+    """ Number of inverted lists for `count` vectors: `nlist`, or about 4 * sqrt(count). """
+    return nlist or max(1, min(int(4 * np.sqrt(count)), count // 39))
+
+def build_index(vectors, index_type=FAISS_INDEX_TYPE, nlist=FAISS_IVF_NLIST, nprobe=FAISS_IVF_NPROBE,
+                pq_m=FAISS_PQ_M, pq_nbits=FAISS_PQ_NBITS, train_size=FAISS_TRAIN_SIZE):
+    """
+    Builds an L2 index of the given type holding `vectors`, in their order.
+
+    Quantizers are trained on up to `train_size` of the vectors. IVF-PQ needs at least as many
+    vectors as lists and as PQ centroids (2**pq_nbits) to train; a smaller lecture gets a
+    scalar-quantized "sq8" index instead.
+
+    Args:
+        vectors (numpy.ndarray): float32 array of shape (count, dimension).
+        index_type (str): One of INDEX_TYPES.
+        nlist (int): IVF lists; 0 for `ivf_nlist(count)`.
+        nprobe (int): IVF lists searched per query, stored with the index.
+        pq_m (int): PQ subquantizers; must divide the dimension.
+        pq_nbits (int): Bits per PQ subquantizer code.
+        train_size (int): Maximum number of training vectors; 0 for all.
+
+    Returns:
+        tuple: (faiss.Index, str) the index and the type actually built.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}, expected one of {', '.join(INDEX_TYPES)}")
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    count, dimension = vectors.shape
+    if index_type == "ivfpq":
+        nlist = ivf_nlist(count, nlist)
+        if count < max(nlist, 2 ** pq_nbits):
+            print(f"{count} vectors are too few to train an IVF-PQ index with {nlist} lists, building sq8")
+            index_type = "sq8"
+
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dimension)
+    elif index_type == "sq8":
+        index = faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_8bit)
+    elif index_type == "fp16":
+        index = faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_fp16)
+    else:
+        if dimension % pq_m:
+            raise ValueError(f"FAISS_PQ_M={pq_m} does not divide the embedding dimension {dimension}")
+        index = faiss.IndexIVFPQ(faiss.IndexFlatL2(dimension), dimension, nlist, pq_m, pq_nbits)
+        index.nprobe = nprobe
+
+    if not index.is_trained:
+        sample = vectors
+        if train_size and count > train_size:
+            sample = vectors[np.random.default_rng(0).choice(count, train_size, replace=False)]
+        index.train(sample)
+    index.add(vectors)
+    return index, index_type
+
+def rebuild_index(index, index_type=FAISS_INDEX_TYPE, **params):
+    """
+    Rebuilds a flat index as `index_type`, keeping the order of its vectors, so a FAISS store's
+    index_to_docstore_id mapping stays valid.
+
+    Returns:
+        tuple: (faiss.Index, str) as `build_index`; the index itself when `index_type` is "flat".
+    """
+    if index_type == "flat":
+        return index, "flat"
+    return build_index(index.reconstruct_n(0, index.ntotal), index_type, **params)
@@ -0,0 +1,208 @@
+import os
+import pickle
+from functools import lru_cache
+
+import faiss
+from langchain_community.vectorstores import FAISS
+from langchain_openai import OpenAIEmbeddings
+
+from agents.docstore import DOCSTORE_FILE, SQLiteDocstore, write_docstore
+from agents.embedding_cache import CachedEmbeddings, EMBEDDING_CACHE_ENABLED
+from agents.numpy_store import NumpyVectorStore, NUMPY_STORE_MAX_CHUNKS
+
+RAG_DB_FOLDER = os.environ.get("RAG_DB_FOLDER", "./topic_embeddings/")
+# Memory-map the FAISS indexes loaded for queries, so worker processes share their pages.
+FAISS_MMAP = os.environ.get("FAISS_MMAP", "1") == "1"
+
+
+@lru_cache(maxsize=None)
+def get_embedder():
+    """ Process-wide embedding client shared by every vector store, behind the embedding cache. """
+    embedder = OpenAIEmbeddings()
+    # embedder = NVIDIAEmbeddings(model="ai-embed-qa-4")
+    return CachedEmbeddings(embedder) if EMBEDDING_CACHE_ENABLED else embedder
+
+
+def lecture_store_path(lecture_id):
+    """ Directory holding the FAISS index and docstore of a lecture. """
+    return os.path.join(RAG_DB_FOLDER, str(lecture_id))
+
+def read_lecture_index(path, mmap=False):
+    """
+    Reads a FAISS index file.
+
+    Args:
+        path (str): The index file.
+        mmap (bool): Map the file read-only instead of copying it to the heap. Pages are then
+            loaded on first use and shared, through the page cache, by every process mapping
+            the same file. A mapped index cannot be modified. Index types FAISS cannot map
+            are read normally.
+
+    Returns:
+        faiss.Index: The index.
+    """
+    if mmap:
+        try:
+            return faiss.read_index(path, faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError as e:
+            print(f"Cannot memory-map {path}, reading it instead: {e}")
+    return faiss.read_index(path)
+
+def load_lecture_store(lecture_id, embedder, mmap=False):
+    """
+    Loads the vector store of a lecture from disk.
+
+    The chunks stay in the lecture's SQLite docstore and are read on demand. Lectures saved
+    before the docstore existed are loaded from their pickle, see `convert_lecture_store`.
+
+    Args:
+        lecture_id (int | str): The lecture whose embeddings are loaded.
+        embedder (Embeddings): Embedding model used to embed queries against the store.
+        mmap (bool): Memory-map the FAISS index read-only, see `read_lecture_index`. Only for
+            stores that are queried, never for stores that are updated and saved.
+
+    Returns:
+        FAISS: The loaded vector store.
+    """
+    path = lecture_store_path(lecture_id)
+    index = read_lecture_index(os.path.join(path, "index.faiss"), mmap)
+    docstore_path = os.path.join(path, DOCSTORE_FILE)
+    if os.path.exists(docstore_path):
+        docstore = SQLiteDocstore(docstore_path)
+        index_to_docstore_id = docstore.index_to_docstore_id()
+    else:
+        with open(os.path.join(path, "index.pkl"), "rb") as file:
+            docstore, index_to_docstore_id = pickle.load(file)
+    store = FAISS(embedder, index, docstore, index_to_docstore_id)
+    store.index_mmap = mmap
+    return store
+
+def load_query_store(lecture_id, embedder, mmap=FAISS_MMAP, max_numpy_chunks=NUMPY_STORE_MAX_CHUNKS):
+    """
+    Loads a lecture's vector store for querying only.
+
+    Lectures with a flat index of at most `max_numpy_chunks` chunks, most of them, are copied
+    into a NumpyVectorStore: a few dozen vectors are searched faster by one matrix product than
+    through FAISS, and their chunks are kept in memory. Larger or compressed indexes stay FAISS
+    stores, memory-mapped when `mmap` is set.
+
+    Returns:
+        VectorStore: A NumpyVectorStore or a FAISS store.
+    """
+    store = load_lecture_store(lecture_id, embedder, mmap=mmap)
+    if isinstance(store.index, faiss.IndexFlat) and store.index.ntotal <= max_numpy_chunks:
+        return NumpyVectorStore.from_faiss(store)
+    return store
+
+def save_lecture_store(store, lecture_id):
+    """
+    Writes a lecture's vector store as a FAISS index and a SQLite docstore, replacing the
+    legacy pickle if there was one.
+    """
+    path = lecture_store_path(lecture_id)
+    os.makedirs(path, exist_ok=True)
+    write_docstore(os.path.join(path, DOCSTORE_FILE), store.docstore, store.index_to_docstore_id)
+    save_lecture_index(store.index, lecture_id)
+
+def save_lecture_index(index, lecture_id):
+    """
+    Writes a lecture's FAISS index, once its docstore is in place, and removes the legacy pickle
+    if there was one.
+    """
+    path = lecture_store_path(lecture_id)
+    faiss.write_index(index, os.path.join(path, "index.faiss.tmp"))
+    os.replace(os.path.join(path, "index.faiss.tmp"), os.path.join(path, "index.faiss"))
+    if os.path.exists(os.path.join(path, "index.pkl")):
+        os.remove(os.path.join(path, "index.pkl"))
+
+def convert_lecture_store(lecture_id):
+    """
+    Rewrites a lecture saved with a pickled docstore (index.pkl) in the SQLite format.
+
+    Returns:
+        bool: True if the lecture was converted, False if it had no pickle to convert.
+    """
+    path = lecture_store_path(lecture_id)
+    pickle_path = os.path.join(path, "index.pkl")
+    if not os.path.exists(pickle_path):
+        return False
+    # The FAISS index file is kept as is; only the docstore changes format.
+    with open(pickle_path, "rb") as file:
+        docstore, index_to_docstore_id = pickle.load(file)
+    write_docstore(os.path.join(path, DOCSTORE_FILE), docstore, index_to_docstore_id)
+    os.remove(pickle_path)
+    return True
+
+def list_lecture_stores():
+    """ IDs of the lectures that have a vector store under RAG_DB_FOLDER. """
+    if not os.path.isdir(RAG_DB_FOLDER):
+        return []
+    return sorted(name for name in os.listdir(RAG_DB_FOLDER)
+                  if os.path.exists(os.path.join(RAG_DB_FOLDER, name, "index.faiss")))
+
+def lecture_store_version(lecture_id):
+    """
+    Returns a stamp that changes whenever a lecture's embeddings are rewritten or removed.
+
+    The stamp is built from file metadata only, so it is cheap enough to check on every
+    cache lookup and works across processes: a lecture re-ingested by the course server
+    is noticed by every query server worker.
+    """
+    stamp = []
+    path = lecture_store_path(lecture_id)
+    for name in sorted(os.listdir(path)) if os.path.isdir(path) else []:
+        if ".tmp" in name:
+            # A save in progress; the stamp changes once its files are moved into place.
+            continue
+        stat = os.stat(os.path.join(path, name))
+        stamp.append((name, stat.st_mtime_ns, stat.st_size))
+    return tuple(stamp) or None
+
+def estimate_store_bytes(store):
+    """ Approximate resident size of a loaded vector store: vectors plus chunk text held in memory. """
+    if isinstance(store, NumpyVectorStore):
+        return store.vectors.nbytes + sum(len(document.page_content) for document in store.documents)
+    index = store.index
+    # A mapped index lives in the shared page cache, not in this process' heap.
+    size = 0 if getattr(store, "index_mmap", False) else index.ntotal * index.d * 4
+    if isinstance(store.docstore, SQLiteDocstore):
+        # Chunks are read from disk on demand.
+        return size
+    for doc_id in store.index_to_docstore_id.values():
+        document = store.docstore.search(doc_id)
+        if hasattr(document, "page_content"):
+            size += len(document.page_content)
+    return size
+
+def index_memory():
+    """
+    Reports the memory of the lecture indexes this process has memory-mapped.
+
+    Read from /proc/self/smaps, so it is only available on Linux. 'rss' counts the pages of
+    the index currently in memory; 'pss' splits each shared page evenly between the processes
+    mapping it, so summing 'pss' over worker processes gives the real footprint.
+
+    Returns:
+        dict: lecture_id -> {'mapped', 'rss', 'pss'} in bytes, or None without /proc.
+    """
+    try:
+        smaps = open("/proc/self/smaps")
+    except OSError:
+        return None
+    folder = os.path.realpath(RAG_DB_FOLDER)
+    usage = {}
+    current = None
+    with smaps:
+        for line in smaps:
+            fields = line.split()
+            if "-" in fields[0] and ":" not in fields[0]:
+                # A mapping header: address range, permissions, offset, device, inode, path.
+                current = None
+                path = line.split(None, 5)[5].strip() if len(fields) >= 6 else ""
+                path = path[:-len(" (deleted)")] if path.endswith(" (deleted)") else path
+                if os.path.basename(path) == "index.faiss" and os.path.dirname(os.path.dirname(path)) == folder:
+                    lecture_id = os.path.basename(os.path.dirname(path))
+                    current = usage.setdefault(lecture_id, {'mapped': 0, 'rss': 0, 'pss': 0})
+            elif current is not None and fields[0] in ("Size:", "Rss:", "Pss:"):
+                current[{'Size:': 'mapped', 'Rss:': 'rss', 'Pss:': 'pss'}[fields[0]]] += int(fields[1]) * 1024
+    return usage
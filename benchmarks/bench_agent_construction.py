@@ -0,0 +1,97 @@
+"""
+Benchmark: per-request agent construction versus a workflow compiled once at startup.
+
+Runs the /conceptual_clarity workflow against a sample lecture with a zero-latency fake
+chat model and fake embeddings, so the timings contain only the framework overhead:
+
+  per-request + load   load the FAISS index, build the agent with the formatted prompt,
+                       compile the graph, run it (the original request path)
+  per-request          same, with the vector store already pooled
+  compiled once        run the shared, prompt-parameterized workflow
+
+Usage:
+    python -m benchmarks.bench_agent_construction --lecture 1 --iterations 50
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import tempfile
+import time
+
+# Point the application database and the caches at scratch files before any agents module is
+# imported: importing agents.query_agent creates and migrates QUIZ_DB_PATH.
+_tmpdir = tempfile.TemporaryDirectory()
+os.environ["QUIZ_DB_PATH"] = os.path.join(_tmpdir.name, "bench.db")
+os.environ["LLM_CACHE_PATH"] = os.path.join(_tmpdir.name, "llm_cache.db")
+os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(_tmpdir.name, "embedding_cache.db")
+
+from langchain_core.embeddings import FakeEmbeddings  # noqa: E402
+from langchain_core.language_models.fake_chat_models import FakeListChatModel  # noqa: E402
+
+import agents.concept_prompt as concept_prompt  # noqa: E402
+from agents.query_agent import QueryAgent  # noqa: E402
+from agents.vector_store import load_lecture_store  # noqa: E402
+
+QUIZ = {
+    "question": "How does motion impact the accuracy of clocks?",
+    "choices": ["a) It speeds them up", "b) It slows them down", "c) No effect", "d) It stops them"],
+    "answer": "b",
+}
+SUMMARY = "Moving clocks run slow relative to a stationary observer."
+
+
+def fake_llm():
+    return FakeListChatModel(responses=["AI: The correct answer is b."])
+
+
+def run_once(agent, lecture_id, prompt_vars):
+    with contextlib.redirect_stdout(io.StringIO()):  # the executor is verbose
+        agent.quizz_app.invoke({"input": "Effect of motion on clocks", "lecture_id": lecture_id,
+                                "prompt_vars": prompt_vars})
+
+
+def per_request(lecture_id, embedder, store=None):
+    store = store if store is not None else load_lecture_store(lecture_id, embedder)
+    prefix = concept_prompt.get_formatted(concept_prompt.PREFIX, SUMMARY, QUIZ, "a")
+    agent = QueryAgent(prefix, concept_prompt.FORMAT_INSTRUCTIONS, concept_prompt.SUFFIX,
+                       llm=fake_llm(), get_store=lambda _: store)
+    agent.setup_workflow()
+    run_once(agent, lecture_id, {})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lecture", default="1", help="lecture folder under RAG_DB_FOLDER")
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    embedder = FakeEmbeddings(size=1536)
+    store = load_lecture_store(args.lecture, embedder)
+    compiled = QueryAgent(concept_prompt.PREFIX, concept_prompt.FORMAT_INSTRUCTIONS, concept_prompt.SUFFIX,
+                          prompt_variables=concept_prompt.PROMPT_VARIABLES, llm=fake_llm(),
+                          get_store=lambda _: store)
+    compiled.setup_workflow()
+    prompt_vars = concept_prompt.get_prompt_variables(SUMMARY, QUIZ, "a")
+
+    cases = [
+        ("per-request + load", lambda: per_request(args.lecture, embedder)),
+        ("per-request", lambda: per_request(args.lecture, embedder, store)),
+        ("compiled once", lambda: run_once(compiled, args.lecture, prompt_vars)),
+    ]
+    print(f"{'path':<22}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, case in cases:
+        case()  # warm up
+        samples = []
+        for _ in range(args.iterations):
+            begin = time.perf_counter()
+            case()
+            samples.append((time.perf_counter() - begin) * 1000)
+        samples.sort()
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        print(f"{name:<22}{statistics.mean(samples):>10.2f}{statistics.median(samples):>10.2f}{p95:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
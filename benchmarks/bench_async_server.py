@@ -0,0 +1,199 @@
+"""
+Load test: the Flask query server versus the async query server on LLM-bound requests.
+
+Each server runs in its own process against a throwaway database of topics with quizzes, its
+chat model replaced by SlowChatModel, which answers after --latency seconds (sleeping, like a
+remote LLM API call). --requests /conceptual_clarity calls, all cache misses, are sent with
+--concurrency of them in flight, and the run reports per server and concurrency:
+
+  req/s          completed requests per second
+  p50 / p99 s    request latency percentiles
+  errors         failed or non-200 requests
+  threads        peak thread count of the server process
+  rss MB         peak resident memory of the server process
+
+"flask" is servers/query_server.py served by Werkzeug with a thread per request, as app.run()
+does; "async" is servers/async_query_server.py. With --sync-llm the model has no native async
+implementation, as ChatNVIDIA, and the async server awaits it on its executor threads.
+
+Usage:
+    python -m benchmarks.bench_async_server --concurrency 10 50 200 --requests 400 --latency 2
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+SERVER_SCRIPT = '''
+import sys
+from benchmarks.bench_async_server import SlowChatModel
+import agents.query_agent as query_agent
+query_agent.get_llm = lambda: SlowChatModel(latency={latency}, native_async={native_async})
+if sys.argv[1] == "flask":
+    from servers.query_server import app
+    app.run(host="127.0.0.1", port={port}, threaded=True)
+else:
+    from aiohttp import web
+    from servers.async_query_server import create_app
+    web.run_app(create_app(), host="127.0.0.1", port={port}, print=None)
+'''
+
+
+class SlowChatModel(BaseChatModel):
+    """ A chat model answering every prompt after `latency` seconds. """
+
+    latency: float = 2.0
+    native_async: bool = True
+
+    @property
+    def _llm_type(self):
+        return "slow-fake"
+
+    def _result(self):
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="AI: Because the answer is b."))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        return self._result()
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        if not self.native_async:
+            return await super()._agenerate(messages, stop, run_manager, **kwargs)
+        await asyncio.sleep(self.latency)
+        return self._result()
+
+
+def seed(db_path, topics):
+    os.environ["QUIZ_DB_PATH"] = db_path
+    from agents import database
+    database.create_tables()
+    conn = database.get_db_connection()
+    conn.executemany("INSERT INTO topics (lecture_id, topic_title, topic_summary, topic_context) VALUES (1, ?, 'Summary', 'Context')",
+                     [(f"Topic {i}",) for i in range(topics)])
+    conn.executemany(
+        "INSERT INTO topic_quiz (topic_id, level, question, choice_a, choice_b, choice_c, choice_d, answer) "
+        "VALUES (?, 0, 'Question', 'a) 1', 'b) 2', 'c) 3', 'd) 4', 'b')",
+        [(topic_id,) for topic_id in range(1, topics + 1)])
+    conn.commit()
+    database.db_manager.close_all()
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def process_peaks(pid):
+    """ Peak resident memory (bytes) and current thread count of a process, from /proc. """
+    status = dict(line.split(":", 1) for line in open(f"/proc/{pid}/status"))
+    return int(status["VmHWM"].split()[0]) * 1024, int(status["Threads"])
+
+
+async def load(port, requests, concurrency, first_topic, monitor):
+    import aiohttp
+    base = f"http://127.0.0.1:{port}"
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=600)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        async with session.post(f"{base}/register") as response:
+            session_id = (await response.json())['session_id']
+        latencies, errors = [], 0
+        queue = asyncio.Queue()
+        for topic_id in range(first_topic, first_topic + requests):
+            queue.put_nowait(topic_id)
+
+        async def client():
+            nonlocal errors
+            while not queue.empty():
+                topic_id = queue.get_nowait()
+                begin = time.perf_counter()
+                try:
+                    async with session.get(f"{base}/conceptual_clarity", params={
+                            'session_id': session_id, 'topic_id': topic_id, 'level': 0, 'answer': 'a'}) as response:
+                        await response.read()
+                        if response.status != 200:
+                            errors += 1
+                            continue
+                except aiohttp.ClientError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - begin)
+
+        async def sample():
+            while True:
+                monitor()
+                await asyncio.sleep(0.05)
+
+        sampler = asyncio.ensure_future(sample())
+        begin = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - begin
+        sampler.cancel()
+    return len(latencies) / elapsed, latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--requests", type=int, default=400, help="requests per concurrency level")
+    parser.add_argument("--latency", type=float, default=2.0, help="seconds per LLM call")
+    parser.add_argument("--servers", nargs="+", default=["flask", "async"], choices=["flask", "async"])
+    parser.add_argument("--sync-llm", action="store_true", help="model without native async support")
+    args = parser.parse_args()
+
+    print(f"{args.requests} requests per level, LLM latency {args.latency}s"
+          + (", sync-only LLM" if args.sync_llm else ""))
+    print(f"{'server':<8}{'conc':>6}{'req/s':>8}{'p50 s':>8}{'p99 s':>8}{'errors':>8}{'threads':>9}{'rss MB':>8}")
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, "quiz.db")
+        seed(db_path, args.requests * len(args.concurrency) * len(args.servers))
+        env = dict(os.environ, QUIZ_DB_PATH=db_path, LLM_CACHE_ENABLED="0", EMBEDDING_CACHE_ENABLED="0",
+                   QUIZ_PREGEN_ENABLED="0", RAG_DB_FOLDER=workdir,
+                   NVIDIA_API_KEY=os.environ.get("NVIDIA_API_KEY", "nvapi-bench"),
+                   OPENAI_API_KEY=os.environ.get("OPENAI_API_KEY", "sk-bench"))
+        # Every run asks about fresh topics: explanations are cached as they are generated.
+        first_topic = 1
+        for server in args.servers:
+            for concurrency in args.concurrency:
+                port = free_port()
+                script = SERVER_SCRIPT.format(latency=args.latency, native_async=not args.sync_llm, port=port)
+                process = subprocess.Popen([sys.executable, "-c", script, server], env=env,
+                                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                try:
+                    while True:
+                        try:
+                            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+                            break
+                        except OSError:
+                            if process.poll() is not None:
+                                raise RuntimeError(f"{server} server exited with {process.returncode}")
+                            time.sleep(0.2)
+                    peaks = {'threads': 0, 'rss': 0}
+
+                    def monitor():
+                        rss, threads = process_peaks(process.pid)
+                        peaks['rss'] = max(peaks['rss'], rss)
+                        peaks['threads'] = max(peaks['threads'], threads)
+
+                    rate, latencies, errors = asyncio.run(load(port, args.requests, concurrency, first_topic, monitor))
+                    first_topic += args.requests
+                finally:
+                    process.terminate()
+                    process.wait()
+                latencies.sort()
+                p50 = statistics.median(latencies) if latencies else float("nan")
+                p99 = latencies[int(0.99 * (len(latencies) - 1))] if latencies else float("nan")
+                print(f"{server:<8}{concurrency:>6}{rate:>8.1f}{p50:>8.2f}{p99:>8.2f}{errors:>8}"
+                      f"{peaks['threads']:>9}{peaks['rss'] / (1024 * 1024):>8.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark: searching a whole course, lecture by lecture versus in the consolidated course index.
+
+Saves --lectures synthetic lectures of --chunks chunks each with --dim dimensional vectors and
+builds their course index (agents/course_index.py), then measures medians over --repeats runs:
+
+  per-lecture ms   a k=--k search of every lecture's store, loaded from disk, with the
+                   results merged by distance; what a cross-lecture search costs without the
+                   course index
+  pooled ms        the same with every lecture store already loaded
+  course ms        one search of the course index, already loaded
+  build s          syncing every lecture into the course index
+
+Query embedding is excluded: it is one API call in every case.
+
+Usage:
+    python -m benchmarks.bench_course_search --lectures 50 --chunks 60 --dim 1536
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+
+def timed(fn, repeats):
+    samples = []
+    for _ in range(repeats):
+        begin = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - begin)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lectures", type=int, default=50)
+    parser.add_argument("--chunks", type=int, default=60, help="chunks per lecture")
+    parser.add_argument("--dim", type=int, default=1536, help="embedding dimension")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ["RAG_DB_FOLDER"] = workdir
+        os.environ["QUIZ_DB_PATH"] = os.path.join(workdir, "quiz.db")
+        os.environ["LLM_CACHE_PATH"] = os.path.join(workdir, "llm_cache.db")
+        os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(workdir, "embedding_cache.db")
+        import faiss
+        from langchain_community.docstore.in_memory import InMemoryDocstore
+        from langchain_community.vectorstores import FAISS
+        from langchain_core.documents import Document
+        from langchain_core.embeddings import FakeEmbeddings
+        from agents import course_index, database, vector_store
+
+        embedder = FakeEmbeddings(size=args.dim)
+        course_index.get_embedder = lambda: embedder
+        rng = np.random.default_rng(0)
+        lecture_ids = []
+        for number in range(args.lectures):
+            lecture_id = database.insert_lecture(1, f"Lecture {number}", "")
+            index = faiss.IndexFlatL2(args.dim)
+            index.add(rng.random((args.chunks, args.dim), dtype=np.float32))
+            ids = {position: f"{lecture_id}-{position}" for position in range(args.chunks)}
+            docs = InMemoryDocstore({doc_id: Document(page_content="x" * 3000) for doc_id in ids.values()})
+            vector_store.save_lecture_store(FAISS(embedder, index, docs, ids), lecture_id)
+            database.insert_topics(lecture_id, [(doc_id, doc_id, "") for doc_id in ids.values()])
+            lecture_ids.append(lecture_id)
+
+        begin = time.perf_counter()
+        for lecture_id in lecture_ids:
+            course_index.sync_lecture(lecture_id, 1)
+        build_seconds = time.perf_counter() - begin
+
+        query = rng.random(args.dim, dtype=np.float32)
+
+        def merged(stores):
+            results = []
+            for store in stores:
+                results.extend(store.similarity_search_with_score_by_vector(query, k=args.k))
+            return sorted(results, key=lambda result: result[1])[:args.k]
+
+        def per_lecture():
+            return merged(vector_store.load_lecture_store(lecture_id, embedder, mmap=True) for lecture_id in lecture_ids)
+
+        stores = [vector_store.load_lecture_store(lecture_id, embedder, mmap=True) for lecture_id in lecture_ids]
+        index = course_index.load_course_index(1, mmap=True)
+        print(f"{args.lectures} lectures of {args.chunks} chunks, dim {args.dim}, k={args.k}")
+        print(f"{'per-lecture ms':>15}{'pooled ms':>11}{'course ms':>11}{'build s':>9}")
+        print(f"{timed(per_lecture, args.repeats) * 1000:>15.2f}{timed(lambda: merged(stores), args.repeats) * 1000:>11.2f}"
+              f"{timed(lambda: index.search(query[None, :], args.k), args.repeats) * 1000:>11.2f}{build_seconds:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
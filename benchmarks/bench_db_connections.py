@@ -0,0 +1,87 @@
+"""
+Micro-benchmark: per-call sqlite3.connect() versus the pooled ConnectionManager.
+
+Seeds a throwaway database with topics and quizzes, then times the read pattern of a
+/quiz request (topic quiz lookup) with both connection strategies, single- and
+multi-threaded.
+
+Usage:
+    python -m benchmarks.bench_db_connections --iterations 20000 --threads 4
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Point the application database at a scratch file before agents.database is imported.
+_tmpdir = tempfile.TemporaryDirectory()
+os.environ["QUIZ_DB_PATH"] = os.path.join(_tmpdir.name, "bench.db")
+
+from agents import database  # noqa: E402
+
+QUIZ_QUERY = '''
+    SELECT question, choice_a, choice_b, choice_c, choice_d, answer
+    FROM topic_quiz
+    WHERE topic_id = ? AND level = ?
+'''
+
+
+def seed(num_topics):
+    conn = database.get_db_connection()
+    conn.executemany(
+        "INSERT INTO topics (lecture_id, topic_title) VALUES (?, ?)",
+        [(1 + i % 10, f"Topic {i}") for i in range(num_topics)])
+    conn.executemany(
+        "INSERT INTO topic_quiz (topic_id, level, question, choice_a, choice_b, choice_c, choice_d, answer) "
+        "VALUES (?, ?, ?, 'a) x', 'b) y', 'c) z', 'd) w', 'b')",
+        [(t, level, f"Question {t}-{level}") for t in range(1, num_topics + 1) for level in range(3)])
+    conn.commit()
+
+
+def per_call_lookup(topic_id, level):
+    # The pre-pool pattern: open, configure, query, close.
+    conn = sqlite3.connect(database.DB_PATH)
+    conn.row_factory = sqlite3.Row
+    row = conn.execute(QUIZ_QUERY, (topic_id, level)).fetchone()
+    conn.close()
+    return row
+
+
+def pooled_lookup(topic_id, level):
+    return database.get_topic_quiz(topic_id, level)
+
+
+def run(lookup, iterations, threads, num_topics):
+    def work(start):
+        for i in range(start, iterations, threads):
+            lookup(1 + i % num_topics, i % 3)
+
+    begin = time.perf_counter()
+    if threads == 1:
+        work(0)
+    else:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(work, range(threads)))
+    return time.perf_counter() - begin
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--topics", type=int, default=1000)
+    args = parser.parse_args()
+
+    seed(args.topics)
+    print(f"{'strategy':<12}{'threads':>8}{'seconds':>10}{'ops/sec':>12}")
+    for threads in sorted({1, args.threads}):
+        for name, lookup in (("per-call", per_call_lookup), ("pooled", pooled_lookup)):
+            elapsed = run(lookup, args.iterations, threads, args.topics)
+            print(f"{name:<12}{threads:>8}{elapsed:>10.3f}{args.iterations / elapsed:>12.0f}")
+    database.db_manager.close_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark: loading a lecture's vector store with the pickled docstore versus the SQLite one.
+
+Builds a synthetic lecture of --chunks chunks of TOPIC_SIZE characters with --dim
+dimensional vectors, saves it in both formats and loads each one in a fresh child process,
+reporting:
+
+  load ms        load_lecture_store() (FAISS index + docstore)
+  rss MB         resident memory added by the load
+  first ms       first similarity_search(k=4) after the load, including chunk reads
+  read us        mean time to read one chunk from the docstore (--reads random chunks)
+  disk MB        size of the docstore file (index.pkl or docstore.db)
+
+Usage:
+    python -m benchmarks.bench_docstore --chunks 20000 --dim 1536
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import faiss
+import numpy as np
+
+FORMATS = ["pickle", "sqlite"]
+
+WORDS = ("time space clock observer frame light speed relativity motion event simultaneity "
+         "length contraction dilation velocity reference inertial lorentz transformation").split()
+
+
+def rss_kb():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def build(workdir, count, dim):
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.documents import Document
+    from langchain_core.embeddings import FakeEmbeddings
+    from agents import vector_store
+    from agents.chunking import TOPIC_SIZE
+
+    rng = random.Random(0)
+    index = faiss.IndexFlatL2(dim)
+    index.add(np.random.default_rng(0).random((count, dim), dtype=np.float32))
+    ids = {position: f"chunk-{position}" for position in range(count)}
+    docs = {}
+    for position, doc_id in ids.items():
+        text = " ".join(rng.choice(WORDS) for _ in range(TOPIC_SIZE // 7))[:TOPIC_SIZE]
+        docs[doc_id] = Document(page_content=text, metadata={"source": "transcript.txt"})
+    store = FAISS(FakeEmbeddings(size=dim), index, InMemoryDocstore(docs), ids)
+    store.save_local(os.path.join(workdir, "pickle"))
+    vector_store.save_lecture_store(store, "sqlite")
+
+
+def run_child(fmt, workdir, dim, reads):
+    from langchain_core.embeddings import FakeEmbeddings
+    from agents import vector_store
+
+    embedder = FakeEmbeddings(size=dim)
+    baseline = rss_kb()
+    begin = time.perf_counter()
+    store = vector_store.load_lecture_store(fmt, embedder)
+    loaded = time.perf_counter()
+    rss = rss_kb() - baseline
+    store.similarity_search("clock", k=4)
+    searched = time.perf_counter()
+    doc_ids = list(store.index_to_docstore_id.values())
+    sample = random.Random(1).sample(doc_ids, min(reads, len(doc_ids)))
+    read_begin = time.perf_counter()
+    for doc_id in sample:
+        store.docstore.search(doc_id)
+    read = (time.perf_counter() - read_begin) / len(sample)
+    print(json.dumps({"load_ms": (loaded - begin) * 1000, "rss_mb": rss / 1024,
+                      "first_ms": (searched - loaded) * 1000, "read_us": read * 1e6}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1536, help="embedding dimension")
+    parser.add_argument("--reads", type=int, default=1000, help="random chunk reads per format")
+    parser.add_argument("--child", choices=FORMATS, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        os.environ["RAG_DB_FOLDER"] = args.workdir
+        run_child(args.child, args.workdir, args.dim, args.reads)
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ["RAG_DB_FOLDER"] = workdir
+        # Importing agents.vector_store creates and migrates QUIZ_DB_PATH: keep it off quiz.db.
+        os.environ["QUIZ_DB_PATH"] = os.path.join(workdir, "quiz.db")
+        os.environ["LLM_CACHE_PATH"] = os.path.join(workdir, "llm_cache.db")
+        os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(workdir, "embedding_cache.db")
+        os.environ.setdefault("EMBEDDING_CACHE_ENABLED", "0")
+        build(workdir, args.chunks, args.dim)
+        print(f"{args.chunks} chunks, embedding dim {args.dim}")
+        print(f"{'format':<10}{'load ms':>10}{'rss MB':>10}{'first ms':>10}{'read us':>10}{'disk MB':>10}")
+        files = {"pickle": "index.pkl", "sqlite": "docstore.db"}
+        for fmt in FORMATS:
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_docstore", "--child", fmt, "--workdir", workdir,
+                 "--dim", str(args.dim), "--reads", str(args.reads)],
+                check=True, capture_output=True, text=True, env=dict(os.environ)).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            disk = os.path.getsize(os.path.join(workdir, fmt, files[fmt])) / (1024 * 1024)
+            print(f"{fmt:<10}{result['load_ms']:>10.1f}{result['rss_mb']:>10.1f}{result['first_ms']:>10.2f}"
+                  f"{result['read_us']:>10.1f}{disk:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Benchmark: memory of several worker processes serving the same lectures, with FAISS indexes
+read to the heap versus memory-mapped, loaded in each worker or preloaded before fork.
+
+Builds --lectures synthetic lectures of --chunks vectors of --dim floats. For each mode, a
+fresh process forks --workers processes that search every lecture (touching every vector),
+then all of them report their memory together from /proc/self/smaps_rollup:
+
+  heap           each worker reads the indexes after fork (the previous behaviour)
+  mmap           each worker maps the indexes after fork
+  heap preload   the parent reads the indexes, workers inherit them copy-on-write
+  mmap preload   the parent maps the indexes, workers inherit the mapping
+
+  load ms        mean time for a worker to load all lectures (0 when preloaded)
+  pss MB         total proportional set size of the workers: their real combined footprint
+  private MB     total memory private to a single worker
+
+Usage:
+    python -m benchmarks.bench_index_mmap --lectures 20 --chunks 5000 --dim 1536 --workers 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import faiss
+import numpy as np
+
+MODES = ["heap", "mmap", "heap preload", "mmap preload"]
+
+
+def memory_kb():
+    usage = {}
+    with open("/proc/self/smaps_rollup") as rollup:
+        for line in rollup:
+            fields = line.split()
+            if fields[0] in ("Pss:", "Private_Clean:", "Private_Dirty:"):
+                usage[fields[0]] = int(fields[1])
+    return usage["Pss:"], usage["Private_Clean:"] + usage["Private_Dirty:"]
+
+
+def build(count, chunks, dim):
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.documents import Document
+    from langchain_core.embeddings import FakeEmbeddings
+    from agents import vector_store
+
+    rng = np.random.default_rng(0)
+    for lecture in range(count):
+        index = faiss.IndexFlatL2(dim)
+        index.add(rng.random((chunks, dim), dtype=np.float32))
+        ids = {position: f"{lecture}-{position}" for position in range(chunks)}
+        docs = InMemoryDocstore({doc_id: Document(page_content=doc_id) for doc_id in ids.values()})
+        vector_store.save_lecture_store(FAISS(FakeEmbeddings(size=dim), index, docs, ids), lecture)
+
+
+def load_all(count, mmap):
+    from langchain_core.embeddings import FakeEmbeddings
+    from agents import vector_store
+
+    embedder = FakeEmbeddings(size=1)
+    return [vector_store.load_lecture_store(lecture, embedder, mmap=mmap) for lecture in range(count)]
+
+
+def worker(stores, count, mmap, dim, barrier, results):
+    begin = time.perf_counter()
+    if stores is None:
+        stores = load_all(count, mmap)
+    loaded = time.perf_counter() - begin
+    query = np.random.default_rng(os.getpid()).random((1, dim), dtype=np.float32)
+    for store in stores:
+        store.index.search(query, 4)
+    barrier.wait()
+    pss, private = memory_kb()
+    results.put((loaded, pss, private))
+    barrier.wait()
+
+
+def run(mode, count, dim, workers):
+    # Workers inherit the imports, so that only loading the indexes is measured.
+    from agents import vector_store
+    mmap = mode.startswith("mmap")
+    stores = load_all(count, mmap) if mode.endswith("preload") else None
+    context = multiprocessing.get_context("fork")
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(stores, count, mmap, dim, barrier, results))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return (sum(report[0] for report in reports) / workers * 1000,
+            sum(report[1] for report in reports) / 1024,
+            sum(report[2] for report in reports) / 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lectures", type=int, default=20)
+    parser.add_argument("--chunks", type=int, default=5000, help="vectors per lecture")
+    parser.add_argument("--dim", type=int, default=1536, help="embedding dimension")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--modes", nargs="+", default=MODES, choices=MODES)
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        os.environ["RAG_DB_FOLDER"] = args.workdir
+        print(json.dumps(run(args.child, args.lectures, args.dim, args.workers)))
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ["RAG_DB_FOLDER"] = workdir
+        # Importing agents.vector_store creates and migrates QUIZ_DB_PATH: keep it off quiz.db.
+        os.environ["QUIZ_DB_PATH"] = os.path.join(workdir, "quiz.db")
+        os.environ["LLM_CACHE_PATH"] = os.path.join(workdir, "llm_cache.db")
+        os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(workdir, "embedding_cache.db")
+        build(args.lectures, args.chunks, args.dim)
+        size = args.lectures * args.chunks * args.dim * 4 / (1024 * 1024)
+        print(f"{args.lectures} lectures, {size:.0f} MB of vectors, {args.workers} workers")
+        print(f"{'mode':<14}{'load ms':>10}{'pss MB':>10}{'private MB':>12}")
+        for mode in args.modes:
+            # Each mode starts from a fresh parent, whose heap the workers inherit.
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_index_mmap", "--child", mode, "--workdir", workdir,
+                 "--lectures", str(args.lectures), "--dim", str(args.dim), "--workers", str(args.workers)],
+                check=True, capture_output=True, text=True).stdout
+            load_ms, pss, private = json.loads(output.strip().splitlines()[-1])
+            print(f"{mode:<14}{load_ms:>10.1f}{pss:>10.0f}{private:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
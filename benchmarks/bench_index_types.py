@@ -0,0 +1,87 @@
+"""
+Benchmark: size, load time, query latency and accuracy of the FAISS index types.
+
+Builds each index type of agents/vector_index.py on --vectors synthetic embeddings of --dim
+dimensions (points scattered around --clusters centres, like the chunks of related lectures)
+and queries it with --queries new points around the same centres. Accuracy is the fraction of
+queries whose top-1 result matches the exact flat index.
+
+  build s        training and adding every vector
+  file MB        size of the written index file
+  load ms        faiss.read_index() of the file
+  query us       median latency of a single k=4 query
+  top-1 agree    top-1 agreement with the flat index
+
+The noise around each centre is isotropic, a worst case for product quantization: real
+embeddings concentrate in fewer directions and PQ agrees with the flat index more often.
+
+Usage:
+    python -m benchmarks.bench_index_types --vectors 100000 --dim 1536
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import faiss
+import numpy as np
+
+from agents.vector_index import INDEX_TYPES, FAISS_PQ_M, FAISS_IVF_NPROBE, build_index
+
+
+def synthetic(count, queries, dim, clusters, seed=0):
+    """ Stored vectors and queries scattered around the same centres. """
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dim)).astype(np.float32)
+
+    def sample(n):
+        return (centres[rng.integers(0, clusters, n)] + 0.5 * rng.normal(size=(n, dim))).astype(np.float32)
+
+    return sample(count), sample(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=1536, help="embedding dimension")
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--pq-m", type=int, default=FAISS_PQ_M, help="PQ subquantizers")
+    parser.add_argument("--nprobe", type=int, default=FAISS_IVF_NPROBE, help="IVF lists searched per query")
+    parser.add_argument("--types", nargs="+", default=INDEX_TYPES, choices=INDEX_TYPES)
+    args = parser.parse_args()
+
+    vectors, queries = synthetic(args.vectors, args.queries, args.dim, args.clusters)
+    # The flat index runs first; its results are the reference of the others.
+    exact = None
+    print(f"{args.vectors} vectors, dim {args.dim}, {args.queries} queries")
+    print(f"{'type':<8}{'build s':>9}{'file MB':>10}{'load ms':>10}{'query us':>10}{'top-1 agree':>13}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for index_type in ["flat"] + [t for t in args.types if t != "flat"]:
+            begin = time.perf_counter()
+            index, built = build_index(vectors, index_type, pq_m=args.pq_m, nprobe=args.nprobe)
+            build_seconds = time.perf_counter() - begin
+            path = os.path.join(workdir, f"{index_type}.faiss")
+            faiss.write_index(index, path)
+            del index
+
+            begin = time.perf_counter()
+            index = faiss.read_index(path)
+            load_ms = (time.perf_counter() - begin) * 1000
+            samples = []
+            for query in queries[:200]:
+                begin = time.perf_counter()
+                index.search(query[None, :], 4)
+                samples.append((time.perf_counter() - begin) * 1e6)
+            _, found = index.search(queries, 1)
+            if index_type == "flat":
+                exact = found
+            agreement = float(np.mean(found[:, 0] == exact[:, 0]))
+            name = index_type if built == index_type else f"{index_type}>{built}"
+            print(f"{name:<8}{build_seconds:>9.2f}{os.path.getsize(path) / (1024 * 1024):>10.1f}{load_ms:>10.1f}"
+                  f"{statistics.median(samples):>10.0f}{agreement:>13.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark: peak memory and throughput of transcript ingestion, eager versus streaming.
+
+Generates a synthetic transcript of --size-mb megabytes and runs each mode in a fresh
+child process, reporting the peak RSS above the process's RSS after imports:
+
+  split eager      TextLoader.load() + CharacterTextSplitter.split_documents()
+  split stream     iter_transcript_chunks()
+  ingest eager     split eager + FAISS.from_documents() (the previous create_embedding)
+  ingest stream    create_embedding(): streamed chunks embedded in EMBED_BATCH_SIZE batches
+
+Embeddings come from FakeEmbeddings, so no API is called; the FAISS index itself grows
+with the transcript in both ingest modes (--dim floats per chunk).
+
+Usage:
+    python -m benchmarks.bench_ingest_memory --size-mb 50 --dim 1536
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = ["split eager", "split stream", "ingest eager", "ingest stream"]
+
+WORDS = ("time space clock observer frame light speed relativity motion event simultaneity "
+         "length contraction dilation velocity reference inertial lorentz transformation").split()
+
+
+def write_transcript(path, size_mb):
+    rng = random.Random(0)
+    target = size_mb * 1024 * 1024
+    written = 0
+    with open(path, "w") as file:
+        while written < target:
+            sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 30))).capitalize() + ". "
+            if rng.random() < 0.05:
+                sentence += "\n"
+            file.write(sentence)
+            written += len(sentence)
+
+
+def rss_kb():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def run_child(mode, path, dim, workdir):
+    os.environ.update({"QUIZ_DB_PATH": os.path.join(workdir, "quiz.db"), "RAG_DB_FOLDER": workdir,
+                       "EMBEDDING_CACHE_ENABLED": "0", "LLM_CACHE_ENABLED": "0"})
+    # The chat and embedding clients are constructed at import; no request is ever sent.
+    os.environ.setdefault("NVIDIA_API_KEY", "nvapi-benchmark")
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    from langchain_community.document_loaders import TextLoader
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.embeddings import FakeEmbeddings
+    import agents.course_agent as course_agent
+    from agents.chunking import get_text_splitter, iter_transcript_chunks
+
+    embedder = FakeEmbeddings(size=dim)
+    course_agent.embedder = embedder
+    baseline = rss_kb()
+    begin = time.perf_counter()
+    if mode == "split eager":
+        chunks = len(get_text_splitter().split_documents(TextLoader(path).load()))
+    elif mode == "split stream":
+        chunks = sum(1 for _ in iter_transcript_chunks(path))
+    elif mode == "ingest eager":
+        docs = get_text_splitter().split_documents(TextLoader(path).load())
+        chunks = FAISS.from_documents(docs, embedder).index.ntotal
+    else:
+        course_agent.create_embedding(path, "bench")
+        chunks = course_agent.load_lecture_store("bench", embedder).index.ntotal
+    elapsed = time.perf_counter() - begin
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"chunks": chunks, "seconds": elapsed, "peak_mb": (peak - baseline) / 1024}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=50)
+    parser.add_argument("--dim", type=int, default=1536, help="embedding dimension")
+    parser.add_argument("--modes", nargs="+", default=MODES, choices=MODES)
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--file", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.file, args.dim, args.workdir)
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "transcript.txt")
+        write_transcript(path, args.size_mb)
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        print(f"transcript: {size_mb:.0f} MB, embedding dim {args.dim}")
+        print(f"{'mode':<16}{'chunks':>10}{'seconds':>10}{'MB/s':>10}{'peak MB':>10}")
+        for mode in args.modes:
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_ingest_memory", "--child", mode, "--file", path,
+                 "--workdir", workdir, "--dim", str(args.dim)],
+                check=True, capture_output=True, text=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{mode:<16}{result['chunks']:>10}{result['seconds']:>10.2f}"
+                  f"{size_mb / result['seconds']:>10.1f}{result['peak_mb']:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
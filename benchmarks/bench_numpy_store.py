@@ -0,0 +1,94 @@
+"""
+Benchmark: NumpyVectorStore against the FAISS store for small lectures.
+
+Saves synthetic lectures of each --sizes chunk count with --dim dimensional vectors, then
+measures, in process and as medians over --repeats runs:
+
+  load ms        loading the lecture for queries: load_lecture_store() (FAISS, memory-mapped)
+                 versus load_query_store() (NumpyVectorStore)
+  query us       one k=4 similarity_search_by_vector(), chunks included
+  batch us       --batch queries: a loop of searches (FAISS) versus one batched search (NumPy),
+                 per query
+
+Query embedding is excluded: it is the same API call for both stores.
+
+Usage:
+    python -m benchmarks.bench_numpy_store --sizes 20 50 100 250 --dim 1536
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+
+def timed(fn, repeats):
+    samples = []
+    for _ in range(repeats):
+        begin = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - begin)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 50, 100, 250])
+    parser.add_argument("--dim", type=int, default=1536, help="embedding dimension")
+    parser.add_argument("--batch", type=int, default=16)
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ["RAG_DB_FOLDER"] = workdir
+        # Importing agents.vector_store creates and migrates QUIZ_DB_PATH: keep it off quiz.db.
+        os.environ["QUIZ_DB_PATH"] = os.path.join(workdir, "quiz.db")
+        os.environ["LLM_CACHE_PATH"] = os.path.join(workdir, "llm_cache.db")
+        os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(workdir, "embedding_cache.db")
+        import faiss
+        from langchain_community.docstore.in_memory import InMemoryDocstore
+        from langchain_community.vectorstores import FAISS
+        from langchain_core.documents import Document
+        from langchain_core.embeddings import FakeEmbeddings
+        from agents import vector_store
+
+        embedder = FakeEmbeddings(size=args.dim)
+        rng = np.random.default_rng(0)
+        print(f"embedding dim {args.dim}, batches of {args.batch}")
+        print(f"{'chunks':>7}{'load ms faiss':>15}{'numpy':>8}{'query us faiss':>16}{'numpy':>8}"
+              f"{'batch us faiss':>16}{'numpy':>8}")
+        for size in args.sizes:
+            index = faiss.IndexFlatL2(args.dim)
+            index.add(rng.random((size, args.dim), dtype=np.float32))
+            ids = {position: f"{size}-{position}" for position in range(size)}
+            docs = InMemoryDocstore({doc_id: Document(page_content="x" * 3000) for doc_id in ids.values()})
+            vector_store.save_lecture_store(FAISS(embedder, index, docs, ids), size)
+
+            load_faiss = timed(lambda: vector_store.load_lecture_store(size, embedder, mmap=True), args.repeats // 4)
+            load_numpy = timed(lambda: vector_store.load_query_store(size, embedder, max_numpy_chunks=size),
+                               args.repeats // 4)
+            faiss_store = vector_store.load_lecture_store(size, embedder, mmap=True)
+            numpy_store = vector_store.load_query_store(size, embedder, max_numpy_chunks=size)
+
+            queries = rng.random((args.batch, args.dim), dtype=np.float32)
+            query_faiss = timed(lambda: faiss_store.similarity_search_by_vector(queries[0], k=4), args.repeats)
+            query_numpy = timed(lambda: numpy_store.similarity_search_by_vector(queries[0], k=4), args.repeats)
+
+            def batch_faiss():
+                for query in queries:
+                    faiss_store.similarity_search_by_vector(query, k=4)
+
+            def batch_numpy():
+                _, positions = numpy_store.search_vectors(queries, k=4)
+                return [[numpy_store.documents[p] for p in row] for row in positions]
+
+            per_query = 1e6 / args.batch
+            print(f"{size:>7}{load_faiss * 1000:>15.2f}{load_numpy * 1000:>8.2f}{query_faiss * 1e6:>16.0f}"
+                  f"{query_numpy * 1e6:>8.0f}{timed(batch_faiss, args.repeats // 4) * per_query:>16.0f}"
+                  f"{timed(batch_numpy, args.repeats // 4) * per_query:>8.0f}")
+
+
+if __name__ == '__main__':
+    main()
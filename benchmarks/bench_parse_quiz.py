@@ -0,0 +1,106 @@
+"""
+Benchmark: the line-oriented quiz parser against the regex parser it replaced.
+
+Inputs are the fixtures of tests/test_parse_quiz.py, synthetic large responses (a long
+summary, thousands of questions) and adversarial ones: a question followed by choice lines
+and no terminator, on which the old pattern backtracks polynomially (about n^5 in the
+number of lines). The regex parser is skipped on sizes after one exceeds --budget seconds,
+since a single call cannot be interrupted.
+
+Usage:
+    python -m benchmarks.bench_parse_quiz --iterations 20 --budget 1
+"""
+import argparse
+import re
+import statistics
+import time
+
+from agents.quiz_parser import parse_quiz
+from tests.test_parse_quiz import llm_response1, llm_response2, llm_response_variants
+
+
+def regex_parse_quiz(llm_response):
+    """ The previous parser, kept verbatim for comparison. """
+    summary_match = re.search(r'Summary: (.*?)\n\nQuiz:', llm_response, re.DOTALL)
+    summary = summary_match.group(1).strip() if summary_match else ""
+    questions = []
+    choices = []
+    answers = {}
+    quiz_pattern = re.compile(r'(\d+\.|-)\s+\[Question\s+\d+\s+-\s+\w+\]\s+(.+?)\n\s*([a-d]\)\s*.+?\n\s*[a-d]\)\s*.+?\n\s*[a-d]\)\s*.+?\n\s*[a-d]\)\s*.+?)(?=\s*(\d+\.|-)\s*|\s*Answers:)', re.DOTALL)
+    quiz_matches = quiz_pattern.findall(llm_response)
+    for q in quiz_matches:
+        question_text = q[1].strip()
+        choice_text = q[2].strip().split('\n')
+        cleaned_choices = [choice.strip() for choice in choice_text if choice.strip()]
+        questions.append(question_text)
+        choices.append(cleaned_choices)
+    answers_match = re.search(r'Answers:\s+({\s+"1":\s+"[a-d]",\s+"2":\s+"[a-d]",\s+"3":\s+"[a-d]"\s+})', llm_response, re.DOTALL)
+    if answers_match:
+        answers_dict = eval(answers_match.group(1))
+        for key, value in answers_dict.items():
+            answers[key] = value.strip()
+    return {'summary': summary, 'questions': questions, 'choices': choices, 'answers': answers}
+
+
+def long_summary(words):
+    return llm_response2.replace("Summary: ", "Summary: " + "time dilation " * words, 1)
+
+
+def many_questions(count):
+    block = ("{n}. [Question {n} - Basic] What happens to clock {n}?\n"
+             "a) It runs fast\nb) It runs slow\nc) Nothing\nd) It stops\n\n")
+    return "Summary: Clocks.\n\nQuiz:\n" + "".join(block.format(n=n) for n in range(1, count + 1)) + \
+        'Answers:\n{\n    "1": "b",\n    "2": "b",\n    "3": "b"\n}\n'
+
+
+def unterminated_choices(lines):
+    return "Summary: Clocks.\n\nQuiz:\n- [Question 1 - Basic] q\n" + "a) x\n" * lines
+
+
+def measure(parser, text, iterations):
+    samples = []
+    for _ in range(iterations):
+        begin = time.perf_counter()
+        parser(text)
+        samples.append((time.perf_counter() - begin) * 1000)
+    return statistics.median(samples), max(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--budget", type=float, default=1.0, help="seconds after which the regex parser is skipped")
+    args = parser.parse_args()
+
+    cases = [
+        ("fixture 1", llm_response1),
+        ("fixture 2", llm_response2),
+        ("fixture variants", llm_response_variants),
+        ("summary 20k words", long_summary(20_000)),
+        ("summary 200k words", long_summary(200_000)),
+        ("1k questions", many_questions(1_000)),
+        ("10k questions", many_questions(10_000)),
+    ] + [(f"unterminated {n} lines", unterminated_choices(n)) for n in (8, 16, 24, 32, 64, 100_000)]
+
+    print(f"{'input':<26}{'KiB':>9}{'lines p50 ms':>14}{'lines max ms':>14}{'regex p50 ms':>14}{'regex max ms':>14}")
+    regex_skipped = False
+    for name, text in cases:
+        size = len(text) / 1024
+        line_p50, line_max = measure(parse_quiz, text, args.iterations)
+        if name.startswith("unterminated") and regex_skipped:
+            regex = f"{'skipped':>14}{'':>14}"
+        else:
+            begin = time.perf_counter()
+            regex_parse_quiz(text)
+            single = time.perf_counter() - begin
+            if single > args.budget:
+                regex_skipped = True
+                regex = f"{single * 1000:>14.2f}{single * 1000:>14.2f}"
+            else:
+                regex_p50, regex_max = measure(regex_parse_quiz, text, max(1, args.iterations // 4))
+                regex = f"{regex_p50:>14.2f}{regex_max:>14.2f}"
+        print(f"{name:<26}{size:>9.1f}{line_p50:>14.2f}{line_max:>14.2f}{regex}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark: full table scans versus the covering indexes added by migration 1.
+
+Seeds a throwaway database with a large catalog (100k topics by default), times the
+hot lookup helpers with the indexes in place, then drops the indexes and times the
+same lookups again as table scans.
+
+Usage:
+    python -m benchmarks.bench_schema_indexes --topics 100000 --lookups 200
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+# Point the application database at a scratch file before agents.database is imported.
+_tmpdir = tempfile.TemporaryDirectory()
+os.environ["QUIZ_DB_PATH"] = os.path.join(_tmpdir.name, "bench.db")
+
+from agents import database  # noqa: E402
+
+
+def seed(num_courses, num_lectures, num_topics):
+    conn = database.get_db_connection()
+    conn.executemany(
+        "INSERT INTO courses (course_name, description, author) VALUES (?, '', 'bench')",
+        [(f"Course {i}",) for i in range(num_courses)])
+    conn.executemany(
+        "INSERT INTO lectures (course_id, lecture_title, license) VALUES (?, ?, 'CC BY-SA')",
+        [(1 + i % num_courses, f"Lecture {i}") for i in range(num_lectures)])
+    conn.executemany(
+        "INSERT INTO topics (lecture_id, topic_title, topic_summary) VALUES (?, ?, ?)",
+        [(1 + i % num_lectures, f"Topic {i}", "summary " * 40) for i in range(num_topics)])
+    conn.commit()
+
+
+def lookups(num_courses, num_lectures):
+    return [
+        ("fetch_lectures_by_course", lambda: database.fetch_lectures_by_course(random.randint(1, num_courses))),
+        ("fetch_topics_by_lecture", lambda: database.fetch_topics_by_lecture(random.randint(1, num_lectures))),
+        ("get_lecture_id", lambda: database.get_lecture_id(f"Lecture {random.randrange(num_lectures)}")),
+        ("get_course_id", lambda: database.get_course_id(f"Course {random.randrange(num_courses)}")),
+    ]
+
+
+def query_plan():
+    # A fresh connection, so the plan is not served from the statement cache.
+    conn = sqlite3.connect(database.DB_PATH)
+    plan = conn.execute(
+        "EXPLAIN QUERY PLAN SELECT topic_id, topic_title FROM topics WHERE lecture_id = ?", (1,)).fetchone()
+    conn.close()
+    return plan[3]
+
+
+def time_lookups(cases, repeat):
+    results = {}
+    for name, lookup in cases:
+        begin = time.perf_counter()
+        for _ in range(repeat):
+            lookup()
+        results[name] = (time.perf_counter() - begin) / repeat
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--courses", type=int, default=100)
+    parser.add_argument("--lectures", type=int, default=5000)
+    parser.add_argument("--topics", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=200)
+    args = parser.parse_args()
+
+    random.seed(0)
+    seed(args.courses, args.lectures, args.topics)
+    conn = database.get_db_connection()
+    conn.execute("ANALYZE")
+    cases = lookups(args.courses, args.lectures)
+
+    print("indexed plan:", query_plan())
+    indexed = time_lookups(cases, args.lookups)
+
+    for name, _ in database.HOT_PATH_INDEXES:
+        conn.execute(f"DROP INDEX {name}")
+    conn.commit()
+    print("scan plan:   ", query_plan())
+    scanned = time_lookups(cases, args.lookups)
+
+    print(f"\n{'lookup':<28}{'scan ms':>10}{'index ms':>10}{'speedup':>10}")
+    for name, _ in cases:
+        print(f"{name:<28}{scanned[name] * 1000:>10.3f}{indexed[name] * 1000:>10.3f}{scanned[name] / indexed[name]:>9.0f}x")
+    database.db_manager.close_all()
+
+
+if __name__ == '__main__':
+    main()
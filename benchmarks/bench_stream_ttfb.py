@@ -0,0 +1,157 @@
+"""
+Benchmark: time to first byte of conceptual-clarity explanations, whole versus streamed.
+
+Each server runs in its own process against a throwaway database of topics with quizzes, its
+chat model replaced by TokenChatModel, which sends its first token after --first-token seconds
+and each of the --tokens following ones --token-interval seconds later, as a remote LLM API
+streams. --requests explanations, all cache misses, are requested one at a time from
+/conceptual_clarity and from /conceptual_clarity/stream, and the run reports per server and
+endpoint the medians of:
+
+  ttfb s    time from sending the request to the first byte of the body
+  text s    time to the first byte of explanation text, for the stream its first `text` event
+  total s   time to the end of the response
+
+Usage:
+    python -m benchmarks.bench_stream_ttfb --requests 20 --first-token 0.5 --tokens 300
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from benchmarks.bench_async_server import free_port, seed
+
+SERVER_SCRIPT = '''
+import sys
+from benchmarks.bench_stream_ttfb import TokenChatModel
+import agents.query_agent as query_agent
+query_agent.get_llm = lambda: TokenChatModel(first_token={first_token}, tokens={tokens},
+                                             token_interval={token_interval})
+if sys.argv[1] == "flask":
+    from servers.query_server import app
+    app.run(host="127.0.0.1", port={port}, threaded=True)
+else:
+    from aiohttp import web
+    from servers.async_query_server import create_app
+    web.run_app(create_app(), host="127.0.0.1", port={port}, print=None)
+'''
+
+ENDPOINTS = ["/conceptual_clarity", "/conceptual_clarity/stream"]
+
+
+class TokenChatModel(BaseChatModel):
+    """ A chat model replying "AI: " and `tokens` words, at the pace of a streaming LLM API. """
+
+    first_token: float = 0.5
+    tokens: int = 300
+    token_interval: float = 0.02
+
+    @property
+    def _llm_type(self):
+        return "token-fake"
+
+    def _tokens(self):
+        return ["AI:", " Because"] + [f" word{i}" for i in range(self.tokens - 1)]
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.first_token + self.tokens * self.token_interval)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(self._tokens())))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.first_token)
+        for token in self._tokens():
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+            time.sleep(self.token_interval)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.first_token)
+        for token in self._tokens():
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+            await asyncio.sleep(self.token_interval)
+
+
+async def fetch(session, url, params):
+    """ Seconds to the first body byte, to the first explanation text and to the end of the body. """
+    begin = time.perf_counter()
+    async with session.get(url, params=params) as response:
+        response.raise_for_status()
+        ttfb = text = None
+        body = b""
+        async for chunk in response.content.iter_any():
+            now = time.perf_counter() - begin
+            ttfb = ttfb if ttfb is not None else now
+            body += chunk
+            if text is None and (b'"text"' in body or b'"concept"' in body):
+                text = now
+        return ttfb, text, time.perf_counter() - begin
+
+
+async def measure(port, topic_ids, endpoint):
+    import aiohttp
+    base = f"http://127.0.0.1:{port}"
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=600)) as session:
+        async with session.post(f"{base}/register") as response:
+            session_id = (await response.json())['session_id']
+        samples = [await fetch(session, base + endpoint, {
+            'session_id': session_id, 'topic_id': topic_id, 'level': 0, 'answer': 'a'}) for topic_id in topic_ids]
+    return [statistics.median(column) for column in zip(*samples)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20, help="requests per server and endpoint")
+    parser.add_argument("--first-token", type=float, default=0.5, help="seconds to the first token")
+    parser.add_argument("--tokens", type=int, default=300, help="tokens per explanation")
+    parser.add_argument("--token-interval", type=float, default=0.02, help="seconds between tokens")
+    parser.add_argument("--servers", nargs="+", default=["flask", "async"], choices=["flask", "async"])
+    args = parser.parse_args()
+
+    print(f"{args.requests} requests, first token after {args.first_token}s, "
+          f"{args.tokens} tokens {args.token_interval}s apart")
+    print(f"{'server':<8}{'endpoint':<29}{'ttfb s':>8}{'text s':>8}{'total s':>9}")
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, "quiz.db")
+        seed(db_path, args.requests * len(ENDPOINTS) * len(args.servers))
+        env = dict(os.environ, QUIZ_DB_PATH=db_path, LLM_CACHE_ENABLED="0", EMBEDDING_CACHE_ENABLED="0",
+                   QUIZ_PREGEN_ENABLED="0", RAG_DB_FOLDER=workdir,
+                   NVIDIA_API_KEY=os.environ.get("NVIDIA_API_KEY", "nvapi-bench"),
+                   OPENAI_API_KEY=os.environ.get("OPENAI_API_KEY", "sk-bench"))
+        # Every run asks about fresh topics: explanations are cached as they are generated.
+        first_topic = 1
+        for server in args.servers:
+            port = free_port()
+            script = SERVER_SCRIPT.format(first_token=args.first_token, tokens=args.tokens,
+                                          token_interval=args.token_interval, port=port)
+            process = subprocess.Popen([sys.executable, "-c", script, server], env=env,
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                while True:
+                    try:
+                        socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+                        break
+                    except OSError:
+                        if process.poll() is not None:
+                            raise RuntimeError(f"{server} server exited with {process.returncode}")
+                        time.sleep(0.2)
+                for endpoint in ENDPOINTS:
+                    topic_ids = range(first_topic, first_topic + args.requests)
+                    first_topic += args.requests
+                    ttfb, text, total = asyncio.run(measure(port, topic_ids, endpoint))
+                    print(f"{server:<8}{endpoint:<29}{ttfb:>8.2f}{text:>8.2f}{total:>9.2f}")
+            finally:
+                process.terminate()
+                process.wait()
+
+
+if __name__ == '__main__':
+    main()
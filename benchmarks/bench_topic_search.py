@@ -0,0 +1,110 @@
+"""
+Benchmark: keyword search of topics with the FTS5 index versus a LIKE scan.
+
+Seeds a throwaway database with --topics topics spread over --courses courses of 20-topic
+lectures, each with a generated title, summary and 3 quiz levels drawn from a Zipf-distributed
+vocabulary, then reports:
+
+  seed s         inserting the topics and quizzes, with the full-text triggers
+  fts MB         size of the full-text index
+  like ms        median of a LIKE scan of titles and summaries returning every match of a word
+  fts ms         median of search_topics() for the same words, BM25-ranked, top 10
+  fts course ms  the same limited to one course
+  fts common ms  search_topics() for the most frequent word, found in nearly every topic: the
+                 worst case, since BM25 scores every match before keeping the top 10
+
+Queries are words drawn uniformly from the vocabulary.
+
+Usage:
+    python -m benchmarks.bench_topic_search --topics 100000
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+# Point the application database at a scratch file before agents.database is imported.
+_tmpdir = tempfile.TemporaryDirectory()
+os.environ["QUIZ_DB_PATH"] = os.path.join(_tmpdir.name, "bench.db")
+
+from agents import database  # noqa: E402
+
+# Every match is read, as ranking them requires.
+LIKE_QUERY = '''
+    SELECT topic_id, topic_title, topic_summary FROM topics
+    WHERE topic_title LIKE ? OR topic_summary LIKE ?
+'''
+
+
+def vocabulary(size, rng):
+    letters = np.array(list("abcdefghijklmnopqrstuvwxyz"))
+    return ["".join(rng.choice(letters, rng.integers(4, 10))) for _ in range(size)]
+
+def seed(topics, courses, words, rng):
+    # Zipf-like word frequencies, as in natural text.
+    weights = 1.0 / np.arange(1, len(words) + 1)
+    weights /= weights.sum()
+    # Every word of every topic (66 in the title and summary, 93 in its quizzes), drawn at once.
+    stream = iter(rng.choice(len(words), topics * 159, p=weights))
+
+    def text(count):
+        return " ".join(words[next(stream)] for _ in range(count))
+
+    conn = database.get_db_connection()
+    lectures = (topics + 19) // 20
+    conn.executemany("INSERT INTO lectures (course_id, lecture_title, license) VALUES (?, ?, '')",
+                     [(1 + i % courses, f"Lecture {i}") for i in range(lectures)])
+    conn.executemany("INSERT INTO topics (lecture_id, topic_title, topic_summary) VALUES (?, ?, ?)",
+                     [(1 + i // 20, text(6), text(60)) for i in range(topics)])
+    conn.executemany(
+        "INSERT INTO topic_quiz (topic_id, level, question, choice_a, choice_b, choice_c, choice_d, answer) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, 'b')",
+        [(t, level, text(15), text(4), text(4), text(4), text(4)) for t in range(1, topics + 1) for level in range(3)])
+    conn.commit()
+
+def timed(fn, queries):
+    samples = []
+    for query in queries:
+        begin = time.perf_counter()
+        fn(query)
+        samples.append(time.perf_counter() - begin)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--topics", type=int, default=100000)
+    parser.add_argument("--courses", type=int, default=50)
+    parser.add_argument("--vocabulary", type=int, default=20000, help="distinct words")
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    words = vocabulary(args.vocabulary, rng)
+    database.create_tables()
+    begin = time.perf_counter()
+    seed(args.topics, args.courses, words, rng)
+    seed_seconds = time.perf_counter() - begin
+
+    conn = database.get_db_connection()
+    fts_bytes = conn.execute('''
+        SELECT sum(pgsize) FROM dbstat WHERE name LIKE 'topics_fts%'
+    ''').fetchone()[0] if conn.execute("SELECT 1 FROM pragma_module_list WHERE name = 'dbstat'").fetchone() else None
+    queries = [words[i] for i in rng.choice(len(words), args.queries)]
+
+    like_ms = timed(lambda word: conn.execute(LIKE_QUERY, (f"%{word}%", f"%{word}%")).fetchall(), queries[:20])
+    fts_ms = timed(lambda word: database.search_topics(word), queries)
+    course_ms = timed(lambda word: database.search_topics(word, course_id=1), queries)
+    common_ms = timed(lambda word: database.search_topics(word), [words[0]] * 20)
+
+    print(f"{args.topics} topics, {args.courses} courses, {args.queries} queries")
+    print(f"{'seed s':>8}{'fts MB':>9}{'like ms':>9}{'fts ms':>8}{'fts course ms':>15}{'fts common ms':>15}")
+    size = f"{fts_bytes / (1024 * 1024):.1f}" if fts_bytes else "-"
+    print(f"{seed_seconds:>8.2f}{size:>9}{like_ms:>9.2f}{fts_ms:>8.2f}{course_ms:>15.2f}{common_ms:>15.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,8 +3,13 @@ import uuid
 import sqlite3
 import json
 
-from agents.course_agent import create_embedding, generate_topic_titles, create_lecture
-from agents.database import get_lecture_id, delete_topics_by_lecture, delete_lecture_by_id
+from agents.course_agent import create_embedding, generate_topic_titles, create_lecture, reingest_lecture
+from agents.database import get_lecture_id, delete_topics_by_lecture, delete_lecture_by_id, fetch_topics_without_quiz
+from agents.quiz_pregen import pregenerate_quizzes, QUIZ_PREGEN_CONCURRENCY, QUIZ_PREGEN_RATE
+from agents.vector_store import convert_lecture_store, list_lecture_stores
+from agents.vector_index import INDEX_TYPES
+from agents.course_index import update_course_index, rebuild_course_index
+from agents.bulk_ingest import load_manifest, ingest_course, BULK_INGEST_WORKERS, BULK_INGEST_RATE
 import argparse
 
 
@@ -28,54 +33,168 @@ lecture_subparsers = parser_lecture.add_subparsers(dest='lecture_command', help=
 
 # Create a parser for the "create" command under "lecture"
 parser_lecture_create = lecture_subparsers.add_parser('create', help='create lectures')
+parser_lecture_create.add_argument('--skip-quizzes', action='store_true', help='do not pre-generate quizzes for the new topics')
+parser_lecture_create.add_argument('--index-type', choices=INDEX_TYPES, help='FAISS index to build (default: FAISS_INDEX_TYPE)')
+
+# Create a parser for the "update" command under "lecture"
+parser_lecture_update = lecture_subparsers.add_parser('update', help='re-ingest an edited transcript, keeping unchanged topics')
+parser_lecture_update.add_argument('--skip-quizzes', action='store_true', help='do not pre-generate quizzes for the new topics')
 
 # Create a parser for the "delete" command under "lectures"
 parser_lecture_delete = lecture_subparsers.add_parser('delete', help='delete lecturees')
 
+# Create a parser for the "quiz" sub-command
+parser_quiz = sub_parsers.add_parser('quiz', help='quiz sub-command')
+quiz_subparsers = parser_quiz.add_subparsers(dest='quiz_command', help='quiz operation')
+
+# Create a parser for the "backfill" command under "quiz"
+parser_quiz_backfill = quiz_subparsers.add_parser('backfill', help='generate missing quizzes of existing lectures; rerun to resume')
+parser_quiz_backfill.add_argument('--lecture-id', type=int, action='append', help='lecture to backfill (repeatable, default: all)')
+parser_quiz_backfill.add_argument('--concurrency', type=int, default=QUIZ_PREGEN_CONCURRENCY, help='parallel generations')
+parser_quiz_backfill.add_argument('--rate', type=float, default=QUIZ_PREGEN_RATE, help='generations started per second, 0 for no limit')
+
+# Create a parser for the "course" sub-command
+parser_course = sub_parsers.add_parser('course', help='course sub-command')
+course_subparsers = parser_course.add_subparsers(dest='course_command', help='course operation')
+
+# Create a parser for the "ingest" command under "course"
+parser_course_ingest = course_subparsers.add_parser('ingest', help='ingest a directory of transcripts or a JSON manifest; rerun to resume')
+parser_course_ingest.add_argument('path', help='directory of .txt transcripts or JSON manifest')
+parser_course_ingest.add_argument('--course-id', type=int, required=True, help='course the lectures belong to')
+parser_course_ingest.add_argument('--license', default='', help='license of lectures the manifest does not give one')
+parser_course_ingest.add_argument('--workers', type=int, default=BULK_INGEST_WORKERS, help='parallel worker processes')
+parser_course_ingest.add_argument('--rate', type=float, default=BULK_INGEST_RATE, help='title generations started per second across workers, 0 for no limit')
+parser_course_ingest.add_argument('--skip-quizzes', action='store_true', help='do not pre-generate quizzes for the new topics')
+parser_course_ingest.add_argument('--index-type', choices=INDEX_TYPES, help='FAISS index to build (default: FAISS_INDEX_TYPE)')
+
+# Create a parser for the "reindex" command under "course"
+parser_course_reindex = course_subparsers.add_parser('reindex', help='rebuild the consolidated search index of a course')
+parser_course_reindex.add_argument('--course-id', type=int, required=True, help='course to reindex')
+
+# Create a parser for the "embeddings" sub-command
+parser_embeddings = sub_parsers.add_parser('embeddings', help='embeddings sub-command')
+embeddings_subparsers = parser_embeddings.add_subparsers(dest='embeddings_command', help='embeddings operation')
+
+# Create a parser for the "convert" command under "embeddings"
+parser_embeddings_convert = embeddings_subparsers.add_parser('convert', help='rewrite pickled docstores (index.pkl) as SQLite docstores')
+parser_embeddings_convert.add_argument('--lecture-id', action='append', help='lecture to convert (repeatable, default: all)')
+
+
+# The commands run only when executed as a script: `course ingest` starts worker processes
+# that import this module again.
+if __name__ == '__main__':
+    # Parse the command line arguments
+    args = parser.parse_args()
+
+    # Process the arguments based on the command and sub-commands
+    if args.command == 'titles':
+        if args.title_command == 'create':
+            print("Enter Lecture ID: ")
+            lecture_id = input()
+            result = generate_topic_titles(lecture_id)
+        elif args.title_command == 'delete':
+            print("Enter Lecture ID: ")
+            lecture_id = input()
+            result = delete_topics_by_lecture(lecture_id)
+            if not result:
+                print("Failed to delete topic titles")
+            update_course_index(lecture_id)
+    elif args.command == 'lecture':
+        if args.lecture_command == 'create':
+            print("Enter Course ID: ")
+            course_id = input()
+            print("Lecture Title: ")
+            lecture_name = input()
+            print("Lecture Transcription File: ")
+            lecture_source = input()
+            print("Lecture License: ")
+            lecture_license = input()
+            lecture_id = create_lecture(course_id,  lecture_name, lecture_license)
+
+            if not lecture_id:
+                print("Failed to create embedding for ", lecture_source )
+                exit(1)
+            result = create_embedding(lecture_source, lecture_id, args.index_type)
+            if not result:
+                print("Failed to create embedding")
+                exit(1)
+            result = generate_topic_titles(lecture_id)
+            if not result:
+                print("Failed to create topic titles")
+                exit(1)
+            if not args.skip_quizzes:
+                summary = pregenerate_quizzes(fetch_topics_without_quiz(lecture_id))
+                print(f"Quizzes: {summary}")
+        elif args.lecture_command == 'update':
+            print("Enter Lecture ID: ")
+            lecture_id = input()
+            print("Lecture Transcription File: ")
+            lecture_source = input()
+            result = reingest_lecture(lecture_source, lecture_id)
+            print(f"Chunks kept: {result['kept']}, added: {result['added']}, removed: {result['removed']}")
+            if not args.skip_quizzes:
+                summary = pregenerate_quizzes(result['topic_ids'])
+                print(f"Quizzes: {summary}")
+        elif args.lecture_command == 'delete':
+            print("Enter Lecture ID: ")
+            lecture_id = input()
+            result = delete_topics_by_lecture(lecture_id)
+            if not result:
+                print("Failed to delete topics by lecture")
+            update_course_index(lecture_id)
+            result = delete_lecture_by_id(lecture_id)
+            if not result:
+                print("Failed to delete lecture")
+    elif args.command == 'quiz':
+        if args.quiz_command == 'backfill':
+            if args.lecture_id:
+                topic_ids = [topic_id for lecture_id in args.lecture_id for topic_id in fetch_topics_without_quiz(lecture_id)]
+            else:
+                topic_ids = fetch_topics_without_quiz()
+            print(f"{len(topic_ids)} topics without a quiz")
+            summary = pregenerate_quizzes(topic_ids, concurrency=args.concurrency, rate=args.rate)
+            print(f"Quizzes: {summary}")
+            if summary['failed']:
+                exit(1)
+    elif args.command == 'course':
+        if args.course_command == 'ingest':
+            entries = load_manifest(args.path, args.license)
+            print(f"Ingesting {len(entries)} lectures with {args.workers} workers")
+
+            def print_report(report):
+                print(f"{report['status']:<9} {report['lecture_name']} ({report['seconds']:.1f}s)"
+                      + (f": {report['error']}" if report['error'] else ""))
+
+            reports = ingest_course(entries, args.course_id, workers=args.workers, rate=args.rate, on_result=print_report,
+                                    index_type=args.index_type)
+
+            print(f"\n{'lecture':<40}{'id':>8}{'status':>10}{'topics':>8}{'seconds':>9}")
+            for report in reports:
+                lecture_id = report['lecture_id'] if report['lecture_id'] is not None else '-'
+                print(f"{report['lecture_name'][:39]:<40}{lecture_id:>8}{report['status']:>10}"
+                      f"{report['topics']:>8}{report['seconds']:>9.1f}")
+            failed = [report for report in reports if report['status'] == 'failed']
+            print(f"Ingested: {sum(report['status'] == 'ingested' for report in reports)}, "
+                  f"skipped: {sum(report['status'] == 'skipped' for report in reports)}, failed: {len(failed)}")
 
-# Parse the command line arguments
-args = parser.parse_args()
-
-# Process the arguments based on the command and sub-commands
-if args.command == 'titles':
-    if args.title_command == 'create':
-        print("Enter Lecture ID: ")
-        lecture_id = input()
-        result = generate_topic_titles(lecture_id)
-    elif args.title_command == 'delete':
-        print("Enter Lecture ID: ")
-        lecture_id = input()
-        result = delete_topics_by_lecture(lecture_id)
-        if not result:
-            print("Failed to delete topic titles")
-elif args.command == 'lecture':
-    if args.lecture_command == 'create':
-        print("Enter Course ID: ")
-        course_id = input()
-        print("Lecture Title: ")
-        lecture_name = input()
-        print("Lecture Transcription File: ")
-        lecture_source = input()
-        print("Lecture License: ")
-        lecture_license = input()
-        lecture_id = create_lecture(course_id,  lecture_name, lecture_license)
-
-        if not lecture_id:
-            print("Failed to create embedding for ", lecture_source )
-            exit(1)
-        result = create_embedding(lecture_source, lecture_id)
-        if not result:
-            print("Failed to create embedding")
-            exit(1)
-        result = generate_topic_titles(lecture_id)
-        if not result:
-            print("Failed to create topic titles")
-    elif args.lecture_command == 'delete':
-        print("Enter Lecture ID: ")
-        lecture_id = input()
-        result = delete_topics_by_lecture(lecture_id)
-        if not result:
-            print("Failed to delete topics by lecture")
-        result = delete_lecture_by_id(lecture_id)
-        if not result:
-            print("Failed to delete lecture")
+            if not args.skip_quizzes:
+                ingested = [report['lecture_id'] for report in reports if report['status'] == 'ingested']
+                topic_ids = [topic_id for lecture_id in ingested for topic_id in fetch_topics_without_quiz(lecture_id)]
+                summary = pregenerate_quizzes(topic_ids)
+                print(f"Quizzes: {summary}")
+            if failed:
+                exit(1)
+        elif args.course_command == 'reindex':
+            count = rebuild_course_index(args.course_id)
+            print(f"Course {args.course_id} index: {count} topics")
+    elif args.command == 'embeddings':
+        if args.embeddings_command == 'convert':
+            converted = 0
+            for lecture_id in args.lecture_id or list_lecture_stores():
+                try:
+                    if convert_lecture_store(lecture_id):
+                        converted += 1
+                        print(f"Converted lecture {lecture_id}")
+                except Exception as e:
+                    print(f"Failed to convert lecture {lecture_id}: {e}")
+            print(f"Converted {converted} lectures")
@@ -1,5 +1,4 @@
 import uuid
-import pandas as pd
 
 from agents.database  import (
     get_topic_quiz,
@@ -15,8 +14,8 @@ from agents.query_agent import (
     generate_quiz_and_cache, 
     generate_conceptual_clarity)
     
-import agents.quiz_prompt
-import agents.concept_prompt
+import agents.quiz_prompt as quiz_prompt
+import agents.concept_prompt as concept_prompt
 
 
 def display_lectures(lectures):
@@ -57,11 +56,14 @@ if __name__ == '__main__':
 
     quiz_dict = get_topic_quiz(topic_id, level=0)
     if not quiz_dict:
-        rag_db = str(lecture_id)
-        query_agent = QueryAgent(rag_db, quiz_prompt.PREFIX, quiz_prompt.FORMAT_INSTRUCTIONS, quiz_prompt.SUFFIX)
+        query_agent = QueryAgent(quiz_prompt.PREFIX, quiz_prompt.FORMAT_INSTRUCTIONS, quiz_prompt.SUFFIX)
         query_agent.setup_workflow()
         generate_quiz_and_cache(query_agent, topic_id)
 
+    concept_agent = QueryAgent(concept_prompt.PREFIX, concept_prompt.FORMAT_INSTRUCTIONS, concept_prompt.SUFFIX,
+                               prompt_variables=concept_prompt.PROMPT_VARIABLES)
+    concept_agent.setup_workflow()
+
     for level in range(3):
         quiz_dict = get_topic_quiz(topic_id, level)
         if(quiz_dict):
@@ -79,12 +81,9 @@ if __name__ == '__main__':
             else:
                 print("Answer is Wrong! Look at the following for clarity.")
                 # Get concept
-                rag_db = str(lecture_id)
-                prompt_prefix = concept_prompt.get_formatted(concept_prompt.PREFIX, topic_summary, quiz_dict, answer)
-                concept_agent = QueryAgent(rag_db, prompt_prefix, concept_prompt.FORMAT_INSTRUCTIONS, concept_prompt.SUFFIX)
-                concept_agent.setup_workflow()
+                prompt_vars = concept_prompt.get_prompt_variables(topic_summary, quiz_dict, answer)
                 # Quick check
-                concept = generate_conceptual_clarity(concept_agent, topic_id)
+                concept = generate_conceptual_clarity(concept_agent, topic_id, prompt_vars)
                 print(concept)
                 input("Press Enter to continue...")
 
@@ -0,0 +1,232 @@
+import asyncio
+import contextlib
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+from agents.query_agent import (get_quiz_agent, get_concept_agent, agenerate_quiz_once, aget_cached_conceptual_clarity,
+                                 astream_conceptual_clarity)
+from agents.agent_pool import lecture_pool, preload_lectures
+from agents.vector_store import get_embedder, index_memory
+from agents.course_index import course_pool, search_course
+from agents.topic_search import hybrid_search
+from agents.llm_cache import get_llm_cache
+from agents.quiz_pregen import CONCEPT_PREWARM, get_pregenerator
+from agents.concept_prompt import parse_answer
+from servers.sse import SSE_HEADERS, sse_event
+from agents.database import (
+    get_topic_quiz,
+    get_topic_bundle,
+    fetch_lectures_by_course,
+    fetch_topics_by_lecture,
+    fetch_topics_by_ids,
+    search_topics,
+    add_session,
+    session_exists,
+    run_db)
+
+# LLM generations (quiz misses and explanations) running at once; further requests wait.
+ASYNC_MAX_CONCURRENCY = int(os.environ.get("ASYNC_MAX_CONCURRENCY", 256))
+ASYNC_PORT = int(os.environ.get("ASYNC_PORT", 8080))
+
+# Agents are compiled once per process; requests pass the lecture and prompt values as input.
+quiz_agent = get_quiz_agent()
+concept_agent = get_concept_agent()
+preload_lectures()
+
+generation_slots = asyncio.Semaphore(ASYNC_MAX_CONCURRENCY)
+routes = web.RouteTableDef()
+
+
+def arg(request, name, default=None):
+    """ A query string argument; a missing one without default is a 400, as in the Flask server. """
+    value = request.query.get(name, default)
+    if value is None:
+        raise web.HTTPBadRequest(text=f"Missing argument {name}")
+    return value
+
+async def check_session(session_id):
+    if not await run_db(session_exists, session_id):
+        raise web.HTTPUnauthorized(text='{"error": "Invalid session ID"}', content_type='application/json')
+
+
+@routes.post('/register')
+async def register(request):
+    session_id = str(uuid.uuid4())
+    await run_db(add_session, session_id)
+    return web.json_response({'session_id': session_id})
+
+@routes.get('/lectures')
+async def lectures(request):
+    await check_session(arg(request, 'session_id'))
+    rows = await run_db(fetch_lectures_by_course, arg(request, 'course_id', 1))
+    return web.json_response([{'lecture_id': row[0], 'lecture_title': row[1], 'license': row[2]} for row in rows])
+
+@routes.get('/topics')
+async def topics(request):
+    await check_session(arg(request, 'session_id'))
+    rows = await run_db(fetch_topics_by_lecture, arg(request, 'lecture_id'))
+    return web.json_response([{'topic_id': row[0], 'topic_title': row[1]} for row in rows])
+
+@routes.get('/search')
+async def search(request):
+    await check_session(arg(request, 'session_id'))
+    course_id = arg(request, 'course_id', 1)
+    query = arg(request, 'q', '').strip()
+    if not query:
+        return web.json_response({'error': 'Query is required'}, status=400)
+    k = min(int(arg(request, 'k', 5)), 50)
+    lecture_ids = [int(lecture_id) for lecture_id in request.query.getall('lecture_id', [])]
+    mode = arg(request, 'mode', 'vector')
+    if mode == 'keyword':
+        rows = await run_db(search_topics, query, course_id, lecture_ids, k)
+        return web.json_response([{'topic_id': row['topic_id'], 'topic_title': row['topic_title'],
+                                   'lecture_id': row['lecture_id'], 'lecture_title': row['lecture_title'],
+                                   'score': row['score']} for row in rows])
+    if mode == 'hybrid':
+        return web.json_response(await asyncio.to_thread(hybrid_search, course_id, query, k, lecture_ids))
+    if mode != 'vector':
+        return web.json_response({'error': 'mode must be one of vector, keyword, hybrid'}, status=400)
+    # The query embedding is an API call: it runs off the event loop.
+    results = await asyncio.to_thread(search_course, course_id, query, k, lecture_ids)
+    if results is None:
+        return web.json_response({'error': 'Course has no search index'}, status=404)
+    rows = await run_db(fetch_topics_by_ids, [topic_id for _, topic_id, _ in results])
+    return web.json_response([{'topic_id': topic_id, 'topic_title': rows[topic_id]['topic_title'],
+                               'lecture_id': lecture_id, 'lecture_title': rows[topic_id]['lecture_title'],
+                               'distance': distance}
+                              for lecture_id, topic_id, distance in results if topic_id in rows])
+
+@routes.get('/quiz')
+async def quiz(request):
+    await check_session(arg(request, 'session_id'))
+    topic_id = int(arg(request, 'topic_id'))
+    level = int(arg(request, 'level', 0))
+    bundle = await run_db(get_topic_bundle, topic_id)
+    if not bundle:
+        return web.json_response({'error': 'Topic not found'}, status=404)
+    quiz = bundle['quiz'].get(level)
+    if not quiz:
+        try:
+            generated = await agenerate_quiz_once(quiz_agent, topic_id, slots=generation_slots)
+            if generated and CONCEPT_PREWARM:
+                get_pregenerator().submit_prewarm(topic_id)
+        except TimeoutError:
+            return web.json_response({'error': 'Quiz generation is taking too long, retry shortly'}, status=503)
+        bundle = await run_db(get_topic_bundle, topic_id)
+        quiz = bundle['quiz'].get(level)
+    if not quiz:
+        return web.json_response({'error': 'Failed to generate quiz'}, status=500)
+    return web.json_response({
+        "topic_id": topic_id,
+        "level": level,
+        "summary": bundle['summary'],
+        "question": quiz["question"],
+        "choices": quiz["choices"]
+    })
+
+@routes.get('/conceptual_clarity')
+async def conceptual_clarity(request):
+    await check_session(arg(request, 'session_id'))
+    topic_id = int(arg(request, 'topic_id'))
+    level = int(arg(request, 'level'))
+    # Explanations are cached per answer: anything but a to d would be a new paid generation.
+    answer = parse_answer(arg(request, 'answer'))
+    if answer is None:
+        return web.json_response({'error': 'Answer must be one of a, b, c, d'}, status=400)
+    bundle = await run_db(get_topic_bundle, topic_id)
+    if not bundle or level not in bundle['quiz']:
+        return web.json_response({'error': 'Quiz not found'}, status=404)
+    concept = await aget_cached_conceptual_clarity(concept_agent, bundle, level, answer, slots=generation_slots)
+    return web.json_response({'concept': concept, 'summary': bundle['summary']})
+
+# /conceptual_clarity as server-sent events: `text` chunks as they are generated, then `done`.
+@routes.get('/conceptual_clarity/stream')
+async def conceptual_clarity_stream(request):
+    await check_session(arg(request, 'session_id'))
+    topic_id = int(arg(request, 'topic_id'))
+    level = int(arg(request, 'level'))
+    answer = parse_answer(arg(request, 'answer'))
+    if answer is None:
+        return web.json_response({'error': 'Answer must be one of a, b, c, d'}, status=400)
+    bundle = await run_db(get_topic_bundle, topic_id)
+    if not bundle or level not in bundle['quiz']:
+        return web.json_response({'error': 'Quiz not found'}, status=404)
+
+    response = web.StreamResponse(headers={'Content-Type': 'text/event-stream', **SSE_HEADERS})
+    await response.prepare(request)
+    # Closing the stream when the client goes away releases its generation slot.
+    async with contextlib.aclosing(astream_conceptual_clarity(
+            concept_agent, bundle, level, answer, slots=generation_slots)) as chunks:
+        try:
+            async for chunk in chunks:
+                await response.write(sse_event({'text': chunk}).encode())
+        except ConnectionResetError:
+            raise
+        except Exception as e:
+            print(f"Failed to stream the explanation of topic {topic_id}: {e}")
+            await response.write(sse_event({'error': 'Failed to generate explanation'}, 'error').encode())
+            return response
+    await response.write(sse_event({'summary': bundle['summary']}, 'done').encode())
+    return response
+
+@routes.post('/submit_answer')
+async def submit_answer(request):
+    data = await request.json()
+    await check_session(data['session_id'])
+    quiz_dict = await run_db(get_topic_quiz, int(data['topic_id']), int(data['level']))
+    if ord(quiz_dict["answer"]) == ord('a') + data['answer']:
+        response = {"message": "Correct Answer", "result": 'true'}
+    else:
+        response = {"message": "Wrong Answer", "result": 'false'}
+    return web.json_response(response)
+
+@routes.get('/stats')
+async def stats(request):
+    embedder = get_embedder()
+    llm_cache = get_llm_cache()
+    return web.json_response({
+        'lecture_pool': lecture_pool.stats(),
+        'course_pool': course_pool.stats(),
+        'lecture_indexes': index_memory(),
+        'embedding_cache': embedder.stats() if hasattr(embedder, 'stats') else None,
+        'llm_cache': llm_cache.stats() if llm_cache else None
+    })
+
+
+@web.middleware
+async def cors(request, handler):
+    """ Answers preflight requests; add_cors_headers() allows every origin on the responses. """
+    if request.method == 'OPTIONS':
+        return web.Response()
+    return await handler(request)
+
+async def add_cors_headers(request, response):
+    """
+    Allows every origin, like flask_cors' defaults in the Flask server. Runs as each response
+    is prepared, so it also covers raised errors and event streams.
+    """
+    response.headers.update({
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Headers': request.headers.get('Access-Control-Request-Headers', '*'),
+        'Access-Control-Allow-Methods': 'GET, POST, OPTIONS'})
+
+async def size_default_executor(app):
+    # LLM and embedding clients without native async support run on the loop's default
+    # executor when awaited; size it so it does not cap generations below the slots.
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(ASYNC_MAX_CONCURRENCY + 32, thread_name_prefix="async-llm"))
+
+
+def create_app():
+    app = web.Application(middlewares=[cors])
+    app.add_routes(routes)
+    app.on_startup.append(size_default_executor)
+    app.on_response_prepare.append(add_cors_headers)
+    return app
+
+
+if __name__ == '__main__':
+    web.run_app(create_app(), host='0.0.0.0', port=ASYNC_PORT)
@@ -2,12 +2,22 @@ from flask import Flask, request, jsonify
 import uuid
 import sqlite3
 import json
+import os
 
-from agents.course_agent import create_embedding, generate_topic_titles, create_lecture
-from agents.database import get_lecture_id, delete_topics_by_lecture, delete_lecture_by_id
+from agents.course_agent import create_embedding, generate_topic_titles, create_lecture, reingest_lecture
+from agents.database import get_lecture_id, get_lecture_course_id, delete_topics_by_lecture, delete_lecture_by_id, get_job
+from agents.agent_pool import invalidate_lecture
+from agents.course_index import update_course_index
+from agents.quiz_pregen import queue_lecture_quizzes
+from agents.ingest_jobs import get_job_runner
+from agents.vector_index import INDEX_TYPES
 
 app = Flask(__name__)
 
+# Resume lecture ingestion jobs interrupted by a restart of the server; jobs whose lease has not
+# expired yet are taken over by the runner's periodic recovery once it does.
+get_job_runner().recover()
+
 @app.route('/titles/create', methods=['POST'])
 def create_titles():
     data = request.json
@@ -15,6 +25,8 @@ def create_titles():
     if lecture_id is None:
         return jsonify({'error': 'Lecture ID is required'}), 400
     result = generate_topic_titles(lecture_id)
+    if result:
+        queue_lecture_quizzes(lecture_id)
     return jsonify(result), 200 if result else 500
 
 @app.route('/titles/delete', methods=['DELETE'])
@@ -26,6 +38,7 @@ def delete_titles():
     result = delete_topics_by_lecture(lecture_id)
     if not result:
         return jsonify({'error': 'Failed to delete topic titles'}), 500
+    update_course_index(lecture_id)
     return jsonify({'message': 'Topics deleted successfully'}), 200
 
 @app.route('/lecture/create', methods=['POST'])
@@ -35,23 +48,81 @@ def create_lecture_endpoint():
     lecture_name = data.get('lecture_name')
     lecture_source = data.get('lecture_source')
     lecture_license = data.get('lecture_license')
+    index_type = data.get('index_type')
 
     if not all([course_id, lecture_name, lecture_source, lecture_license]):
         return jsonify({'error': 'All fields are required'}), 400
+    if index_type is not None and index_type not in INDEX_TYPES:
+        return jsonify({'error': f"index_type must be one of {', '.join(INDEX_TYPES)}"}), 400
+
+    # Ingestion takes minutes: by default it runs as a background job polled on /jobs/<job_id>.
+    if not data.get('wait'):
+        job_id = get_job_runner().submit({'course_id': course_id, 'lecture_name': lecture_name,
+                                          'lecture_source': lecture_source, 'lecture_license': lecture_license,
+                                          'index_type': index_type})
+        return jsonify({'message': 'Lecture creation queued', 'job_id': job_id,
+                        'status_url': f'/jobs/{job_id}'}), 202
 
     lecture_id = create_lecture(course_id, lecture_name, lecture_license)
     if not lecture_id:
         return jsonify({'error': 'Failed to create lecture'}), 500
 
-    result = create_embedding(lecture_source, lecture_id)
+    result = create_embedding(lecture_source, lecture_id, index_type)
     if not result:
         return jsonify({'error': 'Failed to create embedding'}), 500
 
     result = generate_topic_titles(lecture_id)
     if not result:
         return jsonify({'error': 'Failed to create topic titles'}), 500
-    
-    return jsonify({'message': 'Lecture created successfully', 'lecture_id': lecture_id}), 200
+
+    # Quizzes are generated in the background so the first student does not wait for them.
+    quizzes_queued = queue_lecture_quizzes(lecture_id)
+
+    return jsonify({'message': 'Lecture created successfully', 'lecture_id': lecture_id,
+                    'quizzes_queued': quizzes_queued}), 200
+
+@app.route('/lecture/update', methods=['POST'])
+def update_lecture_endpoint():
+    data = request.json
+    lecture_id = data.get('lecture_id')
+    lecture_source = data.get('lecture_source')
+
+    if not all([lecture_id, lecture_source]):
+        return jsonify({'error': 'Lecture ID and source are required'}), 400
+    if get_lecture_course_id(lecture_id) is None:
+        return jsonify({'error': 'Lecture not found'}), 404
+    if not os.path.isfile(lecture_source):
+        return jsonify({'error': 'Lecture source not found'}), 400
+
+    # Only new or edited chunks are embedded and titled; unchanged topics keep their quizzes.
+    try:
+        result = reingest_lecture(lecture_source, lecture_id)
+        quizzes_queued = queue_lecture_quizzes(lecture_id)
+    except Exception as e:
+        print(f"Failed to update lecture {lecture_id}: {e}")
+        return jsonify({'error': 'Failed to update lecture'}), 500
+
+    return jsonify({'message': 'Lecture updated successfully', 'lecture_id': lecture_id,
+                    'kept': result['kept'], 'added': result['added'], 'removed': result['removed'],
+                    'quizzes_queued': quizzes_queued}), 200
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    job.pop('owner', None)
+    job.pop('heartbeat', None)
+    return jsonify(job), 200
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    job = get_job_runner().cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if not job['cancel_requested']:
+        return jsonify({'error': f"Job already {job['status']}"}), 409
+    return jsonify({'message': 'Cancellation requested', 'status': job['status']}), 202
 
 @app.route('/lecture/delete', methods=['DELETE'])
 def delete_lecture():
@@ -63,10 +134,13 @@ def delete_lecture():
     result = delete_topics_by_lecture(lecture_id)
     if not result:
         return jsonify({'error': 'Failed to delete topics by lecture'}), 500
+    # Before the lecture row goes: the course index is found through it.
+    update_course_index(lecture_id)
 
     result = delete_lecture_by_id(lecture_id)
     if not result:
         return jsonify({'error': 'Failed to delete lecture'}), 500
+    invalidate_lecture(lecture_id)
 
     return jsonify({'message': 'Lecture deleted successfully'}), 200
 
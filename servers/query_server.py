@@ -1,23 +1,36 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 import uuid
 from flask_cors import CORS
 
-from agents.query_agent import QueryAgent, generate_quiz_and_cache, generate_conceptual_clarity
+from agents.query_agent import get_quiz_agent, get_concept_agent, generate_quiz_once, get_cached_conceptual_clarity, stream_conceptual_clarity
+from agents.agent_pool import lecture_pool, preload_lectures
+from agents.vector_store import get_embedder, index_memory
+from agents.course_index import course_pool, search_course
+from agents.topic_search import hybrid_search
+from agents.llm_cache import get_llm_cache
+from agents.quiz_pregen import CONCEPT_PREWARM, get_pregenerator
+from agents.concept_prompt import parse_answer
+from servers.sse import SSE_HEADERS, sse_event
 from agents.database import (
     get_topic_quiz, 
-    get_topic_summary, 
+    get_topic_bundle,
     fetch_lectures_by_course, 
     fetch_topics_by_lecture, 
+    fetch_topics_by_ids,
+    search_topics,
     add_session, 
-    session_exists,
-    get_topic_lecture_id)
+    session_exists)
 
-import agents.concept_prompt as concept_prompt 
-import agents.quiz_prompt as quiz_prompt
 
 app = Flask(__name__)
 CORS(app)
 
+# Agents are compiled once per process; requests pass the lecture and prompt values as input.
+quiz_agent = get_quiz_agent()
+concept_agent = get_concept_agent()
+# Lectures named by PRELOAD_LECTURES are loaded here, before a pre-fork server forks workers.
+preload_lectures()
+
 
 @app.route('/register', methods=['POST'])
 def register():
@@ -45,6 +58,37 @@ def topics():
     topics = [{'topic_id': row[0], 'topic_title': row[1]} for row in rows]
     return jsonify(topics)
 
+@app.route('/search', methods=['GET'])
+def search():
+    session_id = request.args['session_id']
+    if not session_exists(session_id):
+        return jsonify({'error': 'Invalid session ID'}), 401
+    course_id = request.args.get('course_id', 1)  # Default course ID
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Query is required'}), 400
+    k = min(int(request.args.get('k', 5)), 50)
+    lecture_ids = [int(lecture_id) for lecture_id in request.args.getlist('lecture_id')]
+    mode = request.args.get('mode', 'vector')
+    if mode == 'keyword':
+        # BM25 over titles, summaries and quizzes: no embedding call.
+        rows = search_topics(query, course_id, lecture_ids, k)
+        return jsonify([{'topic_id': row['topic_id'], 'topic_title': row['topic_title'], 'lecture_id': row['lecture_id'],
+                         'lecture_title': row['lecture_title'], 'score': row['score']} for row in rows])
+    if mode == 'hybrid':
+        return jsonify(hybrid_search(course_id, query, k, lecture_ids))
+    if mode != 'vector':
+        return jsonify({'error': 'mode must be one of vector, keyword, hybrid'}), 400
+    # One lookup in the course index ranks the topics of every lecture together.
+    results = search_course(course_id, query, k, lecture_ids)
+    if results is None:
+        return jsonify({'error': 'Course has no search index'}), 404
+    rows = fetch_topics_by_ids([topic_id for _, topic_id, _ in results])
+    topics = [{'topic_id': topic_id, 'topic_title': rows[topic_id]['topic_title'], 'lecture_id': lecture_id,
+               'lecture_title': rows[topic_id]['lecture_title'], 'distance': distance}
+              for lecture_id, topic_id, distance in results if topic_id in rows]
+    return jsonify(topics)
+
 @app.route('/quiz', methods=['GET'])
 def quiz():
     session_id = request.args['session_id']
@@ -52,19 +96,25 @@ def quiz():
         return jsonify({'error': 'Invalid session ID'}), 401
     topic_id = int(request.args['topic_id'])
     level = int(request.args.get('level', 0))
-    quiz = get_topic_quiz(topic_id, level)
+    bundle = get_topic_bundle(topic_id)
+    if not bundle:
+        return jsonify({'error': 'Topic not found'}), 404
+    quiz = bundle['quiz'].get(level)
     if not quiz:
-        lecture_id = get_topic_lecture_id(topic_id)
-        rag_db = str(lecture_id)
-        quiz_agent = QueryAgent(rag_db, quiz_prompt.PREFIX, quiz_prompt.FORMAT_INSTRUCTIONS, quiz_prompt.SUFFIX)
-        quiz_agent.setup_workflow()
-        generate_quiz_and_cache(quiz_agent, topic_id)
-        quiz = get_topic_quiz(topic_id, level)
-    topic_summary = get_topic_summary(topic_id)
+        try:
+            generated = generate_quiz_once(quiz_agent, topic_id)
+            if generated and CONCEPT_PREWARM:
+                get_pregenerator().submit_prewarm(topic_id)
+        except TimeoutError:
+            return jsonify({'error': 'Quiz generation is taking too long, retry shortly'}), 503
+        bundle = get_topic_bundle(topic_id)
+        quiz = bundle['quiz'].get(level)
+    if not quiz:
+        return jsonify({'error': 'Failed to generate quiz'}), 500
     response = {
         "topic_id": topic_id,
         "level": level,
-        "summary": topic_summary,
+        "summary": bundle['summary'],
         "question": quiz["question"],
         "choices": quiz["choices"]
     }
@@ -77,16 +127,42 @@ def conceptual_clarity():
         return jsonify({'error': 'Invalid session ID'}), 401
     topic_id = int(request.args['topic_id'])
     level = request.args['level']
-    answer = request.args['answer']
-    quiz_dict = get_topic_quiz(topic_id, int(level))
-    topic_summary = get_topic_summary(topic_id)
-    lecture_id = get_topic_lecture_id(topic_id)
-    rag_db = str(lecture_id)
-    prompt_prefix = concept_prompt.get_formatted(concept_prompt.PREFIX, topic_summary, quiz_dict, answer)
-    concept_agent = QueryAgent(rag_db, prompt_prefix, concept_prompt.FORMAT_INSTRUCTIONS, concept_prompt.SUFFIX)
-    concept_agent.setup_workflow()
-    concept = generate_conceptual_clarity(concept_agent, topic_id)
-    return jsonify({'concept': concept, 'summary': topic_summary})
+    # Explanations are cached per answer: anything but a to d would be a new paid generation.
+    answer = parse_answer(request.args['answer'])
+    if answer is None:
+        return jsonify({'error': 'Answer must be one of a, b, c, d'}), 400
+    bundle = get_topic_bundle(topic_id)
+    if not bundle or int(level) not in bundle['quiz']:
+        return jsonify({'error': 'Quiz not found'}), 404
+    concept = get_cached_conceptual_clarity(concept_agent, bundle, int(level), answer)
+    return jsonify({'concept': concept, 'summary': bundle['summary']})
+
+# /conceptual_clarity as server-sent events: `text` chunks as they are generated, then `done`.
+@app.route('/conceptual_clarity/stream', methods=['GET'])
+def conceptual_clarity_stream():
+    session_id = request.args['session_id']
+    if not session_exists(session_id):
+        return jsonify({'error': 'Invalid session ID'}), 401
+    topic_id = int(request.args['topic_id'])
+    level = int(request.args['level'])
+    answer = parse_answer(request.args['answer'])
+    if answer is None:
+        return jsonify({'error': 'Answer must be one of a, b, c, d'}), 400
+    bundle = get_topic_bundle(topic_id)
+    if not bundle or level not in bundle['quiz']:
+        return jsonify({'error': 'Quiz not found'}), 404
+
+    def events():
+        try:
+            for chunk in stream_conceptual_clarity(concept_agent, bundle, level, answer):
+                yield sse_event({'text': chunk})
+        except Exception as e:
+            print(f"Failed to stream the explanation of topic {topic_id}: {e}")
+            yield sse_event({'error': 'Failed to generate explanation'}, 'error')
+            return
+        yield sse_event({'summary': bundle['summary']}, 'done')
+
+    return Response(events(), mimetype='text/event-stream', headers=SSE_HEADERS)
 
 @app.route('/submit_answer', methods=['POST'])
 def submit_answer():
@@ -105,6 +181,18 @@ def submit_answer():
         response = {"message": "Wrong Answer", "result": 'false'}
     return jsonify(response)
 
+@app.route('/stats', methods=['GET'])
+def stats():
+    embedder = get_embedder()
+    llm_cache = get_llm_cache()
+    return jsonify({
+        'lecture_pool': lecture_pool.stats(),
+        'course_pool': course_pool.stats(),
+        'lecture_indexes': index_memory(),
+        'embedding_cache': embedder.stats() if hasattr(embedder, 'stats') else None,
+        'llm_cache': llm_cache.stats() if llm_cache else None
+    })
+
     
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=8080, debug=True)
@@ -0,0 +1,10 @@
+import json
+
+# Sent with every event stream: proxies such as nginx must pass events on as they come.
+SSE_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+
+def sse_event(data, event=None):
+    """ One server-sent event carrying `data` as JSON, of type `event` if given. """
+    head = f"event: {event}\n" if event else ""
+    return f"{head}data: {json.dumps(data)}\n\n"
@@ -0,0 +1,12 @@
+import os
+import tempfile
+
+# Importing agents.database creates and migrates QUIZ_DB_PATH, so the tests point it and the
+# other on-disk caches at a scratch directory before any agents module is imported. Processes
+# spawned by the tests re-import this package and inherit the parent's directory.
+if "QUIZ_TEST_DIR" not in os.environ:
+    _tmpdir = tempfile.TemporaryDirectory()
+    os.environ["QUIZ_TEST_DIR"] = _tmpdir.name
+    os.environ["QUIZ_DB_PATH"] = os.path.join(_tmpdir.name, "quiz.db")
+    os.environ["LLM_CACHE_PATH"] = os.path.join(_tmpdir.name, "llm_cache.db")
+    os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(_tmpdir.name, "embedding_cache.db")
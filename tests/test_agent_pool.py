@@ -0,0 +1,113 @@
+import threading
+import unittest
+from unittest import mock
+
+from agents import agent_pool
+from agents.agent_pool import LRUPool
+
+
+class TestLRUPool(unittest.TestCase):
+    def setUp(self):
+        self.builds = []
+        self.versions = {}
+
+    def factory(self, key):
+        self.builds.append(key)
+        return "value-" + key
+
+    def test_hits_and_misses(self):
+        pool = LRUPool(self.factory, max_entries=4)
+        self.assertEqual(pool.get("1"), "value-1")
+        self.assertEqual(pool.get("1"), "value-1")
+        self.assertEqual(self.builds, ["1"])
+        stats = pool.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_lru_eviction_by_entries(self):
+        pool = LRUPool(self.factory, max_entries=2)
+        pool.get("1")
+        pool.get("2")
+        pool.get("1")  # "2" is now least recently used
+        pool.get("3")
+        self.assertIn("1", pool)
+        self.assertNotIn("2", pool)
+        self.assertEqual(pool.stats()["evictions"], 1)
+
+    def test_eviction_by_bytes(self):
+        pool = LRUPool(self.factory, max_entries=10, max_bytes=100, sizeof=lambda value: 40)
+        for key in ("1", "2", "3"):
+            pool.get(key)
+        self.assertNotIn("1", pool)
+        self.assertEqual(pool.stats()["bytes"], 80)
+
+    def test_oversized_entry_is_kept(self):
+        pool = LRUPool(self.factory, max_entries=10, max_bytes=10, sizeof=lambda value: 40)
+        pool.get("1")
+        self.assertIn("1", pool)
+
+    def test_version_change_rebuilds(self):
+        pool = LRUPool(self.factory, version=lambda key: self.versions.get(key))
+        pool.get("1")
+        self.versions["1"] = "rewritten"
+        pool.get("1")
+        self.assertEqual(self.builds, ["1", "1"])
+        self.assertEqual(pool.stats()["invalidations"], 1)
+
+    def test_invalidate(self):
+        pool = LRUPool(self.factory)
+        pool.get("1")
+        pool.invalidate("1")
+        pool.get("1")
+        self.assertEqual(self.builds, ["1", "1"])
+
+    def test_concurrent_misses_build_once(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_factory(key):
+            started.set()
+            release.wait()
+            return self.factory(key)
+
+        pool = LRUPool(slow_factory)
+        threads = [threading.Thread(target=pool.get, args=("1",)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        started.wait()
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.builds, ["1"])
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+class TestPreloadLectures(unittest.TestCase):
+    def setUp(self):
+        self.built = []
+        def factory(key):
+            if key == "missing":
+                raise FileNotFoundError(key)
+            self.built.append(key)
+            return key
+        for name, value in [("lecture_pool", LRUPool(factory)), ("FAISS_MMAP", False),
+                            ("list_lecture_stores", lambda: ["1", "2"])]:
+            patcher = mock.patch.object(agent_pool, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_preloads_configured_lectures(self):
+        with mock.patch.object(agent_pool, "PRELOAD_LECTURES", "3, missing,4"):
+            self.assertEqual(agent_pool.preload_lectures(), ["3", "4"])
+        self.assertEqual(self.built, ["3", "4"])
+        self.assertIn("3", agent_pool.lecture_pool)
+
+    def test_preloads_all_lectures(self):
+        with mock.patch.object(agent_pool, "PRELOAD_LECTURES", "all"):
+            self.assertEqual(agent_pool.preload_lectures(), ["1", "2"])
+
+    def test_nothing_by_default(self):
+        with mock.patch.object(agent_pool, "PRELOAD_LECTURES", ""):
+            self.assertEqual(agent_pool.preload_lectures(), [])
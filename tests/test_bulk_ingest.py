@@ -0,0 +1,52 @@
+import json
+import os
+import tempfile
+import unittest
+
+from agents import database
+from agents.bulk_ingest import load_manifest, ingest_lecture
+from tests.test_database import DatabaseTestCase
+
+
+class TestLoadManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def test_directory_of_transcripts(self):
+        for name in ("02 Light.txt", "01 Clocks.txt", "notes.md"):
+            open(os.path.join(self.tmpdir.name, name), "w").close()
+        entries = load_manifest(self.tmpdir.name, "CC-BY")
+        self.assertEqual([entry['lecture_name'] for entry in entries], ["01 Clocks", "02 Light"])
+        self.assertEqual(entries[0]['lecture_source'], os.path.join(self.tmpdir.name, "01 Clocks.txt"))
+        self.assertEqual(entries[0]['lecture_license'], "CC-BY")
+
+    def test_json_manifest(self):
+        path = os.path.join(self.tmpdir.name, "course.json")
+        with open(path, "w") as file:
+            json.dump([{"lecture_name": "Clocks", "lecture_source": "clocks.txt"},
+                       {"lecture_name": "Light", "lecture_source": "/data/light.txt", "lecture_license": "MIT"}], file)
+        entries = load_manifest(path, "CC-BY")
+        self.assertEqual(entries[0]['lecture_source'], os.path.join(self.tmpdir.name, "clocks.txt"))
+        self.assertEqual(entries[0]['lecture_license'], "CC-BY")
+        self.assertEqual(entries[1]['lecture_source'], "/data/light.txt")
+        self.assertEqual(entries[1]['lecture_license'], "MIT")
+
+
+class TestIngestLecture(DatabaseTestCase):
+    def test_lecture_with_topics_is_skipped(self):
+        conn = database.get_db_connection()
+        conn.execute("INSERT INTO lectures (course_id, lecture_title, license) VALUES (7, 'Clocks', '')")
+        conn.commit()
+        lecture_id = database.get_course_lecture_id(7, "Clocks")
+        database.insert_topic(lecture_id, "Time dilation")
+        report = ingest_lecture(7, {'lecture_name': "Clocks", 'lecture_source': "missing.txt", 'lecture_license': ""})
+        self.assertEqual(report['status'], "skipped")
+        self.assertEqual(report['lecture_id'], lecture_id)
+        self.assertEqual(report['topics'], 1)
+
+    def test_lecture_of_another_course_is_not_reused(self):
+        conn = database.get_db_connection()
+        conn.execute("INSERT INTO lectures (course_id, lecture_title, license) VALUES (7, 'Clocks', '')")
+        conn.commit()
+        self.assertIsNone(database.get_course_lecture_id(8, "Clocks"))
@@ -0,0 +1,69 @@
+import os
+import tempfile
+import unittest
+
+from langchain_community.document_loaders import TextLoader
+
+from agents.chunking import get_text_splitter, split_around_chunks, iter_transcript_chunks
+
+SENTENCES = [f"Sentence {i} is about clocks and the relativity of simultaneity" for i in range(400)]
+TRANSCRIPT = ". ".join(SENTENCES) + "."
+
+
+class TestSplitAroundChunks(unittest.TestCase):
+    def setUp(self):
+        self.chunks = get_text_splitter().split_text(TRANSCRIPT)
+
+    def test_unchanged_transcript_keeps_every_chunk(self):
+        self.assertEqual(split_around_chunks(TRANSCRIPT, self.chunks), self.chunks)
+
+    def test_edit_only_resplits_the_edited_chunk(self):
+        edited = TRANSCRIPT.replace("Sentence 150 is about clocks", "Sentence 150 is about rods", 1)
+        pieces = split_around_chunks(edited, self.chunks)
+        changed = [piece for piece in pieces if piece not in self.chunks]
+        self.assertEqual(len(changed), 1)
+        self.assertIn("Sentence 150 is about rods", changed[0])
+        self.assertEqual(len(pieces), len(self.chunks))
+
+    def test_order_of_previous_chunks_does_not_matter(self):
+        self.assertEqual(split_around_chunks(TRANSCRIPT, list(reversed(self.chunks))), self.chunks)
+
+    def test_new_text_is_split(self):
+        appended = TRANSCRIPT + " " + TRANSCRIPT
+        pieces = split_around_chunks(appended, self.chunks)
+        self.assertEqual(pieces[:len(self.chunks)], self.chunks)
+        self.assertGreater(len(pieces), len(self.chunks))
+
+
+class TestIterTranscriptChunks(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, text):
+        path = os.path.join(self.tmpdir.name, "transcript.txt")
+        with open(path, "w", newline="") as file:
+            file.write(text)
+        return path
+
+    def assertSameChunks(self, text, **kwargs):
+        path = self.write(text)
+        expected = [doc.page_content for doc in get_text_splitter().split_documents(TextLoader(path).load())]
+        for block_size in (1, 13, 4096):
+            self.assertEqual(list(iter_transcript_chunks(path, block_size=block_size)), expected)
+
+    def test_matches_character_text_splitter(self):
+        self.assertSameChunks(TRANSCRIPT)
+
+    def test_edge_cases(self):
+        self.assertSameChunks("")
+        self.assertSameChunks("No separator at all")
+        self.assertSameChunks("..Leading dots. then  \n\n text...  trailing ")
+        self.assertSameChunks("word " * 1000 + ". " + "x" * 5000 + ". end.")
+        self.assertSameChunks("Windows\r\nline endings.\r\nagain.")
+
+
+if __name__ == '__main__':
+    unittest.main()
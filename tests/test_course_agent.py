@@ -0,0 +1,160 @@
+import contextlib
+import io
+import os
+import random
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+# course_agent builds its LLM and embedding clients on import; no call reaches them here.
+os.environ.setdefault("NVIDIA_API_KEY", "nvapi-test")
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+from langchain_core.embeddings import DeterministicFakeEmbedding  # noqa: E402
+
+from agents import chunking, course_agent, course_index, database, vector_store  # noqa: E402
+from agents.course_agent import create_embedding, generate_titles, generate_topic_titles  # noqa: E402
+from agents.docstore import DocstoreWriter  # noqa: E402
+from tests.test_database import DatabaseTestCase  # noqa: E402
+
+
+class FakeTitleLLM():
+    """ Titles each text after a random delay, failing the first call for texts in `flaky`. """
+
+    def __init__(self, flaky=()):
+        self.flaky = set(flaky)
+        self.calls = []
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def invoke(self, prompt):
+        text = prompt[len(course_agent.TOPIC_TITLE_PROMPT):]
+        with self._lock:
+            self.calls.append(text)
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            time.sleep(random.uniform(0, 0.01))
+            if text in self.flaky:
+                self.flaky.discard(text)
+                raise Exception("[429] Too Many Requests")
+            return mock.Mock(content=f"Title of {text}")
+        finally:
+            with self._lock:
+                self.running -= 1
+
+
+class CountingLimiter():
+    def __init__(self):
+        self.acquired = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            self.acquired += 1
+
+
+class TestGenerateTitles(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(course_agent, "TITLE_RETRY_BACKOFF", 0.001)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_titles_follow_input_order(self):
+        texts = [f"chunk {i}" for i in range(20)]
+        llm = FakeTitleLLM()
+        with mock.patch.object(course_agent, "llm", llm):
+            titles = generate_titles(texts, concurrency=4, rate=0)
+        self.assertEqual(titles, [f"Title of {text}" for text in texts])
+        self.assertLessEqual(llm.max_running, 4)
+        self.assertGreater(llm.max_running, 1)
+
+    def test_retries_go_through_the_limiter(self):
+        texts = [f"chunk {i}" for i in range(5)]
+        llm = FakeTitleLLM(flaky=["chunk 2"])
+        limiter = CountingLimiter()
+        with mock.patch.object(course_agent, "llm", llm):
+            titles = generate_titles(texts, concurrency=2, limiter=limiter)
+        self.assertEqual(titles, [f"Title of {text}" for text in texts])
+        self.assertEqual(llm.calls.count("chunk 2"), 2)
+        # Every attempt, the retry included, waits for the limiter.
+        self.assertEqual(limiter.acquired, 6)
+
+
+class TestCreateEmbedding(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.workdir.cleanup)
+        self.source = os.path.join(self.workdir.name, "lecture.txt")
+        with open(self.source, "w") as file:
+            file.write(" ".join(f"Sentence {i} about moving clocks." for i in range(60)))
+        self.expected = list(chunking.iter_transcript_chunks(self.source, chunk_size=80))
+        self.pulled = 0
+        self.writers = []
+        self.held = []
+        self.embedding_error = None
+        test = self
+
+        def chunks(path):
+            for chunk in chunking.iter_transcript_chunks(path, chunk_size=80):
+                self.pulled += 1
+                yield chunk
+
+        class RecordingWriter(DocstoreWriter):
+            def __init__(self, path):
+                super().__init__(path)
+                test.writers.append(self)
+
+        class RecordingEmbedder(DeterministicFakeEmbedding):
+            def embed_documents(self, texts):
+                # Chunks read from the transcript but not yet written to the docstore.
+                test.held.append(test.pulled - test.writers[0].count)
+                if test.embedding_error and len(test.held) > 1:
+                    raise test.embedding_error
+                return super().embed_documents(texts)
+
+        self.embedder = RecordingEmbedder(size=8)
+        for patcher in (mock.patch.object(vector_store, "RAG_DB_FOLDER", self.workdir.name),
+                        mock.patch.object(course_agent, "EMBED_BATCH_SIZE", 4),
+                        mock.patch.object(course_agent, "iter_transcript_chunks", chunks),
+                        mock.patch.object(course_agent, "DocstoreWriter", RecordingWriter),
+                        mock.patch.object(course_agent, "embedder", self.embedder),
+                        mock.patch.object(course_index, "COURSE_INDEX_ENABLED", False)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_chunks_in_memory_stay_within_a_batch(self):
+        self.assertTrue(create_embedding(self.source, 1, "flat"))
+        self.assertGreater(len(self.expected), 12)
+        self.assertEqual(len(self.held), -(-len(self.expected) // 4))
+        self.assertLessEqual(max(self.held), 4)
+
+        store = vector_store.load_lecture_store(1, self.embedder)
+        self.assertEqual(store.index.ntotal, len(self.expected))
+        texts = [store.docstore.search(store.index_to_docstore_id[i]).page_content for i in range(store.index.ntotal)]
+        self.assertEqual(texts, self.expected)
+        self.assertEqual(store.similarity_search(self.expected[5], k=1)[0].page_content, self.expected[5])
+
+    def test_topics_follow_transcript_order(self):
+        lecture_id = database.insert_lecture(1, "Clocks", "")
+        self.assertTrue(create_embedding(self.source, lecture_id, "flat"))
+        self.assertEqual(list(vector_store.load_lecture_store(lecture_id, self.embedder).index_to_docstore_id),
+                         list(range(len(self.expected))))
+        with mock.patch.object(course_agent, "llm", FakeTitleLLM()), contextlib.redirect_stdout(io.StringIO()):
+            self.assertTrue(generate_topic_titles(lecture_id, limiter=CountingLimiter()))
+        titles = [title for _, title in database.fetch_topics_by_lecture(lecture_id)]
+        self.assertEqual(titles, [f"Title of {text}" for text in self.expected])
+
+    def test_failure_leaves_no_docstore(self):
+        self.embedding_error = RuntimeError("api down")
+        with self.assertRaisesRegex(Exception, "api down"):
+            create_embedding(self.source, 1, "flat")
+        self.assertEqual(os.listdir(vector_store.lecture_store_path(1)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
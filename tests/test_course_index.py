@@ -0,0 +1,68 @@
+import tempfile
+from unittest import mock
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from agents import course_index, database, vector_store
+from tests.test_database import DatabaseTestCase
+
+
+class TestCourseIndex(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        self.embedder = DeterministicFakeEmbedding(size=8)
+        for patcher in (mock.patch.object(vector_store, "RAG_DB_FOLDER", self.folder.name),
+                        mock.patch.object(course_index, "COURSE_INDEX_FOLDER", self.folder.name + "/courses"),
+                        mock.patch.object(course_index, "get_embedder", lambda: self.embedder)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(course_index.course_pool.invalidate)
+
+    def add_lecture(self, course_id, title, texts):
+        """ Creates a lecture with a vector store and one topic per chunk, titled like the chunk. """
+        lecture_id = database.insert_lecture(course_id, title, "")
+        store = FAISS.from_documents([Document(page_content=text) for text in texts], self.embedder)
+        vector_store.save_lecture_store(store, lecture_id)
+        database.insert_topics(lecture_id, [(text, store.index_to_docstore_id[i], text) for i, text in enumerate(texts)])
+        return lecture_id
+
+    def titles(self, results):
+        return [database.get_topic_title(topic_id) for _, topic_id, _ in results]
+
+    def test_search_across_lectures(self):
+        clocks = self.add_lecture(7, "Clocks", ["pendulum", "quartz"])
+        light = self.add_lecture(7, "Light", ["photons", "lenses"])
+        self.assertEqual(course_index.sync_lecture(clocks), {'added': 2, 'removed': 0})
+        course_index.sync_lecture(light)
+
+        results = course_index.search_course(7, "lenses", k=4)
+        self.assertEqual(len(results), 4)
+        self.assertEqual(results[0][:1], (light,))
+        self.assertEqual(self.titles(results)[0], "lenses")
+        self.assertEqual(course_index.search_course(8, "lenses"), None)
+
+    def test_lecture_filter(self):
+        clocks = self.add_lecture(7, "Clocks", ["pendulum", "quartz"])
+        light = self.add_lecture(7, "Light", ["photons", "lenses"])
+        course_index.rebuild_course_index(7)
+        results = course_index.search_course(7, "lenses", k=4, lecture_ids=[clocks])
+        self.assertEqual({lecture_id for lecture_id, _, _ in results}, {clocks})
+        self.assertEqual(len(course_index.search_course(7, "lenses", k=4, lecture_ids=[clocks, light])), 4)
+
+    def test_incremental_updates(self):
+        clocks = self.add_lecture(7, "Clocks", ["pendulum", "quartz"])
+        light = self.add_lecture(7, "Light", ["photons"])
+        course_index.sync_lecture(clocks)
+        course_index.sync_lecture(light)
+        self.assertEqual(course_index.sync_lecture(clocks), {'added': 0, 'removed': 0})
+
+        database.delete_topics_by_lecture(clocks)
+        self.assertEqual(course_index.sync_lecture(clocks), {'added': 0, 'removed': 2})
+        self.assertEqual(self.titles(course_index.search_course(7, "quartz", k=4)), ["photons"])
+
+    def test_vector_ids(self):
+        self.assertEqual(course_index.split_vector_id(course_index.vector_id(3, 41)), (3, 41))
@@ -0,0 +1,266 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from agents import database
+from agents.database import ConnectionManager
+
+
+class TestConnectionManager(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.manager = ConnectionManager(os.path.join(self.tmpdir.name, "test.db"))
+
+    def tearDown(self):
+        self.manager.close_all()
+        self.tmpdir.cleanup()
+
+    def test_reuses_connection_within_thread(self):
+        self.assertIs(self.manager.connection(), self.manager.connection())
+
+    def test_separate_connection_per_thread(self):
+        main_conn = self.manager.connection()
+        other = []
+        thread = threading.Thread(target=lambda: other.append(self.manager.connection()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(main_conn, other[0])
+
+    def test_closes_connection_of_exited_thread(self):
+        connections = []
+        threads = [threading.Thread(target=lambda: connections.append(self.manager.connection()))
+                   for _ in range(20)]
+        for thread in threads:
+            thread.start()
+            thread.join()
+        self.assertEqual(len(self.manager._connections), 0)
+        for conn in connections:
+            with self.assertRaises(sqlite3.ProgrammingError):
+                conn.execute("SELECT 1")
+        # Connections of live threads are still open.
+        self.manager.connection().execute("SELECT 1")
+
+    def test_pragmas(self):
+        conn = self.manager.connection()
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        # synchronous=NORMAL is reported as 1
+        self.assertEqual(conn.execute("PRAGMA synchronous").fetchone()[0], 1)
+
+    def test_rolls_back_abandoned_transaction(self):
+        conn = self.manager.connection()
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.commit()
+        conn.execute("INSERT INTO t VALUES (1)")
+        conn = self.manager.connection()
+        self.assertFalse(conn.in_transaction)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM t").fetchone()[0], 0)
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """ Points the database helpers at a scratch database for the duration of a test. """
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.saved_manager = database.db_manager
+        database.db_manager = ConnectionManager(os.path.join(self.tmpdir.name, "test.db"))
+        database.create_tables()
+
+    def tearDown(self):
+        database.db_manager.close_all()
+        database.db_manager = self.saved_manager
+        self.tmpdir.cleanup()
+
+
+class TestTopicBundle(DatabaseTestCase):
+    def test_bundle_with_quiz(self):
+        topic_id = database.insert_topic(7, "Time dilation")
+        database.update_topic_summary(topic_id, "Moving clocks run slow.")
+        database.insert_topic_quiz(topic_id, 1, "Q1", ["a) 1", "b) 2", "c) 3", "d) 4"], "c")
+        database.insert_topic_quiz(topic_id, 0, "Q0", ["a) 1", "b) 2", "c) 3", "d) 4"], "a")
+
+        bundle = database.get_topic_bundle(topic_id)
+        self.assertEqual(bundle['title'], "Time dilation")
+        self.assertEqual(bundle['summary'], "Moving clocks run slow.")
+        self.assertEqual(bundle['lecture_id'], 7)
+        self.assertEqual(sorted(bundle['quiz']), [0, 1])
+        self.assertEqual(bundle['quiz'][1], database.get_topic_quiz(topic_id, 1))
+
+    def test_bundle_without_quiz(self):
+        topic_id = database.insert_topic(7, "Length contraction")
+        bundle = database.get_topic_bundle(topic_id)
+        self.assertEqual(bundle['quiz'], {})
+        self.assertIsNone(bundle['summary'])
+
+    def test_bundle_includes_source_chunk(self):
+        topic_id = database.insert_topic(7, "Twin paradox", "doc-1", "The travelling twin ages less.")
+        bundle = database.get_topic_bundle(topic_id)
+        self.assertEqual(bundle['doc_id'], "doc-1")
+        self.assertEqual(bundle['context'], "The travelling twin ages less.")
+
+    def test_insert_topics_in_order(self):
+        database.insert_topic(3, "Existing")
+        ids = database.insert_topics(7, [("One", "d1", "c1"), ("Two", "d2", "c2"), ("Three", "d3", "c3")])
+        self.assertEqual([database.get_topic_title(topic_id) for topic_id in ids], ["One", "Two", "Three"])
+        self.assertEqual(database.get_topic_bundle(ids[1])['context'], "c2")
+        self.assertEqual(database.insert_topics(7, []), [])
+
+    def test_update_lecture_topics(self):
+        kept, removed = database.insert_topics(7, [("Kept", "d1", "c1"), ("Removed", "d2", "c2")])
+        for topic_id in (kept, removed):
+            database.insert_topic_quiz_set(topic_id, "Summary", [(0, "Q", ["a) 1", "b) 2", "c) 3", "d) 4"], "a")])
+        database.cache_explanation(removed, 0, "b", "hash", "Because")
+
+        new_ids = database.update_lecture_topics(7, ["d2"], [("New", "d3", "c3")])
+        self.assertEqual(database.fetch_topic_doc_ids(7), [(kept, "d1"), (new_ids[0], "d3")])
+        self.assertTrue(database.has_topic_quiz(kept))
+        self.assertFalse(database.has_topic_quiz(removed))
+        self.assertIsNone(database.get_cached_explanation(removed, 0, "b", "hash"))
+
+    def test_update_keeps_topics_in_transcript_order(self):
+        first, edited, last = database.insert_topics(7, [("First", "d1", "c1"), ("Edited", "d2", "c2"),
+                                                         ("Last", "d3", "c3")])
+        new_ids = database.update_lecture_topics(7, ["d2"], [("Rewritten", "d4", "c4")],
+                                                 doc_order=["d1", "d4", "d3"])
+        self.assertEqual([row['topic_id'] for row in database.fetch_topics_by_lecture(7)],
+                         [first, new_ids[0], last])
+        self.assertEqual(database.insert_topic(7, "Appended"),
+                         database.fetch_topics_by_lecture(7)[-1]['topic_id'])
+
+    def test_update_records_doc_ids_of_legacy_topics(self):
+        topic_id = database.insert_topic(7, "Legacy")
+        database.update_lecture_topics(7, [], [], [("d1", topic_id)])
+        self.assertEqual(database.fetch_topic_doc_ids(7), [(topic_id, "d1")])
+
+    def test_lecture_index_type(self):
+        lecture_id = database.insert_lecture(1, "Clocks", "")
+        self.assertEqual(database.get_lecture_index_type(lecture_id), "flat")
+        database.set_lecture_index_type(lecture_id, "ivfpq")
+        self.assertEqual(database.get_lecture_index_type(lecture_id), "ivfpq")
+
+    def test_missing_topic(self):
+        self.assertIsNone(database.get_topic_bundle(12345))
+
+
+class TestMigrations(DatabaseTestCase):
+    def test_fresh_database_is_current(self):
+        conn = database.get_db_connection()
+        self.assertEqual(database.get_schema_version(conn), len(database.MIGRATIONS))
+        indexes = {row['name'] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        for name, _ in database.HOT_PATH_INDEXES:
+            self.assertIn(name, indexes)
+
+    def test_migrate_is_idempotent(self):
+        conn = database.get_db_connection()
+        self.assertEqual(database.migrate(conn), len(database.MIGRATIONS))
+
+    def test_lookups_use_covering_indexes(self):
+        conn = database.get_db_connection()
+        plan = " ".join(row['detail'] for row in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT topic_id, topic_title FROM topics WHERE lecture_id = ? ORDER BY position", (1,)))
+        self.assertIn("COVERING INDEX idx_topics_lecture", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_legacy_user_stats_is_repaired(self):
+        legacy = ConnectionManager(os.path.join(self.tmpdir.name, "legacy.db"))
+        conn = legacy.connection()
+        conn.execute('''
+            CREATE TABLE user_stats (
+                session  TEXT,
+                topic_id INTEGER,
+                level    INTEGER
+                user_attempt INTEGER DEFAULT 0,
+                user_answer TEXT DEFAULT '',
+                PRIMARY KEY(session, topic_id, level)
+            );
+        ''')
+        conn.execute("INSERT INTO user_stats (session, topic_id, level, user_answer) VALUES ('s', 1, 2, 'b')")
+        conn.commit()
+
+        database.migrate(conn)
+        row = conn.execute("SELECT session, topic_id, level, user_attempt, user_answer FROM user_stats").fetchone()
+        self.assertEqual(tuple(row), ('s', 1, 2, 0, 'b'))
+        legacy.close_all()
+
+
+class TestQuizLeases(DatabaseTestCase):
+    def test_lease_is_exclusive(self):
+        self.assertTrue(database.acquire_quiz_lease(1, "worker-a", ttl=60))
+        self.assertFalse(database.acquire_quiz_lease(1, "worker-b", ttl=60))
+        # Re-acquiring by the holder extends the lease.
+        self.assertTrue(database.acquire_quiz_lease(1, "worker-a", ttl=60))
+
+    def test_expired_lease_is_taken_over(self):
+        self.assertTrue(database.acquire_quiz_lease(1, "worker-a", ttl=-1))
+        self.assertTrue(database.acquire_quiz_lease(1, "worker-b", ttl=60))
+
+    def test_release(self):
+        database.acquire_quiz_lease(1, "worker-a", ttl=60)
+        database.release_quiz_lease(1, "worker-b")  # not the holder, no effect
+        self.assertFalse(database.acquire_quiz_lease(1, "worker-b", ttl=60))
+        database.release_quiz_lease(1, "worker-a")
+        self.assertTrue(database.acquire_quiz_lease(1, "worker-b", ttl=60))
+
+    def test_quiz_set_is_written_together(self):
+        topic_id = database.insert_topic(1, "Simultaneity")
+        self.assertFalse(database.has_topic_quiz(topic_id))
+        database.insert_topic_quiz_set(topic_id, "Summary", [
+            (level, f"Q{level}", ["a) 1", "b) 2", "c) 3", "d) 4"], "a") for level in range(3)])
+        bundle = database.get_topic_bundle(topic_id)
+        self.assertEqual(sorted(bundle['quiz']), [0, 1, 2])
+        self.assertEqual(bundle['summary'], "Summary")
+        self.assertTrue(database.has_topic_quiz(topic_id))
+
+
+class TestExplanationCache(DatabaseTestCase):
+    QUIZ = {"question": "Q", "choices": ["a) 1", "b) 2", "c) 3", "d) 4"], "answer": "b"}
+
+    def test_round_trip(self):
+        quiz_hash = database.quiz_content_hash("Summary", self.QUIZ)
+        self.assertIsNone(database.get_cached_explanation(1, 0, "a", quiz_hash))
+        database.cache_explanation(1, 0, "a", quiz_hash, "Because b.")
+        self.assertEqual(database.get_cached_explanation(1, 0, "a", quiz_hash), "Because b.")
+        self.assertIsNone(database.get_cached_explanation(1, 0, "c", quiz_hash))
+
+    def test_regenerated_quiz_invalidates(self):
+        quiz_hash = database.quiz_content_hash("Summary", self.QUIZ)
+        database.cache_explanation(1, 0, "a", quiz_hash, "Because b.")
+        regenerated = dict(self.QUIZ, question="A different question")
+        new_hash = database.quiz_content_hash("Summary", regenerated)
+        self.assertNotEqual(quiz_hash, new_hash)
+        self.assertIsNone(database.get_cached_explanation(1, 0, "a", new_hash))
+
+
+class TestTopicSearch(DatabaseTestCase):
+    def titles(self, *args, **kwargs):
+        return [row['topic_title'] for row in database.search_topics(*args, **kwargs)]
+
+    def test_index_follows_topics_and_quizzes(self):
+        lecture_id = database.insert_lecture(1, "Relativity", "")
+        clocks, cones = database.insert_topics(lecture_id, [("Moving clocks", None, None), ("Light cones", None, None)])
+        self.assertEqual(self.titles("clock"), ["Moving clocks"])
+
+        database.update_topic_summary(clocks, "Gravitational redshift")
+        database.insert_topic_quiz(cones, 0, "What bounds a light cone?", ["Mass", "Causality", "Charge", "Spin"], "b")
+        self.assertEqual(self.titles("redshift"), ["Moving clocks"])
+        self.assertEqual(self.titles("causality"), ["Light cones"])
+
+        database.delete_topics_by_lecture(lecture_id)
+        self.assertEqual(self.titles("clocks"), [])
+
+    def test_ranking_and_filters(self):
+        first = database.insert_lecture(1, "Clocks", "")
+        second = database.insert_lecture(2, "Optics", "")
+        database.insert_topics(first, [("Pendulum clocks", None, None), ("Quartz oscillators", None, None)])
+        pendulum, = database.insert_topics(second, [("Pendulum optics", None, None)])
+        database.update_topic_summary(pendulum, "Quartz lenses")
+        # A title match ranks above a summary match.
+        self.assertEqual(self.titles("quartz"), ["Quartz oscillators", "Pendulum optics"])
+        self.assertEqual(self.titles("pendulum", course_id=2), ["Pendulum optics"])
+        self.assertEqual(self.titles("pendulum", lecture_ids=[first]), ["Pendulum clocks"])
+        self.assertEqual(self.titles('pendulum" OR "quartz'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
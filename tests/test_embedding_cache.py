@@ -0,0 +1,66 @@
+import os
+import tempfile
+import unittest
+
+from langchain_core.embeddings import Embeddings
+
+from agents.embedding_cache import CachedEmbeddings
+
+
+class CountingEmbeddings(Embeddings):
+    model = "counting"
+
+    def __init__(self):
+        self.document_calls = []
+        self.query_calls = []
+
+    def _vector(self, text):
+        return [float(len(text)), 0.5, -1.25]
+
+    def embed_documents(self, texts):
+        self.document_calls.append(list(texts))
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        self.query_calls.append(text)
+        return self._vector(text)
+
+
+class TestCachedEmbeddings(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "embeddings.db")
+        self.inner = CountingEmbeddings()
+        self.cache = CachedEmbeddings(self.inner, db_path=self.db_path)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_documents_batch_only_misses(self):
+        self.assertEqual(self.cache.embed_documents(["one", "three"]), [[3.0, 0.5, -1.25], [5.0, 0.5, -1.25]])
+        vectors = self.cache.embed_documents(["three", "four", "four"])
+        self.assertEqual(self.inner.document_calls, [["one", "three"], ["four"]])
+        self.assertEqual(vectors[1], vectors[2])
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 3))
+
+    def test_query_cached(self):
+        self.cache.embed_query("Time dilation")
+        self.assertEqual(self.cache.embed_query("Time dilation"), [13.0, 0.5, -1.25])
+        self.assertEqual(self.inner.query_calls, ["Time dilation"])
+
+    def test_persists_across_instances(self):
+        self.cache.embed_documents(["chunk"])
+        reopened = CachedEmbeddings(CountingEmbeddings(), db_path=self.db_path)
+        reopened.embed_documents(["chunk"])
+        self.assertEqual(reopened.embedder.document_calls, [])
+
+    def test_models_do_not_share_entries(self):
+        self.cache.embed_query("text")
+        other = CachedEmbeddings(self.inner, db_path=self.db_path, namespace="other-model")
+        other.embed_query("text")
+        self.assertEqual(self.inner.query_calls, ["text", "text"])
+
+
+if __name__ == '__main__':
+    unittest.main()
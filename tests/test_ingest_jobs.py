@@ -0,0 +1,134 @@
+import sqlite3
+import threading
+import time
+import unittest
+from unittest import mock
+
+from agents import database
+from agents import ingest_jobs
+from agents.ingest_jobs import JobRunner
+from tests.test_database import DatabaseTestCase
+
+
+class TestJobRunner(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.calls = []
+        self.release = threading.Event()
+        self.release.set()
+        self.stages = [
+            ("lecture", lambda job: self.record("lecture", {'lecture_id': 42})),
+            ("slow", lambda job: self.release.wait(5) and self.record("slow")),
+            ("titles", lambda job: self.record("titles", {'topics': 3, 'seen_lecture': job['lecture_id']})),
+        ]
+        self.runners = []
+
+    def tearDown(self):
+        self.release.set()
+        for runner in self.runners:
+            runner.shutdown()
+        super().tearDown()
+
+    def record(self, name, output=None):
+        self.calls.append(name)
+        return output
+
+    def runner(self, stages=None, lease_ttl=30):
+        runner = JobRunner(stages or self.stages, concurrency=1, lease_ttl=lease_ttl)
+        self.runners.append(runner)
+        return runner
+
+    def wait_for(self, job_id, statuses=("succeeded", "failed", "cancelled")):
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            job = database.get_job(job_id)
+            if job['status'] in statuses:
+                return job
+            time.sleep(0.01)
+        self.fail(f"job {job_id} stuck in {job['status']}")
+
+    def test_runs_stages_in_order(self):
+        job = self.wait_for(self.runner().submit({'lecture_name': "Clocks"}))
+        self.assertEqual(job['status'], "succeeded")
+        self.assertEqual(self.calls, ["lecture", "slow", "titles"])
+        self.assertEqual(job['lecture_id'], 42)
+        self.assertEqual(job['result'], {'topics': 3, 'seen_lecture': 42})
+        self.assertEqual({stage['status'] for stage in job['stages'].values()}, {"done"})
+
+    def test_failure_is_recorded(self):
+        def broken(job):
+            raise RuntimeError("embedding API down")
+        runner = self.runner([("lecture", broken), ("titles", lambda job: self.record("titles"))])
+        job = self.wait_for(runner.submit({}))
+        self.assertEqual(job['status'], "failed")
+        self.assertEqual(job['error'], "embedding API down")
+        self.assertEqual(job['stages']['lecture']['status'], "failed")
+        self.assertEqual(self.calls, [])
+
+    def test_bookkeeping_failure_fails_the_job(self):
+        update_job = database.update_job
+
+        def locked(job_id, **fields):
+            if fields.get('stage') == "slow":
+                raise sqlite3.OperationalError("database is locked")
+            update_job(job_id, **fields)
+
+        with mock.patch.object(ingest_jobs, "update_job", side_effect=locked):
+            job = self.wait_for(self.runner().submit({}))
+        self.assertEqual(job['status'], "failed")
+        self.assertEqual(job['error'], "database is locked")
+
+    def test_cancel_running_and_queued_jobs(self):
+        self.release.clear()
+        runner = self.runner()
+        running = runner.submit({})
+        queued = runner.submit({})
+        self.wait_for(running, statuses=("running",))
+        while database.get_job(running)['stage'] != "slow":
+            time.sleep(0.01)
+        self.assertEqual(runner.cancel(queued)['status'], "cancelled")
+        self.assertTrue(runner.cancel(running)['cancel_requested'])
+        self.release.set()
+        self.assertEqual(self.wait_for(running)['status'], "cancelled")
+        self.assertEqual(self.calls, ["lecture", "slow"])
+
+    def test_recovers_abandoned_job(self):
+        database.create_job("job-1", "lecture_create", {}, ["lecture", "slow", "titles"], "dead-host:1")
+        stages = {'lecture': {'status': "done"}, 'slow': {'status': "running"}, 'titles': {'status': "pending"}}
+        database.update_job("job-1", status="running", stages=stages, lecture_id=7, heartbeat=time.time() - 60)
+
+        runner = self.runner()
+        self.assertEqual(runner.recover(), ["job-1"])
+        job = self.wait_for("job-1")
+        self.assertEqual(job['status'], "succeeded")
+        self.assertEqual(self.calls, ["slow", "titles"])
+        self.assertEqual(job['result']['seen_lecture'], 7)
+
+    def test_recovers_job_orphaned_within_the_lease(self):
+        # A restart quicker than the lease: the job is not stale yet at startup.
+        database.create_job("job-1", "lecture_create", {}, ["lecture", "slow", "titles"], "restarted-host:1")
+        database.update_job("job-1", status="running", heartbeat=time.time())
+
+        runner = self.runner(lease_ttl=0.3)
+        self.assertEqual(runner.recover(), [])
+        job = self.wait_for("job-1")
+        self.assertEqual(job['status'], "succeeded")
+        self.assertEqual(job['owner'], runner.owner)
+        self.assertEqual(self.calls, ["lecture", "slow", "titles"])
+
+    def test_lecture_is_recorded_with_the_job(self):
+        params = {'course_id': 1, 'lecture_name': "Clocks", 'lecture_license': ""}
+        database.create_job("job-1", "lecture_create", params, ["lecture"], "host:1")
+        output = ingest_jobs._stage_lecture(database.get_job("job-1"))
+        # Recorded before the runner stores the stage output: a crash in between loses nothing.
+        self.assertEqual(database.get_job("job-1")['lecture_id'], output['lecture_id'])
+        self.assertEqual(ingest_jobs._stage_lecture(database.get_job("job-1")), {})
+        self.assertEqual(len(database.fetch_lectures_by_course(1)), 1)
+
+    def test_live_jobs_are_not_recovered(self):
+        database.create_job("job-1", "lecture_create", {}, ["lecture"], "live-host:1")
+        self.assertEqual(self.runner().recover(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
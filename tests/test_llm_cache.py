@@ -0,0 +1,71 @@
+import os
+import tempfile
+import time
+import unittest
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.outputs import Generation
+
+from agents.llm_cache import LLMResponseCache
+
+
+class TestLLMResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "llm.db")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def model(self, cache):
+        return FakeListChatModel(responses=["first", "second"], cache=cache)
+
+    def test_identical_prompt_is_served_from_cache(self):
+        cache = LLMResponseCache(self.db_path)
+        llm = self.model(cache)
+        self.assertEqual(llm.invoke("Title for: clocks").content, "first")
+        self.assertEqual(llm.invoke("Title for: clocks").content, "first")
+        self.assertEqual(llm.invoke("Title for: rods").content, "second")
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 2))
+        self.assertEqual(stats["bytes_saved"], len("first"))
+
+    def test_persists_across_instances(self):
+        self.model(LLMResponseCache(self.db_path)).invoke("prompt")
+        self.assertEqual(self.model(LLMResponseCache(self.db_path)).invoke("prompt").content, "first")
+
+    def test_model_parameters_are_part_of_the_key(self):
+        cache = LLMResponseCache(self.db_path)
+        cache.update("prompt", "model-a", [Generation(text="a")])
+        self.assertIsNone(cache.lookup("prompt", "model-b"))
+        self.assertEqual(cache.lookup("prompt", "model-a")[0].text, "a")
+
+    def test_expired_entries_miss(self):
+        cache = LLMResponseCache(self.db_path, ttl=60)
+        cache.update("prompt", "model", [Generation(text="a")])
+        conn = cache._db.connection()
+        conn.execute("UPDATE llm_cache SET created_at = ?", (time.time() - 61,))
+        conn.commit()
+        self.assertIsNone(cache.lookup("prompt", "model"))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = LLMResponseCache(self.db_path, max_bytes=10)
+        cache.update("one", "model", [Generation(text="aaaa")])
+        cache.update("two", "model", [Generation(text="bbbb")])
+        cache.lookup("one", "model")
+        cache.update("three", "model", [Generation(text="cccc")])
+        self.assertIsNone(cache.lookup("two", "model"))
+        self.assertIsNotNone(cache.lookup("one", "model"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_bypass_refreshes_entry(self):
+        cache = LLMResponseCache(self.db_path)
+        llm = self.model(cache)
+        llm.invoke("prompt")
+        with cache.bypass():
+            self.assertEqual(llm.invoke("prompt").content, "second")
+        self.assertEqual(llm.invoke("prompt").content, "second")
+
+
+if __name__ == '__main__':
+    unittest.main()
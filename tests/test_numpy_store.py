@@ -0,0 +1,50 @@
+import unittest
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from agents.numpy_store import NumpyVectorStore
+
+
+class TestNumpyVectorStore(unittest.TestCase):
+    def setUp(self):
+        self.embedder = DeterministicFakeEmbedding(size=16)
+        self.texts = [f"chunk {i}" for i in range(30)]
+        self.faiss_store = FAISS.from_documents([Document(page_content=text) for text in self.texts], self.embedder)
+        self.store = NumpyVectorStore.from_faiss(self.faiss_store)
+
+    def test_matches_faiss(self):
+        for query in ("chunk 3", "clocks", "light"):
+            expected = self.faiss_store.similarity_search_with_score(query, k=4)
+            found = self.store.similarity_search_with_score(query, k=4)
+            self.assertEqual([doc.page_content for doc, _ in found], [doc.page_content for doc, _ in expected])
+            np.testing.assert_allclose([score for _, score in found], [score for _, score in expected], rtol=1e-4, atol=1e-4)
+
+    def test_batched_queries_match_single_queries(self):
+        queries = ["chunk 1", "chunk 7", "relativity"]
+        batched = self.store.batch_similarity_search(queries, k=3)
+        self.assertEqual(batched, [self.store.similarity_search(query, k=3) for query in queries])
+        self.assertEqual(self.store.batch_similarity_search([]), [])
+
+    def test_k_larger_than_store(self):
+        store = NumpyVectorStore(self.embedder, [self.embedder.embed_query("a"), self.embedder.embed_query("b")],
+                                 [Document(page_content="a"), Document(page_content="b")])
+        self.assertEqual([doc.page_content for doc in store.similarity_search("b", k=4)], ["b", "a"])
+
+    def test_keeps_index_order_after_deletions(self):
+        self.faiss_store.delete([self.faiss_store.index_to_docstore_id[0]])
+        store = NumpyVectorStore.from_faiss(self.faiss_store)
+        self.assertEqual(len(store), 29)
+        self.assertEqual(store.documents[0].page_content, "chunk 1")
+        self.assertEqual(store.similarity_search("chunk 12", k=1)[0].page_content, "chunk 12")
+
+    def test_retriever_interface(self):
+        retriever = self.store.as_retriever()
+        self.assertEqual(retriever.invoke("chunk 5")[0].page_content, "chunk 5")
+        self.assertEqual(len(retriever.invoke("chunk 5")), 4)
+
+    def test_read_only(self):
+        with self.assertRaises(NotImplementedError):
+            self.store.add_texts(["new"])
@@ -62,6 +62,33 @@ Answers:
 }
 """
 
+llm_response_variants = """
+**Summary:** Moving clocks run slow.
+
+**Quiz:**
+1) What happens to a moving clock?
+A) It runs fast
+B) It runs slow
+C) Nothing
+D) It stops
+Answer: B
+
+2. Which theory predicts time dilation,
+   and why?
+(a) Special relativity
+(b) Newtonian mechanics
+(c) Thermodynamics
+(d) Optics
+
+* [Question 3 - Advanced] What does the twin paradox show?
+  a. Both twins age equally
+  b. The travelling twin ages less
+  c. The travelling twin ages more
+  d. Nothing can be concluded
+
+Answers: 2: A, 3) b
+"""
+
 class TestParseQuiz(unittest.TestCase):
     def setUp(self):
         pass
@@ -77,5 +104,35 @@ class TestParseQuiz(unittest.TestCase):
         self.assertEqual(result['answers'], expected_answers)
         self.assertTrue("How does motion impact the accuracy of clocks?" in result['questions'])
 
+    def test_parse_quiz_choices(self):
+        result = parse_quiz(llm_response2)
+        self.assertEqual(len(result['choices']), 3)
+        self.assertEqual(result['choices'][0], ["a) It speeds up the clocks", "b) It slows down the clocks",
+                                                "c) It has no effect on the clocks", "d) It stops the clocks"])
+        self.assertEqual(result['errors'], [])
+
+    def test_parse_quiz_variants(self):
+        result = parse_quiz(llm_response_variants)
+        self.assertEqual(result['summary'], "Moving clocks run slow.")
+        self.assertEqual(result['questions'][1], "Which theory predicts time dilation, and why?")
+        self.assertEqual(result['choices'][0][1], "b) It runs slow")
+        self.assertEqual(result['answers'], {"1": "b", "2": "a", "3": "b"})
+        self.assertEqual(result['errors'], [])
+
+    def test_parse_quiz_reports_errors(self):
+        # Cut off after question 2, so the Answers block is lost too.
+        truncated = llm_response2.split("- [Question 3")[0]
+        result = parse_quiz(truncated.replace("    d) It stops the clocks\n", ""))
+        self.assertEqual(result['questions'], ["How does the theory of relativity play a role in understanding the effect of motion on clocks?"])
+        messages = [error['message'] for error in result['errors']]
+        self.assertIn("Question 1 is incomplete, missing choices: d", messages)
+        self.assertIn("No answer for question 2", messages)
+        self.assertEqual(result['answers'], {})
+
+    def test_parse_quiz_empty(self):
+        result = parse_quiz("")
+        self.assertEqual(result['questions'], [])
+        self.assertEqual([error['message'] for error in result['errors']], ["Missing summary", "No questions found"])
+
 if __name__ == '__main__':
     unittest.main()
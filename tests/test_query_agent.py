@@ -0,0 +1,230 @@
+import asyncio
+import contextlib
+import io
+import unittest
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+import agents.concept_prompt as concept_prompt
+import agents.quiz_prompt as quiz_prompt
+from agents import database
+from agents.llm_cache import get_llm_cache
+from agents.query_agent import (QueryAgent, PrefixStripper, generate_quiz_once, agenerate_quiz_once,
+                                aget_cached_conceptual_clarity, stream_conceptual_clarity, astream_conceptual_clarity,
+                                _workflow_input)
+from tests.test_database import DatabaseTestCase
+from tests.test_parse_quiz import llm_response1
+
+
+class TestTopicContext(unittest.TestCase):
+    def setUp(self):
+        self.store_requests = []
+        self.llm = FakeListChatModel(responses=["AI: done"])
+        self.agent = QueryAgent(quiz_prompt.PREFIX, quiz_prompt.FORMAT_INSTRUCTIONS, quiz_prompt.SUFFIX,
+                                llm=self.llm, get_store=self.get_store)
+        self.agent.setup_workflow()
+
+    def get_store(self, lecture_id):
+        self.store_requests.append(lecture_id)
+        return FAISS.from_texts(["Clocks in motion tick slower."], DeterministicFakeEmbedding(size=8))
+
+    def invoke(self, **input_data):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return self.agent.quizz_app.invoke({"input": "Clocks", "lecture_id": "1", "prompt_vars": {},
+                                                **input_data})
+
+    def test_stored_context_skips_vector_search(self):
+        outputs = self.invoke(context="Moving clocks run slow.")
+        self.assertEqual(self.store_requests, [])
+        self.assertEqual(outputs["intermediate_steps"][0][1], "Moving clocks run slow.")
+        self.assertEqual(outputs["agent_outcome"]["output"], "done")
+
+    def test_missing_context_falls_back_to_vector_search(self):
+        outputs = self.invoke(context=None)
+        self.assertEqual(self.store_requests, ["1"])
+        self.assertEqual(outputs["intermediate_steps"][0][1], "Clocks in motion tick slower.")
+        self.assertEqual(outputs["agent_outcome"]["output"], "done")
+
+    def test_async_workflow(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            outputs = asyncio.run(self.agent.quizz_app.ainvoke(
+                {"input": "Clocks", "lecture_id": "1", "prompt_vars": {}, "context": "Moving clocks run slow."}))
+        self.assertEqual(self.store_requests, [])
+        self.assertEqual(outputs["agent_outcome"]["output"], "done")
+
+
+class FakeAgent():
+    """ Stands in for a compiled agent: counts ainvoke calls and how many overlap. """
+
+    def __init__(self, response):
+        self.quizz_app = self
+        self.response = response
+        self.calls = 0
+        self.running = 0
+        self.max_running = 0
+
+    async def ainvoke(self, input_data):
+        self.calls += 1
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        return {"agent_outcome": {"output": self.response}}
+
+
+class TestAsyncGeneration(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.topic_ids = [database.insert_topic(1, f"Topic {i}", topic_context="Moving clocks run slow.")
+                          for i in range(4)]
+
+    def test_concurrent_quiz_requests_generate_once(self):
+        agent = FakeAgent(llm_response1)
+
+        async def requests():
+            return await asyncio.gather(*(agenerate_quiz_once(agent, self.topic_ids[0]) for _ in range(5)))
+
+        self.assertEqual(asyncio.run(requests()), [True] * 5)
+        self.assertEqual(agent.calls, 1)
+        self.assertEqual(len(database.get_topic_bundle(self.topic_ids[0])['quiz']), 3)
+
+    def test_quiz_waiter_times_out(self):
+        agent = FakeAgent(llm_response1)
+
+        async def requests():
+            leader = asyncio.ensure_future(agenerate_quiz_once(agent, self.topic_ids[0]))
+            await asyncio.sleep(0)
+            # The builtin TimeoutError, which the server turns into a 503.
+            with self.assertRaisesRegex(TimeoutError, "in-flight"):
+                await agenerate_quiz_once(agent, self.topic_ids[0], timeout=0.001)
+            return await leader
+
+        self.assertTrue(asyncio.run(requests()))
+        self.assertEqual(agent.calls, 1)
+
+    def test_incomplete_quiz_is_regenerated(self):
+        agent = FakeAgent(llm_response1.replace('"2": "b",', ''))
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertFalse(asyncio.run(agenerate_quiz_once(agent, self.topic_ids[0])))
+        self.assertFalse(database.has_topic_quiz(self.topic_ids[0]))
+        agent.response = llm_response1
+        self.assertTrue(asyncio.run(agenerate_quiz_once(agent, self.topic_ids[0])))
+        # The rejected response is retried once within the first request.
+        self.assertEqual(agent.calls, 3)
+        self.assertEqual(sorted(database.get_topic_bundle(self.topic_ids[0])['quiz']), [0, 1, 2])
+
+    def test_slots_bound_concurrent_generations(self):
+        agent = FakeAgent("The answer is b.")
+        database.insert_topic_quiz(self.topic_ids[0], 0, "Q", ["a) 1", "b) 2", "c) 3", "d) 4"], "b")
+        bundle = database.get_topic_bundle(self.topic_ids[0])
+
+        async def requests():
+            slots = asyncio.Semaphore(2)
+            return await asyncio.gather(*(aget_cached_conceptual_clarity(agent, bundle, 0, answer, slots)
+                                          for answer in "acd"))
+
+        self.assertEqual(asyncio.run(requests()), ["The answer is b."] * 3)
+        self.assertEqual(agent.max_running, 2)
+        # Explanations are cached: asking again makes no call.
+        asyncio.run(aget_cached_conceptual_clarity(agent, bundle, 0, "a"))
+        self.assertEqual(agent.calls, 3)
+
+
+class TestCachedQuizResponse(DatabaseTestCase):
+    def test_rejected_cached_response_is_regenerated(self):
+        # Both attempts send the same prompt, so the retry must not be served the cached bad response.
+        llm = FakeListChatModel(responses=[llm_response1.split("Answers")[0], llm_response1], cache=get_llm_cache())
+        agent = QueryAgent(quiz_prompt.PREFIX, quiz_prompt.FORMAT_INSTRUCTIONS, quiz_prompt.SUFFIX, llm=llm)
+        agent.setup_workflow()
+        topic_id = database.insert_topic(1, "Relativity of simultaneity", topic_context="Simultaneity is relative.")
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertTrue(generate_quiz_once(agent, topic_id))
+        self.assertEqual(sorted(database.get_topic_bundle(topic_id)['quiz']), [0, 1, 2])
+
+
+class TestPrefixStripper(unittest.TestCase):
+    def strip(self, chunks):
+        stripper = PrefixStripper()
+        return "".join(stripper.feed(chunk) for chunk in chunks) + stripper.flush()
+
+    def test_prefix_split_over_chunks(self):
+        self.assertEqual(self.strip(["A", "I", ":", " ", " The", " answer"]), "The answer")
+        self.assertEqual(self.strip(["```AI: The", " answer"]), "The answer")
+
+    def test_reply_without_prefix_passes_through(self):
+        reply = "The answer is b because clocks slow down."
+        self.assertEqual(self.strip(list(reply)), reply)
+        self.assertEqual(self.strip(["Short"]), "Short")
+
+    def test_prefix_later_in_the_reply_is_kept(self):
+        reply = "The answer is b, as the AI: prefix shows."
+        self.assertEqual(self.strip([reply]), reply)
+
+
+class RecordingChatModel(FakeListChatModel):
+    """ Records the prompt and stop words of every call, streamed or not. """
+
+    calls: list = []
+
+    def _call(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls.append((messages[0].content, stop))
+        return super()._call(messages, stop, run_manager, **kwargs)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls.append((messages[0].content, stop))
+        return super()._stream(messages, stop, run_manager, **kwargs)
+
+
+class TestStreamedExplanation(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.llm = FakeListChatModel(responses=["AI:  Because the answer is b."])
+        self.agent = QueryAgent(concept_prompt.PREFIX, concept_prompt.FORMAT_INSTRUCTIONS, concept_prompt.SUFFIX,
+                                prompt_variables=concept_prompt.PROMPT_VARIABLES, llm=self.llm)
+        topic_id = database.insert_topic(1, "Clocks", topic_context="Moving clocks run slow.")
+        database.insert_topic_quiz(topic_id, 0, "Q", ["a) 1", "b) 2", "c) 3", "d) 4"], "b")
+        self.bundle = database.get_topic_bundle(topic_id)
+
+    def test_stream_strips_prefix_and_caches(self):
+        chunks = list(stream_conceptual_clarity(self.agent, self.bundle, 0, "a"))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("".join(chunks), "Because the answer is b.")
+        # The cached explanation is served whole, without an LLM call.
+        self.llm.responses = []
+        self.assertEqual(list(stream_conceptual_clarity(self.agent, self.bundle, 0, "a")),
+                         ["Because the answer is b."])
+
+    def test_stream_sends_the_workflow_prompt(self):
+        llm = RecordingChatModel(responses=["AI: Because."])
+        agent = QueryAgent(concept_prompt.PREFIX, concept_prompt.FORMAT_INSTRUCTIONS, concept_prompt.SUFFIX,
+                           prompt_variables=concept_prompt.PROMPT_VARIABLES, llm=llm)
+        agent.setup_workflow()
+        prompt_vars = concept_prompt.get_prompt_variables(self.bundle['summary'], self.bundle['quiz'][0], "a")
+        with contextlib.redirect_stdout(io.StringIO()):
+            agent.quizz_app.invoke(_workflow_input(self.bundle, prompt_vars))
+        list(agent.stream_reply(_workflow_input(self.bundle, prompt_vars)))
+        self.assertEqual(len(llm.calls), 2)
+        self.assertEqual(llm.calls[0], llm.calls[1])
+        self.assertIn("Moving clocks run slow.", llm.calls[0][0])
+
+    def test_stream_closed_early_caches_nothing(self):
+        chunks = stream_conceptual_clarity(self.agent, self.bundle, 0, "a")
+        next(chunks)
+        chunks.close()
+        quiz_hash = database.quiz_content_hash(self.bundle['summary'], self.bundle['quiz'][0])
+        self.assertIsNone(database.get_cached_explanation(self.bundle['topic_id'], 0, "a", quiz_hash))
+
+    def test_async_stream(self):
+        async def collect():
+            return [chunk async for chunk in astream_conceptual_clarity(self.agent, self.bundle, 0, "c")]
+
+        self.assertEqual("".join(asyncio.run(collect())), "Because the answer is b.")
+        quiz_hash = database.quiz_content_hash(self.bundle['summary'], self.bundle['quiz'][0])
+        self.assertEqual(database.get_cached_explanation(self.bundle['topic_id'], 0, "c", quiz_hash),
+                         "Because the answer is b.")
+
+
+if __name__ == '__main__':
+    unittest.main()
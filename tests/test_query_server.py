@@ -0,0 +1,72 @@
+import asyncio
+import os
+import unittest
+from unittest import mock
+
+# The servers build their LLM and embedding clients on import; no call reaches them here.
+os.environ.setdefault("NVIDIA_API_KEY", "nvapi-test")
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+from aiohttp.test_utils import TestClient, TestServer  # noqa: E402
+
+from agents import database  # noqa: E402
+from servers import async_query_server, query_server  # noqa: E402
+from tests.test_database import DatabaseTestCase  # noqa: E402
+
+INVALID_ANSWERS = ["e", "ab", "", "1", "a' OR 1=1"]
+
+
+class ExplanationEndpointTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.session_id = "session-1"
+        database.add_session(self.session_id)
+        self.topic_id = database.insert_topic(1, "Clocks", topic_context="Moving clocks run slow.")
+        database.insert_topic_quiz(self.topic_id, 0, "Q", ["a) 1", "b) 2", "c) 3", "d) 4"], "b")
+
+    def params(self, answer):
+        return {'session_id': self.session_id, 'topic_id': self.topic_id, 'level': 0, 'answer': answer}
+
+
+class TestFlaskAnswerValidation(ExplanationEndpointTestCase):
+    def test_invalid_answers_are_rejected(self):
+        client = query_server.app.test_client()
+        with mock.patch.object(query_server, "get_cached_conceptual_clarity") as explain, \
+                mock.patch.object(query_server, "stream_conceptual_clarity") as stream:
+            for path in ('/conceptual_clarity', '/conceptual_clarity/stream'):
+                for answer in INVALID_ANSWERS:
+                    response = client.get(path, query_string=self.params(answer))
+                    self.assertEqual(response.status_code, 400, (path, answer))
+                    self.assertIn('error', response.get_json())
+        explain.assert_not_called()
+        stream.assert_not_called()
+
+    def test_answer_is_normalized(self):
+        client = query_server.app.test_client()
+        with mock.patch.object(query_server, "get_cached_conceptual_clarity", return_value="Because.") as explain:
+            response = client.get('/conceptual_clarity', query_string=self.params(" C "))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(explain.call_args.args[2:], (0, "c"))
+
+
+class TestAsyncAnswerValidation(ExplanationEndpointTestCase):
+    def test_invalid_answers_are_rejected(self):
+        async def requests():
+            statuses = []
+            async with TestClient(TestServer(async_query_server.create_app())) as client:
+                for path in ('/conceptual_clarity', '/conceptual_clarity/stream'):
+                    for answer in INVALID_ANSWERS:
+                        response = await client.get(path, params=self.params(answer))
+                        statuses.append(response.status)
+            return statuses
+
+        with mock.patch.object(async_query_server, "aget_cached_conceptual_clarity") as explain, \
+                mock.patch.object(async_query_server, "astream_conceptual_clarity") as stream:
+            statuses = asyncio.run(requests())
+        self.assertEqual(statuses, [400] * 2 * len(INVALID_ANSWERS))
+        explain.assert_not_called()
+        stream.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import contextlib
+import io
+import unittest
+
+from agents import database
+from agents.quiz_pregen import QuizPregenerator
+from agents.query_agent import get_cached_conceptual_clarity
+from tests.test_database import DatabaseTestCase
+from tests.test_parse_quiz import llm_response2
+
+
+class FakeQuizApp():
+    def __init__(self, output):
+        self.output = output
+        self.inputs = []
+
+    def invoke(self, input_data):
+        self.inputs.append(input_data)
+        return {"agent_outcome": {"output": self.output}}
+
+
+class FakeQuizAgent():
+    def __init__(self, output=llm_response2):
+        self.quizz_app = FakeQuizApp(output)
+
+
+class TestQuizPregenerator(DatabaseTestCase):
+    def test_generates_missing_quizzes_only(self):
+        cached = database.insert_topic(1, "Cached topic")
+        database.insert_topic_quiz_set(cached, "Summary", [(0, "Q", ["a) 1", "b) 2", "c) 3", "d) 4"], "a")])
+        new_topics = [database.insert_topic(1, f"Topic {i}") for i in range(3)]
+
+        agent = FakeQuizAgent()
+        pregenerator = QuizPregenerator(concurrency=2, rate=0, agent=agent)
+        statuses = [future.result() for future in pregenerator.submit([cached] + new_topics)]
+        pregenerator.shutdown()
+
+        self.assertEqual(statuses, ["cached", "generated", "generated", "generated"])
+        self.assertEqual(len(agent.quizz_app.inputs), 3)
+        self.assertEqual(database.fetch_topics_without_quiz(1), [])
+
+    def test_failures_are_reported(self):
+        topic_id = database.insert_topic(1, "Broken")
+        agent = FakeQuizAgent()
+        agent.quizz_app.invoke = lambda input_data: 1 / 0
+        reported = []
+        pregenerator = QuizPregenerator(concurrency=1, rate=0, agent=agent)
+        pregenerator.submit([topic_id], progress=lambda *args: reported.append(args[:2]))[0].result()
+        pregenerator.shutdown()
+        self.assertEqual(reported, [(topic_id, "failed")])
+        self.assertEqual(pregenerator.counts["failed"], 1)
+
+    def test_rejected_quiz_is_reported_as_failed(self):
+        topic_id = database.insert_topic(1, "Incomplete")
+        agent = FakeQuizAgent(output=llm_response2.split("Answers")[0])
+        concept_agent = FakeQuizAgent(output="An explanation")
+        reported = []
+        pregenerator = QuizPregenerator(concurrency=1, rate=0, agent=agent, prewarm=True, concept_agent=concept_agent)
+        with contextlib.redirect_stdout(io.StringIO()):
+            pregenerator.submit([topic_id], progress=lambda *args: reported.append(args[:2]))[0].result()
+        pregenerator.shutdown()
+        self.assertEqual(reported, [(topic_id, "failed")])
+        self.assertEqual(pregenerator.counts["generated"], 0)
+        self.assertFalse(database.has_topic_quiz(topic_id))
+        self.assertEqual(concept_agent.quizz_app.inputs, [])
+
+    def test_prewarms_wrong_answer_explanations(self):
+        topic_id = database.insert_topic(1, "Clocks")
+        concept_agent = FakeQuizAgent(output="An explanation")
+        pregenerator = QuizPregenerator(concurrency=1, rate=0, agent=FakeQuizAgent(),
+                                        prewarm=True, concept_agent=concept_agent)
+        pregenerator.submit([topic_id])[0].result()
+        pregenerator.shutdown()
+
+        # Three levels with three wrong answers each.
+        self.assertEqual(len(concept_agent.quizz_app.inputs), 9)
+        chosen = {inputs["prompt_vars"]["your_choice"][0] for inputs in concept_agent.quizz_app.inputs}
+        self.assertEqual(chosen, {"a", "b", "c", "d"})
+        # A student picking a wrong answer is now served from the cache.
+        bundle = database.get_topic_bundle(topic_id)
+        self.assertEqual(get_cached_conceptual_clarity(concept_agent, bundle, 0, "a"), "An explanation")
+        self.assertEqual(len(concept_agent.quizz_app.inputs), 9)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import multiprocessing
+import time
+import unittest
+
+from agents.rate_limit import RateLimiter, SharedRateLimiter, call_with_retry, is_transient_error
+
+
+def _acquire(limiter, count):
+    for _ in range(count):
+        limiter.acquire()
+
+def _timed_acquire(limiter, count, barrier, times, slot):
+    # Timed from the barrier: starting a spawned process alone takes longer than the limit.
+    barrier.wait()
+    times[2 * slot] = time.monotonic()
+    _acquire(limiter, count)
+    times[2 * slot + 1] = time.monotonic()
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_limits_rate_after_burst(self):
+        limiter = RateLimiter(rate=50, burst=2)
+        begin = time.monotonic()
+        for _ in range(6):
+            limiter.acquire()
+        # Two tokens are available immediately, the other four arrive at 50/s.
+        self.assertGreaterEqual(time.monotonic() - begin, 0.07)
+
+    def test_zero_rate_is_unlimited(self):
+        limiter = RateLimiter(rate=0)
+        begin = time.monotonic()
+        for _ in range(1000):
+            limiter.acquire()
+        self.assertLess(time.monotonic() - begin, 0.5)
+
+
+class TestSharedRateLimiter(unittest.TestCase):
+    def test_limits_rate_across_processes(self):
+        context = multiprocessing.get_context("spawn")
+        limiter = SharedRateLimiter(rate=50, burst=2, context=context)
+        barrier = context.Barrier(2)
+        times = context.Array("d", 4)
+        processes = [context.Process(target=_timed_acquire, args=(limiter, 5, barrier, times, slot))
+                     for slot in range(2)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.assertTrue(all(process.exitcode == 0 for process in processes))
+        # Two tokens are available at once, the other eight arrive at 50/s in total.
+        elapsed = max(times[1], times[3]) - min(times[0], times[2])
+        self.assertGreaterEqual(elapsed, 0.15)
+        self.assertLess(elapsed, 1.0)
+
+    def test_zero_rate_is_unlimited(self):
+        limiter = SharedRateLimiter(rate=0)
+        begin = time.monotonic()
+        _acquire(limiter, 1000)
+        self.assertLess(time.monotonic() - begin, 0.5)
+
+
+class TestRetry(unittest.TestCase):
+    def test_retries_transient_errors(self):
+        calls = []
+        def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise Exception("[429] Too Many Requests")
+            return "title"
+        self.assertEqual(call_with_retry(flaky, retries=3, backoff=0.001), "title")
+        self.assertEqual(len(calls), 3)
+
+    def test_gives_up_after_retries(self):
+        calls = []
+        def failing():
+            calls.append(1)
+            raise TimeoutError("timed out")
+        with self.assertRaises(TimeoutError):
+            call_with_retry(failing, retries=2, backoff=0.001)
+        self.assertEqual(len(calls), 3)
+
+    def test_permanent_errors_are_not_retried(self):
+        calls = []
+        def invalid():
+            calls.append(1)
+            raise Exception("[401] Unauthorized")
+        with self.assertRaises(Exception):
+            call_with_retry(invalid, backoff=0.001)
+        self.assertEqual(len(calls), 1)
+        self.assertFalse(is_transient_error(ValueError("bad prompt")))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from agents.single_flight import SingleFlight, AsyncSingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_callers_share_one_call(self):
+        flights = SingleFlight()
+        calls = []
+        release = threading.Event()
+
+        def work():
+            calls.append(1)
+            release.wait()
+            return "quiz"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(flights.do(7, work))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        while not flights.in_flight(7):
+            time.sleep(0.01)
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["quiz"] * 5)
+        self.assertFalse(flights.in_flight(7))
+
+    def test_exception_reaches_waiters(self):
+        flights = SingleFlight()
+        release = threading.Event()
+
+        def work():
+            release.wait()
+            raise ValueError("generation failed")
+
+        errors = []
+
+        def call():
+            try:
+                flights.do(1, work)
+            except ValueError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(errors), 3)
+
+    def test_waiter_timeout(self):
+        flights = SingleFlight()
+        release = threading.Event()
+        leader = threading.Thread(target=flights.do, args=(1, release.wait))
+        leader.start()
+        while not flights.in_flight(1):
+            time.sleep(0.01)
+        # The builtin TimeoutError, which the servers turn into a 503.
+        with self.assertRaisesRegex(TimeoutError, "in-flight"):
+            flights.do(1, lambda: None, timeout=0.05)
+        release.set()
+        leader.join()
+
+    def test_sequential_calls_run_again(self):
+        flights = SingleFlight()
+        self.assertEqual(flights.do(1, lambda: 1), 1)
+        self.assertEqual(flights.do(1, lambda: 2), 2)
+
+
+class TestAsyncSingleFlight(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_callers_share_one_call(self):
+        flights = AsyncSingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "quiz"
+
+        results = await asyncio.gather(*(flights.do(7, work) for _ in range(5)))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["quiz"] * 5)
+        self.assertFalse(flights.in_flight(7))
+
+    async def test_waiter_timeout_leaves_call_running(self):
+        flights = AsyncSingleFlight()
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+            return "quiz"
+
+        leader = asyncio.ensure_future(flights.do(7, work))
+        await asyncio.sleep(0)
+        with self.assertRaisesRegex(TimeoutError, "in-flight"):
+            await flights.do(7, work, timeout=0.01)
+        release.set()
+        self.assertEqual(await leader, "quiz")
+
+
+if __name__ == '__main__':
+    unittest.main()
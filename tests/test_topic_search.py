@@ -0,0 +1,36 @@
+import unittest
+from unittest import mock
+
+from agents import database, topic_search
+from agents.topic_search import reciprocal_rank_fusion
+from tests.test_database import DatabaseTestCase
+
+
+class TestReciprocalRankFusion(unittest.TestCase):
+    def test_items_in_both_rankings_come_first(self):
+        fused = reciprocal_rank_fusion([[1, 2, 3], [4, 3, 1]], k=60)
+        self.assertEqual([item for item, _ in fused], [1, 3, 4, 2])
+        self.assertAlmostEqual(fused[0][1], 1 / 61 + 1 / 63)
+
+    def test_single_ranking_keeps_its_order(self):
+        self.assertEqual([item for item, _ in reciprocal_rank_fusion([[3, 1, 2]])], [3, 1, 2])
+
+
+class TestHybridSearch(DatabaseTestCase):
+    def test_fuses_keyword_and_vector_results(self):
+        lecture_id = database.insert_lecture(1, "Clocks", "")
+        pendulum, quartz, atomic = database.insert_topics(
+            lecture_id, [("Pendulum clocks", None, None), ("Quartz oscillators", None, None), ("Atomic time", None, None)])
+        # The vector search ranks atomic first; both rankings contain the quartz topic.
+        vector = [(lecture_id, atomic, 0.1), (lecture_id, quartz, 0.2)]
+        with mock.patch.object(topic_search, "search_course", return_value=vector):
+            results = topic_search.hybrid_search(1, "quartz", k=2)
+        self.assertEqual([result['topic_id'] for result in results], [quartz, atomic])
+        self.assertEqual(results[0]['lecture_title'], "Clocks")
+
+    def test_course_without_vector_index(self):
+        lecture_id = database.insert_lecture(1, "Clocks", "")
+        database.insert_topics(lecture_id, [("Pendulum clocks", None, None)])
+        with mock.patch.object(topic_search, "search_course", return_value=None):
+            results = topic_search.hybrid_search(1, "pendulum")
+        self.assertEqual([result['topic_title'] for result in results], ["Pendulum clocks"])
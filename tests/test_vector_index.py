@@ -0,0 +1,54 @@
+import unittest
+
+import faiss
+import numpy as np
+
+from agents.vector_index import build_index, rebuild_index, ivf_nlist
+
+
+def clustered(count, dimension=32, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(16, dimension))
+    return (centers[rng.integers(0, 16, count)] + 0.1 * rng.normal(size=(count, dimension))).astype(np.float32)
+
+
+class TestBuildIndex(unittest.TestCase):
+    def test_index_types(self):
+        vectors = clustered(2000)
+        expected = {"flat": faiss.IndexFlatL2, "sq8": faiss.IndexScalarQuantizer,
+                    "fp16": faiss.IndexScalarQuantizer, "ivfpq": faiss.IndexIVFPQ}
+        for index_type, cls in expected.items():
+            index, built = build_index(vectors, index_type, pq_m=8, nprobe=4)
+            self.assertEqual(built, index_type)
+            self.assertIsInstance(index, cls)
+            self.assertEqual(index.ntotal, 2000)
+            # Vectors keep their position: each one finds itself, up to quantization error.
+            _, found = index.search(vectors[:50], 1)
+            agreement = np.mean(found[:, 0] == np.arange(50))
+            self.assertGreaterEqual(agreement, 0.9 if index_type != "ivfpq" else 0.5, index_type)
+
+    def test_ivfpq_parameters(self):
+        index, _ = build_index(clustered(2000), "ivfpq", nlist=10, nprobe=3, pq_m=8, pq_nbits=6)
+        self.assertEqual((index.nlist, index.nprobe, index.pq.M, index.pq.nbits), (10, 3, 8, 6))
+        self.assertEqual(ivf_nlist(2000), 51)
+        self.assertEqual(ivf_nlist(20000), 512)
+        self.assertEqual(ivf_nlist(100000), 1264)
+
+    def test_small_lecture_falls_back_to_sq8(self):
+        index, built = build_index(clustered(100), "ivfpq", pq_m=8)
+        self.assertEqual(built, "sq8")
+        self.assertEqual(index.ntotal, 100)
+
+    def test_invalid_parameters(self):
+        with self.assertRaises(ValueError):
+            build_index(clustered(10), "hnsw")
+        with self.assertRaises(ValueError):
+            build_index(clustered(2000), "ivfpq", pq_m=7)
+
+    def test_rebuild_flat_index(self):
+        flat = faiss.IndexFlatL2(32)
+        flat.add(clustered(300))
+        self.assertIs(rebuild_index(flat, "flat")[0], flat)
+        index, built = rebuild_index(flat, "fp16")
+        self.assertEqual(built, "fp16")
+        np.testing.assert_allclose(index.reconstruct_n(0, 300), flat.reconstruct_n(0, 300), atol=1e-2)
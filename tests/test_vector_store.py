@@ -0,0 +1,102 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from agents import vector_store
+from agents.docstore import SQLiteDocstore
+from agents.numpy_store import NumpyVectorStore
+
+
+def chunks(*texts):
+    return [Document(page_content=text, metadata={"source": "lecture.txt"}) for text in texts]
+
+
+class TestLectureStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        patcher = mock.patch.object(vector_store, "RAG_DB_FOLDER", self.tmpdir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.embedder = DeterministicFakeEmbedding(size=8)
+
+    def files(self, lecture_id):
+        return sorted(os.listdir(vector_store.lecture_store_path(lecture_id)))
+
+    def test_round_trip(self):
+        store = FAISS.from_documents(chunks("clocks", "light", "trains"), self.embedder)
+        vector_store.save_lecture_store(store, 1)
+        self.assertEqual(self.files(1), ["docstore.db", "index.faiss"])
+
+        loaded = vector_store.load_lecture_store(1, self.embedder)
+        self.assertIsInstance(loaded.docstore, SQLiteDocstore)
+        self.assertEqual(loaded.index_to_docstore_id, store.index_to_docstore_id)
+        found = loaded.similarity_search("light", k=1)[0]
+        self.assertEqual(found.page_content, "light")
+        self.assertEqual(found.metadata, {"source": "lecture.txt"})
+
+    def test_changes_are_saved(self):
+        vector_store.save_lecture_store(FAISS.from_documents(chunks("clocks", "light"), self.embedder), 1)
+        store = vector_store.load_lecture_store(1, self.embedder)
+        removed = store.index_to_docstore_id[0]
+        store.delete([removed])
+        store.add_documents(chunks("trains"), ids=["new"])
+        self.assertEqual(store.docstore.search("new").page_content, "trains")
+        self.assertIsInstance(store.docstore.search(removed), str)
+        vector_store.save_lecture_store(store, 1)
+
+        loaded = vector_store.load_lecture_store(1, self.embedder)
+        texts = [loaded.docstore.search(doc_id).page_content for doc_id in loaded.index_to_docstore_id.values()]
+        self.assertEqual(texts, ["light", "trains"])
+
+    def test_convert_legacy_pickle(self):
+        store = FAISS.from_documents(chunks("clocks", "light"), self.embedder)
+        store.save_local(vector_store.lecture_store_path(2))
+        self.assertIsInstance(vector_store.load_lecture_store(2, self.embedder).docstore, type(store.docstore))
+
+        self.assertTrue(vector_store.convert_lecture_store(2))
+        self.assertEqual(self.files(2), ["docstore.db", "index.faiss"])
+        self.assertFalse(vector_store.convert_lecture_store(2))
+        loaded = vector_store.load_lecture_store(2, self.embedder)
+        self.assertEqual(loaded.similarity_search("clocks", k=1)[0].page_content, "clocks")
+        self.assertEqual(vector_store.list_lecture_stores(), ["2"])
+
+    def test_chunks_are_not_counted_as_resident(self):
+        store = FAISS.from_documents(chunks("clocks" * 100), self.embedder)
+        self.assertEqual(vector_store.estimate_store_bytes(store), 8 * 4 + 600)
+        vector_store.save_lecture_store(store, 1)
+        self.assertEqual(vector_store.estimate_store_bytes(vector_store.load_lecture_store(1, self.embedder)), 8 * 4)
+
+    def test_memory_mapped_index(self):
+        store = FAISS.from_documents(chunks("clocks", "light", "trains"), self.embedder)
+        vector_store.save_lecture_store(store, 1)
+        mapped = vector_store.load_lecture_store(1, self.embedder, mmap=True)
+        self.assertEqual(mapped.similarity_search("light", k=1)[0].page_content, "light")
+        self.assertEqual(vector_store.estimate_store_bytes(mapped), 0)
+
+    @unittest.skipUnless(os.path.exists("/proc/self/smaps"), "needs /proc/self/smaps")
+    def test_index_memory_reports_mapped_lectures(self):
+        vector_store.save_lecture_store(FAISS.from_documents(chunks("clocks"), self.embedder), 1)
+        vector_store.save_lecture_store(FAISS.from_documents(chunks("light"), self.embedder), 2)
+        mapped = vector_store.load_lecture_store(1, self.embedder, mmap=True)
+        mapped.similarity_search("clocks", k=1)
+        heap = vector_store.load_lecture_store(2, self.embedder)
+        usage = vector_store.index_memory()
+        self.assertEqual(list(usage), ["1"])
+        self.assertGreater(usage["1"]['mapped'], 0)
+        self.assertGreater(usage["1"]['rss'], 0)
+        del mapped, heap
+        self.assertEqual(vector_store.index_memory(), {})
+
+    def test_query_store_for_small_flat_lectures(self):
+        vector_store.save_lecture_store(FAISS.from_documents(chunks("clocks", "light", "trains"), self.embedder), 1)
+        small = vector_store.load_query_store(1, self.embedder, max_numpy_chunks=3)
+        self.assertIsInstance(small, NumpyVectorStore)
+        self.assertEqual(small.similarity_search("light", k=1)[0].page_content, "light")
+        self.assertEqual(vector_store.estimate_store_bytes(small), 3 * 8 * 4 + len("clockslighttrains"))
+        self.assertIsInstance(vector_store.load_query_store(1, self.embedder, max_numpy_chunks=2), FAISS)